@@ -0,0 +1,276 @@
+"""
+Throughput and latency benchmark for the generators, fully offline.
+
+Starts `mock_openai.MockOpenAIServer` with the requested latency
+distributions and runs `generate_flags`, `generate_stories` and
+`generate_images` against it at each combination of concurrency and `amt`.
+Every scenario runs in a fresh interpreter with its own `Session`, so the
+reported peak RSS belongs to that scenario alone and the mock server's
+memory is not counted.
+
+Per scenario it reports:
+    - throughput in generator calls and items per second;
+    - p50/p95/p99 latency of whole generator calls;
+    - peak RSS of the worker process;
+    - API requests the mock served, and failed calls.
+
+    python benchmarks/bench_generators.py
+    python benchmarks/bench_generators.py --generators flags --concurrency 1,8,32 --amt 10,200 \\
+        --responses-latency lognormal:0.4:0.5 --json > baseline.json
+    python benchmarks/bench_generators.py --baseline baseline.json --tolerance 0.25
+
+With `--baseline` the exit status is 1 when a scenario's p95 latency or peak
+RSS grew, or its item throughput dropped, by more than `--tolerance`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_openai import Latency, MockOpenAIServer  # noqa: E402
+
+GENERATORS = ("flags", "stories", "images")
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# Worker: runs one scenario in this process and prints its result as JSON
+
+def _call(spec: dict[str, Any], session: Any, output_dir: str, sync: bool) -> Any:
+    import ctf_assets
+
+    kwargs: dict[str, Any] = {"amt": spec["amt"], "theme": "benchmark", "session": session}
+    if spec["generator"] == "flags":
+        func = "generate_flags"
+    elif spec["generator"] == "stories":
+        func = "generate_stories"
+    else:
+        func = "generate_images"
+        kwargs.update(output_dir=output_dir, image_model=spec["image_model"])
+    return getattr(ctf_assets, func if sync else f"a{func}")(**kwargs)
+
+
+def run_worker(spec: dict[str, Any]) -> dict[str, Any]:
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    from ctf_assets import Session, gather_bounded
+
+    output_dir = tempfile.mkdtemp(prefix="ctf-assets-bench-")
+    latencies: list[float] = []
+    items = 0
+    errors: list[str] = []
+    sync = spec["mode"] == "threads"
+
+    def record(start: float, result: Any) -> None:
+        nonlocal items
+        latencies.append(time.perf_counter() - start)
+        items += len(result)
+
+    def timed_sync(session: Any) -> None:
+        start = time.perf_counter()
+        try:
+            record(start, _call(spec, session, output_dir, sync=True))
+        except Exception as e:
+            errors.append(str(e))
+
+    async def timed_async(session: Any) -> None:
+        start = time.perf_counter()
+        try:
+            record(start, await _call(spec, session, output_dir, sync=False))
+        except Exception as e:
+            errors.append(str(e))
+
+    async def run_async(session: Any) -> float:
+        # Warm-up: model catalogue, connection pool
+        await _call(spec, session, output_dir, sync=False)
+        start = time.perf_counter()
+        await gather_bounded((timed_async(session) for _ in range(spec["calls"])), limit=spec["concurrency"])
+        return time.perf_counter() - start
+
+    try:
+        with Session() as session:
+            if sync:
+                _call(spec, session, output_dir, sync=True)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=spec["concurrency"]) as pool:
+                    list(pool.map(lambda _: timed_sync(session), range(spec["calls"])))
+                wall = time.perf_counter() - start
+            else:
+                wall = asyncio.run(run_async(session))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    return {
+        "wall_s": round(wall, 4),
+        "calls": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "calls_per_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "items": items,
+        "items_per_s": round(items / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+# Driver: starts the mock server and one worker per scenario
+
+def scenario_key(spec: dict[str, Any]) -> str:
+    return f"{spec['generator']}/{spec['mode']}/c{spec['concurrency']}/amt{spec['amt']}"
+
+
+def run_scenario(server: MockOpenAIServer, spec: dict[str, Any]) -> dict[str, Any]:
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        "OPENAI_BASE_URL": server.base_url,
+        "OPENAI_API_KEY": "mock",
+    })
+    before = dict(server.requests)
+    with tempfile.TemporaryDirectory(prefix="ctf-assets-bench-cache-") as cache_dir:
+        # Fresh model and response caches for every scenario
+        env["CTF_ASSETS_CACHE_DIR"] = cache_dir
+        proc = subprocess.run(
+            [sys.executable, __file__, "--worker", json.dumps(spec)],
+            capture_output=True, text=True, env=env, cwd=ROOT,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Scenario {scenario_key(spec)} failed:\n{proc.stderr.strip()}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["api_requests"] = {k: v - before.get(k, 0) for k, v in server.requests.items() if v - before.get(k, 0)}
+    return {**spec, **result}
+
+
+def compare(results: list[dict[str, Any]], baseline: list[dict[str, Any]], tolerance: float) -> list[str]:
+    """Regressions of `results` against `baseline` beyond `tolerance` (a fraction)."""
+    previous = {scenario_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(scenario_key(result))
+        if old is None:
+            continue
+        key = scenario_key(result)
+        if old["p95_ms"] and result["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old['p95_ms']} -> {result['p95_ms']} ms")
+        if old["items_per_s"] and result["items_per_s"] < old["items_per_s"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {old['items_per_s']} -> {result['items_per_s']} items/s")
+        if old.get("peak_rss_mb") and result.get("peak_rss_mb") and result["peak_rss_mb"] > old["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(f"{key}: peak RSS {old['peak_rss_mb']:.1f} -> {result['peak_rss_mb']:.1f} MB")
+    return regressions
+
+
+def _print_table(results: list[dict[str, Any]]) -> None:
+    header = f"{'scenario':<32} {'calls/s':>8} {'items/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'RSS MB':>7} {'reqs':>6} {'err':>4}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r.get("peak_rss_mb") else "-"
+        print(
+            f"{scenario_key(r):<32} {r['calls_per_s']:>8.2f} {r['items_per_s']:>9.2f} {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {rss:>7} {sum(r['api_requests'].values()):>6} {r['errors']:>4}"
+        )
+        if r.get("first_error"):
+            print(f"    first error: {r['first_error']}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ctf-assets generators against a local mock OpenAI server")
+    parser.add_argument("--worker", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--generators", type=str, default="flags,stories,images", help="Comma-separated subset of flags,stories,images")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16], help="Generator calls in flight, e.g. 1,4,16")
+    parser.add_argument("--amt", type=_int_list, default=[1, 10, 100], help="amt per flag/story call, e.g. 1,10,100")
+    parser.add_argument("--image-amt", type=_int_list, default=[1, 4], help="amt per image call, e.g. 1,4")
+    parser.add_argument("--image-model", type=str, default="dall-e-3", help="Image model requested from the mock")
+    parser.add_argument("--calls", type=int, default=16, help="Timed generator calls per scenario (after one warm-up call)")
+    parser.add_argument("--mode", choices=["async", "threads", "both"], default="async", help="agenerate_* under gather_bounded, generate_* on a thread pool, or both")
+    parser.add_argument("--responses-latency", type=Latency.parse, default=Latency.parse("lognormal:0.05:0.5"), help="Latency of /v1/responses")
+    parser.add_argument("--images-latency", type=Latency.parse, default=Latency.parse("lognormal:0.2:0.3"), help="Latency of /v1/images/generations")
+    parser.add_argument("--models-latency", type=Latency.parse, default=Latency.parse("fixed:0.01"), help="Latency of /v1/models")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON output of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against --baseline")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(run_worker(json.loads(args.worker))))
+        return 0
+
+    generators = [g.strip() for g in args.generators.split(",") if g.strip()]
+    unknown = sorted(set(generators) - set(GENERATORS))
+    if unknown:
+        parser.error(f"unknown generators: {', '.join(unknown)}")
+    modes = ["async", "threads"] if args.mode == "both" else [args.mode]
+
+    specs = [
+        {
+            "generator": generator, "mode": mode, "concurrency": concurrency, "amt": amt,
+            "calls": max(1, args.calls), "image_model": args.image_model,
+        }
+        for generator in generators
+        for mode, concurrency, amt in itertools.product(
+            modes, args.concurrency, args.image_amt if generator == "images" else args.amt
+        )
+    ]
+
+    latency = {"responses": args.responses_latency, "images": args.images_latency, "models": args.models_latency}
+    results = []
+    with MockOpenAIServer(latency=latency) as server:
+        for spec in specs:
+            results.append(run_scenario(server, spec))
+            if not args.json:
+                print(f"  {scenario_key(spec)} done", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"responses {latency['responses']}, images {latency['images']}, models {latency['models']}")
+        _print_table(results)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""
+Startup benchmark for the `ctf-assets` CLI.
+
+Measures, in fresh interpreters:
+    - `python -X importtime` cumulative cost of `import ctf_assets` and of the
+      CLI entry module, with its slowest direct imports;
+    - wall time of `python -m ctf_assets --help`.
+
+Run it locally before and after a change that touches imports:
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 20 --max-help-ms 400 --json
+
+With `--max-import-ms` / `--max-help-ms` the exit status is 1 when a median
+exceeds its budget, so the script can guard a local pre-push hook.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (label, module imported under -X importtime)
+IMPORT_TARGETS = [
+    ("import ctf_assets", "ctf_assets"),
+    ("import ctf_assets.__main__", "ctf_assets.__main__"),
+]
+
+# Modules that must not be loaded by `import ctf_assets` or `--help`
+HEAVY_MODULES = ["openai", "dotenv", "httpx", "pydantic"]
+
+
+def _env() -> dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """Parse `-X importtime` output into (self_us, cumulative_us, module) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    return rows
+
+
+def measure_import(module: str) -> tuple[int, list[tuple[int, str]], list[str]]:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        tuple: Cumulative microseconds for `module`, the slowest direct
+            imports as (cumulative_us, name), and the heavy modules loaded.
+    """
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    total = next((cum for _, cum, name in reversed(rows) if name.strip() == module), 0)
+    # Direct imports of top-level entries: the name column is indented by
+    # one space plus two per nesting level
+    top = sorted(
+        ((cum, name.strip()) for _, cum, name in rows if name.startswith("   ") and not name.startswith("     ")),
+        reverse=True,
+    )
+    loaded = [m for m in proc.stdout.strip().split(",") if m]
+    return total, top[:5], loaded
+
+
+def measure_help() -> float:
+    """Wall-clock seconds of `python -m ctf_assets --help`."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "ctf_assets", "--help"],
+        capture_output=True, env=_env(), cwd=ROOT, check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure ctf-assets import and CLI startup cost")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per measurement")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if median `import ctf_assets` exceeds this")
+    parser.add_argument("--max-help-ms", type=float, default=None, help="Fail if median `--help` wall time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    runs = max(1, args.runs)
+    report: dict[str, dict] = {}
+
+    for label, module in IMPORT_TARGETS:
+        samples, top, loaded = [], [], []
+        for _ in range(runs):
+            total, top, loaded = measure_import(module)
+            samples.append(total / 1000)
+        report[label] = {
+            "median_ms": round(statistics.median(samples), 2),
+            "min_ms": round(min(samples), 2),
+            "slowest_imports": [{"module": name, "ms": round(cum / 1000, 2)} for cum, name in top],
+            "heavy_modules_loaded": loaded,
+        }
+
+    help_samples = [measure_help() * 1000 for _ in range(runs)]
+    report["ctf-assets --help"] = {
+        "median_ms": round(statistics.median(help_samples), 2),
+        "min_ms": round(min(help_samples), 2),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for label, result in report.items():
+            print(f"{label:<28} median {result['median_ms']:>8.2f} ms   min {result['min_ms']:>8.2f} ms")
+            for entry in result.get("slowest_imports", []):
+                print(f"    {entry['module']:<32} {entry['ms']:>8.2f} ms")
+            if result.get("heavy_modules_loaded"):
+                print(f"    heavy modules loaded: {', '.join(result['heavy_modules_loaded'])}")
+
+    failed = False
+    if args.max_import_ms is not None and report["import ctf_assets"]["median_ms"] > args.max_import_ms:
+        print(f"import ctf_assets exceeds {args.max_import_ms} ms", file=sys.stderr)
+        failed = True
+    if args.max_help_ms is not None and report["ctf-assets --help"]["median_ms"] > args.max_help_ms:
+        print(f"ctf-assets --help exceeds {args.max_help_ms} ms", file=sys.stderr)
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+Local stand-in for the OpenAI endpoints used by ctf-assets.
+
+Serves `GET /v1/models`, `POST /v1/responses` (structured output, plain text
+and SSE streaming) and `POST /v1/images/generations` from a threaded HTTP
+server, with a configurable latency distribution per endpoint. Structured
+responses follow the request's JSON schema and honour the "exactly N" amount
+in the prompt, so generators parse, deduplicate and top up as they would
+against the real API. Every response carries a `usage` block and
+`x-ratelimit-*` headers.
+
+Latency specs:
+    none                      no added delay
+    fixed:SECONDS             constant delay
+    uniform:LOW:HIGH          uniform between LOW and HIGH seconds
+    lognormal:MEDIAN:SIGMA    log-normal with the given median and shape,
+                              a realistic long-tailed API latency
+
+Used by `bench_generators.py`, or on its own to point a manual run at:
+
+    python benchmarks/mock_openai.py --port 8000 --responses-latency lognormal:0.4:0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 OPENAI_API_KEY=mock ctf-assets flags generate-flags --amt 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+MODELS = ["gpt-4o-mini", "gpt-4o", "o3-mini", "dall-e-3", "dall-e-2"]
+
+_AMOUNT = re.compile(r"exactly (\d+)")
+
+
+@dataclass(frozen=True)
+class Latency:
+    """A latency distribution, sampled once per request."""
+
+    kind: str = "none"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> Latency:
+        """Parse a spec such as "fixed:0.2" or "lognormal:0.4:0.5"."""
+        kind, *values = spec.split(":")
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"Invalid latency spec {spec!r}; expected one of none, fixed:S, uniform:LO:HI, lognormal:MEDIAN:SIGMA")
+        numbers = [float(v) for v in values] + [0.0, 0.0]
+        return cls(kind, numbers[0], numbers[1])
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.a
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(self.a), self.b) if self.a > 0 else 0.0
+        return 0.0
+
+    def __str__(self) -> str:
+        if self.kind == "none":
+            return "none"
+        if self.kind == "fixed":
+            return f"fixed:{self.a:g}"
+        return f"{self.kind}:{self.a:g}:{self.b:g}"
+
+
+def _png(size: int) -> str:
+    """Base64 of a PNG signature padded to `size` bytes; writers never decode the pixels."""
+    return base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"\0" * max(0, size - 8)).decode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockOpenAIServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def _headers(self, status: int, content_type: str, length: int | None = None) -> None:
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        if length is not None:
+            self.send_header("content-length", str(length))
+        self.send_header("x-ratelimit-limit-requests", "10000")
+        self.send_header("x-ratelimit-remaining-requests", "9999")
+        self.send_header("x-ratelimit-limit-tokens", "10000000")
+        self.send_header("x-ratelimit-remaining-tokens", "9999999")
+        self.end_headers()
+
+    def _json(self, payload: dict[str, Any]) -> None:
+        body = json.dumps(payload).encode()
+        self._headers(200, "application/json", len(body))
+        self.wfile.write(body)
+
+    def _delay(self, endpoint: str) -> None:
+        self.server.count(endpoint)
+        seconds = self.server.sample_latency(endpoint)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def do_GET(self) -> None:
+        if not self.path.rstrip("/").endswith("/models"):
+            self.send_error(404)
+            return
+        self._delay("models")
+        self._json({
+            "object": "list",
+            "data": [{"id": m, "object": "model", "created": 0, "owned_by": "mock"} for m in MODELS],
+        })
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("content-length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.rstrip("/")
+
+        if path.endswith("/images/generations"):
+            self._delay("images")
+            image = self.server.image_b64
+            self._json({"created": int(time.time()), "data": [{"b64_json": image} for _ in range(int(body.get("n") or 1))]})
+        elif path.endswith("/responses"):
+            self._delay("responses")
+            text = self.server.output_text(body)
+            if body.get("stream"):
+                self._stream(text, body)
+            else:
+                self._json(self.server.response_object(text, body))
+        else:
+            self.send_error(404)
+
+    def _stream(self, text: str, body: dict[str, Any]) -> None:
+        # Close the connection afterwards: the stream has no content-length
+        self.close_connection = True
+        self._headers(200, "text/event-stream")
+        sequence = 0
+        for start in range(0, len(text), 16):
+            event = {
+                "type": "response.output_text.delta", "item_id": "msg_mock", "output_index": 0,
+                "content_index": 0, "delta": text[start:start + 16], "sequence_number": sequence, "logprobs": [],
+            }
+            self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+            sequence += 1
+        event = {"type": "response.completed", "response": self.server.response_object(text, body), "sequence_number": sequence}
+        self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """
+    Threaded mock of the OpenAI API on 127.0.0.1.
+
+    Args:
+        port (int): Port to bind; 0 picks a free one.
+        latency (dict[str, Latency] | None): Per-endpoint latency, keyed by
+            "responses", "images" and "models".
+        story_chars (int): Length of each generated story.
+        image_bytes (int): Size of each returned image.
+        seed (int): Seed of the latency sampler.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+            self,
+            port: int = 0,
+            latency: dict[str, Latency] | None = None,
+            story_chars: int = 600,
+            image_bytes: int = 200_000,
+            seed: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency or {}
+        self.story_chars = story_chars
+        self.image_b64 = _png(image_bytes)
+        self.requests: Counter[str] = Counter()
+        self._rng = random.Random(seed)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def count(self, endpoint: str) -> None:
+        with self._lock:
+            self.requests[endpoint] += 1
+
+    def sample_latency(self, endpoint: str) -> float:
+        latency = self.latency.get(endpoint)
+        if latency is None:
+            return 0.0
+        with self._lock:
+            return latency.sample(self._rng)
+
+    def _item(self, key: str, schema: dict[str, Any]) -> Any:
+        with self._lock:
+            n = next(self._ids)
+        if schema.get("type") == "object":
+            return {name: self._item(name, prop) for name, prop in schema.get("properties", {}).items()}
+        if key == "flags":
+            return f"ctf{{mock_{n:08x}}}"
+        if key in ("story", "stories"):
+            return (f"Story {n}. " + "Lorem ipsum dolor sit amet. " * (self.story_chars // 28 + 1))[:self.story_chars]
+        return f"{key} {n}"
+
+    def output_text(self, body: dict[str, Any]) -> str:
+        """Output for a Responses request: JSON following its schema, or plain text."""
+        fmt = (body.get("text") or {}).get("format") or {}
+        schema = fmt.get("schema")
+        if not schema:
+            return "A detailed illustration of a capture-the-flag scene."
+        prompt = json.dumps(body.get("input")) + json.dumps(body.get("instructions"))
+        match = _AMOUNT.search(prompt)
+        amount = int(match.group(1)) if match else 1
+        output = {}
+        for key, prop in schema.get("properties", {}).items():
+            if prop.get("type") == "array":
+                output[key] = [self._item(key, prop.get("items", {})) for _ in range(amount)]
+            else:
+                output[key] = self._item(key, prop)
+        return json.dumps(output)
+
+    def response_object(self, text: str, body: dict[str, Any]) -> dict[str, Any]:
+        prompt_chars = len(json.dumps(body.get("input"))) + len(json.dumps(body.get("instructions")))
+        input_tokens = max(1, prompt_chars // 4)
+        return {
+            "id": "resp_mock", "object": "response", "created_at": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"), "status": "completed",
+            "output": [{
+                "type": "message", "id": "msg_mock", "role": "assistant", "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }],
+            "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+            "usage": {
+                "input_tokens": input_tokens,
+                "input_tokens_details": {"cached_tokens": len(json.dumps(body.get("instructions"))) // 4},
+                "output_tokens": max(1, len(text) // 4),
+                "output_tokens_details": {"reasoning_tokens": 0},
+                "total_tokens": input_tokens + max(1, len(text) // 4),
+            },
+        }
+
+    def start(self) -> MockOpenAIServer:
+        """Serve from a daemon thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> MockOpenAIServer:
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve a local mock of the OpenAI endpoints used by ctf-assets")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--responses-latency", type=Latency.parse, default=Latency.parse("none"))
+    parser.add_argument("--images-latency", type=Latency.parse, default=Latency.parse("none"))
+    parser.add_argument("--models-latency", type=Latency.parse, default=Latency.parse("none"))
+    parser.add_argument("--story-chars", type=int, default=600)
+    parser.add_argument("--image-bytes", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    server = MockOpenAIServer(
+        port=args.port,
+        latency={"responses": args.responses_latency, "images": args.images_latency, "models": args.models_latency},
+        story_chars=args.story_chars,
+        image_bytes=args.image_bytes,
+    )
+    print(f"Mock OpenAI API on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
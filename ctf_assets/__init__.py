@@ -1,11 +1,161 @@
-from ctf_assets.flag_generator import generate_flags
-from ctf_assets.image_generator import generate_images, ImageResult
-from ctf_assets.story_generator import generate_stories, generate_stories_with_titles
+from typing import TYPE_CHECKING
+
+# Public names and the module that defines them. They are imported on first
+# access (PEP 562), so `import ctf_assets` and `ctf-assets --help` don't load
+# the OpenAI SDK.
+_LAZY_ATTRIBUTES = {
+    "generate_flags": "ctf_assets.flag_generator",
+    "agenerate_flags": "ctf_assets.flag_generator",
+    "iter_flags": "ctf_assets.flag_generator",
+    "aiter_flags": "ctf_assets.flag_generator",
+    "generate_procedural_flags": "ctf_assets.flag_engine",
+    "agenerate_procedural_flags": "ctf_assets.flag_engine",
+    "fetch_word_pools": "ctf_assets.flag_engine",
+    "afetch_word_pools": "ctf_assets.flag_engine",
+    "FlagEngine": "ctf_assets.flag_engine",
+    "WordPools": "ctf_assets.flag_engine",
+    "FlagDeriver": "ctf_assets.team_flags",
+    "TeamFlag": "ctf_assets.team_flags",
+    "derive_team_flag": "ctf_assets.team_flags",
+    "verify_team_flag": "ctf_assets.team_flags",
+    "iter_team_flags": "ctf_assets.team_flags",
+    "write_team_flags": "ctf_assets.team_flags",
+    "generate_images": "ctf_assets.image_generator",
+    "agenerate_images": "ctf_assets.image_generator",
+    "ImageResult": "ctf_assets.image_generator",
+    "ImagePostProcess": "ctf_assets.utils.image_processing",
+    "generate_stego_images": "ctf_assets.image_generator",
+    "agenerate_stego_images": "ctf_assets.image_generator",
+    "stego_variants": "ctf_assets.image_generator",
+    "embed_flag": "ctf_assets.utils.stego",
+    "extract_flag": "ctf_assets.utils.stego",
+    "generate_stories": "ctf_assets.story_generator",
+    "generate_stories_with_titles": "ctf_assets.story_generator",
+    "agenerate_stories": "ctf_assets.story_generator",
+    "agenerate_stories_with_titles": "ctf_assets.story_generator",
+    "iter_stories": "ctf_assets.story_generator",
+    "aiter_stories": "ctf_assets.story_generator",
+    "gather_bounded": "ctf_assets.utils.concurrency",
+    "GenerationResult": "ctf_assets.utils.usage",
+    "Usage": "ctf_assets.utils.usage",
+    "MetricsRegistry": "ctf_assets.utils.metrics",
+    "MetricEvent": "ctf_assets.utils.metrics",
+    "get_default_registry": "ctf_assets.utils.metrics",
+    "Session": "ctf_assets.session",
+    "get_default_session": "ctf_assets.session",
+    "set_default_session": "ctf_assets.session",
+    "Backend": "ctf_assets.backends",
+    "OpenAIBackend": "ctf_assets.backends",
+    "OpenAICompatibleBackend": "ctf_assets.backends",
+    "FakeBackend": "ctf_assets.backends",
+    "ModelRouter": "ctf_assets.utils.routing",
+}
+
+if TYPE_CHECKING:
+    from ctf_assets.flag_generator import generate_flags, agenerate_flags, iter_flags, aiter_flags
+    from ctf_assets.flag_engine import (
+        generate_procedural_flags,
+        agenerate_procedural_flags,
+        fetch_word_pools,
+        afetch_word_pools,
+        FlagEngine,
+        WordPools,
+    )
+    from ctf_assets.team_flags import (
+        FlagDeriver,
+        TeamFlag,
+        derive_team_flag,
+        verify_team_flag,
+        iter_team_flags,
+        write_team_flags,
+    )
+    from ctf_assets.image_generator import (
+        generate_images,
+        agenerate_images,
+        ImageResult,
+        generate_stego_images,
+        agenerate_stego_images,
+        stego_variants,
+    )
+    from ctf_assets.utils.stego import embed_flag, extract_flag
+    from ctf_assets.utils.image_processing import ImagePostProcess
+    from ctf_assets.story_generator import (
+        generate_stories,
+        generate_stories_with_titles,
+        agenerate_stories,
+        agenerate_stories_with_titles,
+        iter_stories,
+        aiter_stories,
+    )
+    from ctf_assets.session import Session, get_default_session, set_default_session
+    from ctf_assets.backends import Backend, OpenAIBackend, OpenAICompatibleBackend, FakeBackend
+    from ctf_assets.utils.routing import ModelRouter
+    from ctf_assets.utils.concurrency import gather_bounded
+    from ctf_assets.utils.usage import GenerationResult, Usage
+    from ctf_assets.utils.metrics import MetricsRegistry, MetricEvent, get_default_registry
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(module_name), name)
+    # Cache on the package so later lookups skip this hook
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     "generate_flags",
+    "agenerate_flags",
+    "iter_flags",
+    "aiter_flags",
+    "generate_procedural_flags",
+    "agenerate_procedural_flags",
+    "fetch_word_pools",
+    "afetch_word_pools",
+    "FlagEngine",
+    "WordPools",
+    "FlagDeriver",
+    "TeamFlag",
+    "derive_team_flag",
+    "verify_team_flag",
+    "iter_team_flags",
+    "write_team_flags",
     "generate_images",
+    "agenerate_images",
     "ImageResult",
+    "ImagePostProcess",
+    "generate_stego_images",
+    "agenerate_stego_images",
+    "stego_variants",
+    "embed_flag",
+    "extract_flag",
     "generate_stories",
     "generate_stories_with_titles",
+    "agenerate_stories",
+    "agenerate_stories_with_titles",
+    "iter_stories",
+    "aiter_stories",
+    "gather_bounded",
+    "GenerationResult",
+    "Usage",
+    "MetricsRegistry",
+    "MetricEvent",
+    "get_default_registry",
+    "Session",
+    "get_default_session",
+    "set_default_session",
+    "Backend",
+    "OpenAIBackend",
+    "OpenAICompatibleBackend",
+    "FakeBackend",
+    "ModelRouter",
 ]
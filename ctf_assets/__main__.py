@@ -2,10 +2,196 @@ import argparse
 import importlib    # To import modules at runtime instead of hardcoding them
 import inspect  #
 import sys
-from dotenv import load_dotenv, find_dotenv
+from pathlib import Path
+
+def _load_env():
+    # Imported here so `--help` and argument errors don't pay for it
+    from dotenv import load_dotenv, find_dotenv
+
+    dotenv_path = find_dotenv(usecwd=True)
+    if dotenv_path:
+        load_dotenv(dotenv_path, override=False)
+    else:
+        print(
+        "[ctf-assets] Note: No .env file found (searched upward from the current working directory). "
+        "Set OPENAI_API_KEY in your environment or create a .env file.",
+        file=sys.stderr,
+    )
+
+def _write_metrics(path):
+    """Dump the process-wide metrics registry: Prometheus text for .prom/.txt, JSON otherwise."""
+    from ctf_assets.utils.metrics import get_default_registry
+
+    try:
+        get_default_registry().write(path)
+    except OSError as e:
+        print(f"[ERROR] Could not write metrics to {path}: {e}", file=sys.stderr)
+
+def _use_backend(args):
+    """Point the process-wide session at the backend and routes chosen with --backend / --base-url / --route."""
+    if not (args.backend or args.base_url or args.route):
+        return
+    from ctf_assets.session import Session, set_default_session
+    from ctf_assets.utils.routing import ModelRouter, parse_route
+
+    router = ModelRouter(dict(parse_route(spec) for spec in args.route)) if args.route else None
+    set_default_session(Session(backend=args.backend, base_url=args.base_url, router=router))
+
+def _add_backend_arguments(parser):
+    parser.add_argument("--backend", type=str, default=None, help="Where to send requests: openai (default), fake (offline, deterministic) or the URL of an OpenAI-compatible server. Also read from CTF_ASSETS_BACKEND")
+    parser.add_argument("--base-url", type=str, default=None, help="URL of an OpenAI-compatible server, e.g. http://localhost:8000/v1")
+    parser.add_argument("--route", action="append", default=[], metavar="ASSET=MODELS", help="Route flags, stories or image_prompts to the fastest healthy model, falling back tier by tier, e.g. flags=gpt-4.1-mini|gpt-4o-mini,gpt-4o (repeatable)")
+
+def batch_main(argv):
+    """Run `ctf-assets batch <manifest>`: many mixed jobs in one process."""
+    parser = argparse.ArgumentParser(
+        prog="ctf-assets batch",
+        description="Run a JSONL/YAML manifest of flag, story and image jobs concurrently",
+    )
+    parser.add_argument("manifest", type=str, help="Manifest file (.jsonl, .json, .yaml or .yml)")
+    parser.add_argument("--output", type=str, default=None, help="Results JSONL file (default: <manifest>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of jobs running at once")
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not serve flags or stories from the local response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses, call the API and update the cache")
+    parser.add_argument("--provider-batch", action="store_true", help="Submit flag and story jobs through the provider Batch API (slow, cheaper)")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="Seconds between Batch API status checks")
+    parser.add_argument("--metrics-file", type=str, default=None, help="Write latency, token and yield metrics here (.prom for Prometheus text, JSON otherwise)")
+    _add_backend_arguments(parser)
+    args = parser.parse_args(argv)
+
+    import asyncio
+    from ctf_assets.batch import format_summary, load_manifest, run_batch
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"[ERROR] Could not read manifest: {e}")
+        return 2
+
+    _load_env()
+    try:
+        _use_backend(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    manifest = Path(args.manifest)
+    output = args.output or str(manifest.with_name(f"{manifest.stem}.results.jsonl"))
+
+    if args.provider_batch:
+        return _provider_batch_main(jobs, output, args.poll_interval)
+
+    try:
+        summary = asyncio.run(
+            run_batch(
+                jobs,
+                output=output,
+                concurrency=args.concurrency,
+                defaults={"cache": args.cache, "refresh": args.refresh},
+            )
+        )
+    finally:
+        if args.metrics_file:
+            _write_metrics(args.metrics_file)
+
+    print(format_summary(summary), file=sys.stderr)
+    print(output)
+    return 1 if summary.failures else 0
+
+def team_flags_main(argv):
+    """Run `ctf-assets team-flags <challenges> <teams>`: per-team flags for dynamic-flag events."""
+    parser = argparse.ArgumentParser(
+        prog="ctf-assets team-flags",
+        description="Derive every team's variant of each challenge flag with HMAC, or verify a submission",
+    )
+    parser.add_argument("challenges", type=str, help="Base flags: JSON {challenge: flag}, JSONL or CSV with challenge,flag columns")
+    parser.add_argument("teams", type=str, help="Team ids: one per line, a JSON list or a CSV with a team column")
+    parser.add_argument("--output", type=str, default="team_flags.csv", help="Output file (.csv, or .jsonl for JSON lines)")
+    parser.add_argument("--flag-format", type=str, default="ctf{..}", help="Format of the derived flags (e.g., ctf{..})")
+    parser.add_argument("--tag-length", type=int, default=16, help="Hex characters of the HMAC tag added to each flag")
+    parser.add_argument("--secret-file", type=str, default=None, help="File holding the event secret (default: CTF_ASSETS_FLAG_SECRET)")
+    parser.add_argument("--verify", type=str, default=None, metavar="SUBMISSION", help="Check this submission for --team and --challenge instead of writing flags")
+    parser.add_argument("--team", type=str, default=None, help="With --verify: the submitting team")
+    parser.add_argument("--challenge", type=str, default=None, help="With --verify: the challenge id")
+    args = parser.parse_args(argv)
+
+    from ctf_assets.team_flags import FlagDeriver, load_challenges, load_teams, write_team_flags
+
+    _load_env()
+    try:
+        secret = Path(args.secret_file).read_bytes().strip() if args.secret_file else None
+        challenges = load_challenges(args.challenges)
+        teams = load_teams(args.teams)
+        deriver = FlagDeriver(secret, flag_format=args.flag_format, tag_length=args.tag_length)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"[ERROR] {e}")
+        return 2
+
+    if args.verify is not None:
+        if args.challenge not in challenges or not args.team:
+            print("[ERROR] --verify needs --team and a --challenge listed in the challenges file")
+            return 2
+        base_flag = challenges[args.challenge]
+        if deriver.verify(args.verify, base_flag, args.team, args.challenge):
+            print("OK")
+            return 0
+        owner = deriver.identify(args.verify, base_flag, teams, args.challenge)
+        print(f"WRONG: flag of team {owner}" if owner else "WRONG")
+        return 1
+
+    rows = write_team_flags(
+        args.output, challenges, teams, secret=secret, flag_format=args.flag_format, tag_length=args.tag_length,
+    )
+    print(f"{rows} flags for {len(teams)} teams x {len(challenges)} challenges", file=sys.stderr)
+    print(args.output)
+    return 0
+
+def _provider_batch_main(jobs, output, poll_interval):
+    import json
+    from ctf_assets.provider_batch import run_provider_batch
+    from ctf_assets.utils import sdk
+
+    try:
+        result = run_provider_batch(jobs, poll_interval=poll_interval)
+    except (ValueError, TypeError) as e:
+        print(f"[ERROR] {e}")
+        return 2
+    except (RuntimeError, TimeoutError, sdk.OpenAIError) as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    with open(output, "w", encoding="utf-8") as fh:
+        for index, job in enumerate(jobs):
+            job_id = str(job.get("id", index))
+            record = {"id": job_id, "asset": job.get("asset"), "ok": job_id in result.results}
+            if record["ok"]:
+                record["result"] = result.results[job_id]
+            else:
+                record["error"] = result.errors.get(job_id)
+            fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    print(
+        f"Batch {result.batch_id} {result.status}: "
+        f"{len(result.results)} succeeded, {len(result.errors)} failed",
+        file=sys.stderr,
+    )
+    print(output)
+    return 1 if result.errors else 0
 
 def main():
-    parser = argparse.ArgumentParser(description="CTF Assets Generator CLI")
+    # Bulk mode has its own arguments
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(batch_main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "team-flags":
+        sys.exit(team_flags_main(sys.argv[2:]))
+
+    parser = argparse.ArgumentParser(
+        description="CTF Assets Generator CLI",
+        epilog=(
+            "Bulk mode: ctf-assets batch jobs.jsonl [--output results.jsonl] [--concurrency 8]. "
+            "Per-team flags: ctf-assets team-flags challenges.json teams.txt [--output team_flags.csv]"
+        ),
+    )
 
     # Choose the module for asset generation
     parser.add_argument(
@@ -19,7 +205,7 @@ def main():
     parser.add_argument(
         "function",
         type=str,
-        help="Function to call to generate assets. One of generate-flags, generate-stories, generate-images"
+        help="Function to call to generate assets. One of generate-flags, generate-procedural-flags, generate-stories, generate-images, generate-stego-images"
     )
 
     # Common parameters that can be used for all modules
@@ -31,9 +217,20 @@ def main():
     parser.add_argument("--temperature", type=float, default=0.65, help="Temperature. Value range [0,2] Higher values give more randomness")
     parser.add_argument("--flag-format", type=str, default="ctf{...}", help="Format of the flag (e.g., ctf{...})")
     parser.add_argument("--language", type=str, default="es-PR", help="Language for the generated flag")
+    parser.add_argument("--seed", type=int, default=None, help="For generate-procedural-flags: seed for reproducible flags")
+    parser.add_argument("--words", type=int, default=3, help="For generate-procedural-flags: word slots per flag")
+    parser.add_argument("--entropy-bits", type=float, default=48.0, help="For generate-procedural-flags: minimum entropy per flag; a hex tail fills the gap")
+    parser.add_argument("--leet", type=int, default=3, help="For generate-procedural-flags: spellings per word, leetspeak ones included (1 turns it off)")
+    parser.add_argument("--pool-size", type=int, default=64, help="For generate-procedural-flags: words asked of the model per pool")
+    parser.add_argument("--unique-index", type=str, default=None, help="SQLite file of previously issued flags; new flags never repeat them")
     parser.add_argument("--additional-instructions", type=str, default="", help="Additional user instructions for the generator")
     parser.add_argument("--additional-system-instructions", type=str, default="", help="Additional system level constraints or guidelines")
 
+    # Response cache for flags and stories (on by default from the CLI)
+    parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not serve flags or stories from the local response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses, call the API and update the cache")
+    parser.add_argument("--return-usage", action="store_true", help="For flags and stories: also print token usage, including provider cached_tokens")
+
     # Image-specific parameters
     parser.add_argument("--image-model", type=str, default="dall-e-3", help="Image model to use (dall-e-2 or dall-e-3)")
     parser.add_argument("--prompt-model", type=str, default="gpt-4o-mini", help="Text model to generate the image prompt")
@@ -44,6 +241,22 @@ def main():
     parser.add_argument("--filename-prefix", type=str, default=None, help="Optional filename prefix for saved images")
     parser.add_argument("--prompt-override", type=str, default=None, help="Optional: provide your own image prompt instead of generating one")
     parser.add_argument("--return-prompt", action="store_true", help="For images: also print the final prompt used")
+    parser.add_argument("--concurrency", type=int, default=4, help="For dall-e-3 with --amt > 1: image requests in flight at once")
+    parser.add_argument("--batch-prompts", action="store_true", help="For images with --amt > 1: one distinct prompt per image, generated in a single call")
+    parser.add_argument("--requests-per-minute", type=float, default=None, help="For dall-e-3 with --amt > 1: cap on image requests per minute")
+    # Image post-processing (requires Pillow); any of these enables the stage
+    parser.add_argument("--variant-formats", type=str, default=None, help="For images: re-encode to these formats, comma-separated (webp, avif, jpeg, png)")
+    parser.add_argument("--variant-sizes", type=int, nargs="+", default=None, metavar="PX", help="For images: also write resized variants with this longest edge")
+    parser.add_argument("--thumbnail-size", type=int, default=None, metavar="PX", help="For images: longest edge of the thumbnail (default 256 when post-processing)")
+    parser.add_argument("--variant-quality", type=int, default=80, help="For images: WebP/AVIF/JPEG quality of the variants, 1 to 100")
+    parser.add_argument("--variant-workers", type=int, default=None, help="For images: post-processing worker processes (default: one per CPU)")
+    # Steganography (generate-stego-images; requires NumPy and Pillow)
+    parser.add_argument("--hide-flag", action="append", default=[], metavar="[TEAM=]FLAG", help="For generate-stego-images: flag to hide in a copy of the image, optionally per team (repeatable)")
+    parser.add_argument("--stego-method", type=str, default="lsb", choices=["lsb", "palette"], help="For generate-stego-images: embedding technique")
+    parser.add_argument("--stego-key", type=str, default=None, help="For generate-stego-images: scatter the flag bits over positions derived from this key")
+
+    parser.add_argument("--metrics-file", type=str, default=None, help="Write latency, token and yield metrics here (.prom for Prometheus text, JSON otherwise)")
+    _add_backend_arguments(parser)
 
     args = parser.parse_args()
 
@@ -51,15 +264,35 @@ def main():
     if args.asset_category == "images" and "--model" in sys.argv and "--prompt-model" not in sys.argv:
         args.prompt_model = args.model
 
-    dotenv_path = find_dotenv(usecwd=True)
-    if dotenv_path:
-        load_dotenv(dotenv_path, override=False)
-    else:
-        print(
-        "[ctf-assets] Note: No .env file found (searched upward from the current working directory). "
-        "Set OPENAI_API_KEY in your environment or create a .env file.",
-        file=sys.stderr,
-    )
+    _load_env()
+    try:
+        _use_backend(args)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        return
+
+    if args.hide_flag:
+        # TEAM=FLAG entries become a team -> flag mapping, bare flags a list
+        pairs = [entry.partition("=") for entry in args.hide_flag]
+        if all(sep and "{" not in team for team, sep, _ in pairs):
+            args.flags = {team.strip(): flag.strip() for team, _, flag in pairs}
+        else:
+            args.flags = list(args.hide_flag)
+
+    if args.variant_formats or args.variant_sizes or args.thumbnail_size:
+        from ctf_assets.utils.image_processing import ImagePostProcess
+
+        try:
+            args.post_process = ImagePostProcess(
+                sizes=tuple(args.variant_sizes or ()),
+                thumbnail=args.thumbnail_size or 256,
+                formats=args.variant_formats or "webp",
+                quality=args.variant_quality,
+                max_workers=args.variant_workers,
+            )
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return
 
     mappings = {
         "flags": "ctf_assets.flag_generator",
@@ -67,26 +300,31 @@ def main():
         "images": "ctf_assets.image_generator",
     }
 
+    # Functions defined outside their category's module
+    function_modules = {
+        "generate_procedural_flags": "ctf_assets.flag_engine",
+    }
+
+    # Replace in the function name the hyphens with underscores
+    function_name = args.function.replace("-", "_")
+
     # retrieve the module name from the mappings dictionary
-    module_name = mappings[args.asset_category]
+    module_name = function_modules.get(function_name, mappings[args.asset_category])
 
     # Only allow these functions to be called from the CLI for security reasons
     allowed_functions = {
-        "flags": {"generate_flags"},
+        "flags": {"generate_flags", "generate_procedural_flags"},
         "stories": {"generate_stories", "generate_stories_with_titles"},
-        "images": {"generate_images"},
+        "images": {"generate_images", "generate_stego_images"},
     }
 
     try:
-        # Import the module at runtime
-        module = importlib.import_module(module_name)
-
-        # Replace in the function name the hyphens with underscores
-        function_name = args.function.replace("-", "_")
-
         if function_name not in allowed_functions.get(args.asset_category, set()):
             raise AttributeError
 
+        # Import the module at runtime
+        module = importlib.import_module(module_name)
+
         # Get the function to call from the module
         func = getattr(module, function_name)
 
@@ -113,5 +351,8 @@ def main():
     except Exception as e:
         print(f"[ERROR] Unexpected error: {e}")
 
+    if args.metrics_file:
+        _write_metrics(args.metrics_file)
+
 if __name__ == "__main__":
     main()
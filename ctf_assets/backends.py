@@ -0,0 +1,462 @@
+"""
+Backends: where a Session sends its API calls.
+
+A backend performs the four operations the generators need (Responses
+calls, streamed Responses calls, image generation and listing models) and
+returns each result together with its response headers, which feed the
+session's rate limiter. Retries, rate limiting, caching and metrics stay in
+the `Session`, so they apply to every backend alike.
+
+Classes:
+    Backend: Interface implemented by all backends.
+    OpenAIBackend: The public OpenAI API (default).
+    OpenAICompatibleBackend: Any server exposing the OpenAI API at `base_url`,
+        e.g. a local vLLM, Ollama or llama.cpp server.
+    FakeBackend: Deterministic in-process answers, no network.
+
+Functions:
+    resolve_backend: Build a backend from a name, URL or instance.
+
+Example:
+    session = Session(backend="fake")
+    session = Session(backend=OpenAICompatibleBackend("http://localhost:8000/v1", default_model="llama3"))
+    session = Session(base_url="http://localhost:8000/v1")
+
+    # or for the CLI and the process-wide session
+    CTF_ASSETS_BACKEND=http://localhost:8000/v1 ctf-assets flags generate-flags --amt 50
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import warnings
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterator, Mapping
+
+from ctf_assets.config import fetch_openai_key
+from ctf_assets.utils import sdk
+from ctf_assets.utils.flag_format import FlagFormat
+from ctf_assets.utils.model_catalog import is_image_model
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
+BACKEND_NAMES = ("openai", "fake")
+
+# Headers of a call, as passed to the rate limiter
+Headers = Mapping[str, str]
+
+
+class Backend(ABC):
+    """
+    Interface for the transport a `Session` issues its calls through.
+
+    Every call returns `(result, headers)`. Results follow the shape of the
+    OpenAI SDK objects the generators read: Responses results have
+    `output_text` and `usage`, stream events have `type`, `delta` and
+    `response`, image results have `data` items carrying `b64_json`.
+
+    The seven call methods are abstract, so a backend missing one fails
+    when it is constructed rather than partway through a run.
+    """
+
+    name = "backend"
+    # Share the on-disk model catalogue of the public API
+    uses_model_catalog = False
+    # Model used when the requested one is not served by the backend
+    default_model: str | None = None
+
+    @abstractmethod
+    def create_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        ...
+
+    @abstractmethod
+    async def acreate_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        ...
+
+    @abstractmethod
+    def stream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        """Start a streamed Responses call; the stream is iterable and has `close()`."""
+
+    @abstractmethod
+    async def astream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        """Async counterpart of `stream_response`; the stream has `async close()`."""
+
+    @abstractmethod
+    def generate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        ...
+
+    @abstractmethod
+    async def agenerate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        ...
+
+    @abstractmethod
+    def list_models(self) -> frozenset[str]:
+        ...
+
+    @property
+    def client(self) -> OpenAI:
+        """An OpenAI SDK client, for APIs without a backend method (e.g. the Batch API)."""
+        raise RuntimeError(f"The {self.name} backend has no OpenAI client.")
+
+    def close(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}()"
+
+
+class OpenAIBackend(Backend):
+    """
+    The OpenAI API through the official SDK.
+
+    Clients are created lazily and kept for the lifetime of the backend, so
+    the SDK's connection pool stays warm across calls. The async client is
+    bound to the event loop that created it and rebuilt for a new loop.
+
+    Args:
+        api_key (str | None): API key. Defaults to `fetch_openai_key()`.
+        base_url (str | None): API root. Defaults to the SDK's, which honours
+            `OPENAI_BASE_URL`.
+        timeout (float): Per-request timeout in seconds. Defaults to 600.
+        http_client (Any): Optional HTTP client for the sync SDK client.
+        async_http_client (Any): Optional HTTP client for the async client.
+        max_retries (int | None): SDK-level retries. Defaults to the SDK's.
+    """
+
+    name = "openai"
+    uses_model_catalog = True
+    default_model = "gpt-4o-mini"
+
+    def __init__(
+            self,
+            api_key: str | None = None,
+            base_url: str | None = None,
+            timeout: float = 600.0,
+            http_client: Any = None,
+            async_http_client: Any = None,
+            max_retries: int | None = None,
+    ) -> None:
+        self._api_key = api_key
+        self.base_url = base_url
+        self._timeout = timeout
+        self._http_client = http_client
+        self._async_http_client = async_http_client
+        self._max_retries = max_retries
+        self._lock = threading.Lock()
+        self._client: OpenAI | None = None
+        # AsyncOpenAI connections are bound to the event loop that opened them
+        self._async_client: AsyncOpenAI | None = None
+        self._async_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def api_key(self) -> str:
+        if self._api_key is None:
+            self._api_key = fetch_openai_key(strict=True)
+        return self._api_key
+
+    def _client_options(self, http_client: Any) -> dict[str, Any]:
+        options: dict[str, Any] = {"api_key": self.api_key, "timeout": self._timeout, "http_client": http_client}
+        if self.base_url is not None:
+            options["base_url"] = self.base_url
+        if self._max_retries is not None:
+            options["max_retries"] = self._max_retries
+        return options
+
+    @property
+    def client(self) -> OpenAI:
+        """The pooled synchronous client, created on first use."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = sdk.OpenAI(**self._client_options(self._http_client))
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """The pooled async client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = sdk.AsyncOpenAI(**self._client_options(self._async_http_client))
+            self._async_loop = loop
+        return self._async_client
+
+    def create_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = self.client.responses.with_raw_response.create(**params)
+        return raw.parse(), raw.headers
+
+    async def acreate_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = await self.async_client.responses.with_raw_response.create(**params)
+        return raw.parse(), raw.headers
+
+    def stream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = self.client.responses.with_raw_response.create(**params, stream=True)
+        return raw.parse(), raw.headers
+
+    async def astream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = await self.async_client.responses.with_raw_response.create(**params, stream=True)
+        return raw.parse(), raw.headers
+
+    def generate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = self.client.images.with_raw_response.generate(**params)
+        return raw.parse(), raw.headers
+
+    async def agenerate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        raw = await self.async_client.images.with_raw_response.generate(**params)
+        return raw.parse(), raw.headers
+
+    def list_models(self) -> frozenset[str]:
+        return frozenset(model.id for model in self.client.models.list())
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+            self._async_loop = None
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(base_url={self.base_url!r})" if self.base_url else f"{type(self).__name__}()"
+
+
+class OpenAICompatibleBackend(OpenAIBackend):
+    """
+    A server exposing the OpenAI API at `base_url`, e.g. on your own hardware.
+
+    The server must implement `/v1/responses` (with structured output for
+    flags and stories) and, for images, `/v1/images/generations`. Its model
+    list is queried once per backend instead of the public API's on-disk
+    catalogue; if the server has no `/v1/models`, any model name is sent
+    as is.
+
+    Args:
+        base_url (str): API root, e.g. "http://localhost:8000/v1".
+        api_key (str | None): Key sent to the server. Defaults to
+            `OPENAI_API_KEY` or a placeholder, as local servers rarely check it.
+        default_model (str | None): Model used when a requested one is not
+            served. Defaults to the first text model the server lists.
+        **client_options: Other `OpenAIBackend` arguments.
+    """
+
+    name = "openai-compatible"
+    uses_model_catalog = False
+
+    def __init__(self, base_url: str, api_key: str | None = None, default_model: str | None = None, **client_options: Any) -> None:
+        super().__init__(
+            api_key=api_key or os.getenv("OPENAI_API_KEY") or "not-needed",
+            base_url=base_url,
+            **client_options,
+        )
+        self.default_model = default_model
+
+    def list_models(self) -> frozenset[str]:
+        try:
+            models = super().list_models()
+        except sdk.APIError as e:
+            warnings.warn(f"Could not list models at {self.base_url}: {e}. Model names are not validated.")
+            return frozenset()
+        if self.default_model is None:
+            text_models = sorted(model for model in models if not is_image_model(model))
+            self.default_model = text_models[0] if text_models else None
+        return models
+
+
+class _FakeStream:
+    def __init__(self, events: list[Any]) -> None:
+        self._events = events
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._events)
+
+    def close(self) -> None:
+        pass
+
+
+class _AsyncFakeStream(_FakeStream):
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        for event in self._events:
+            yield event
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeBackend(Backend):
+    """
+    Deterministic in-process backend: no network, no key, no cost.
+
+    Structured calls are answered with JSON that follows the request's schema
+    and holds exactly the amount the prompt asks for. Items are derived from
+    `seed` and a call counter, so the same sequence of calls always returns
+    the same items and items never repeat within a backend. Flags follow the
+    requested flag format. Useful for tests, demos and dry runs of bulk jobs.
+
+    Args:
+        seed (int): Seed of the generated items. Defaults to 0.
+        models (Iterable[str] | None): Models reported by `list_models`.
+        latency (float): Seconds to wait per call, to mimic a real API. Defaults to 0.
+    """
+
+    name = "fake"
+    default_model = "gpt-4o-mini"
+
+    _FORMAT = re.compile(r"in the format: (.+?)\. ")
+    _AMOUNT = re.compile(r"exactly (\d+)")
+    # A 1x1 transparent PNG
+    _PNG = base64.b64encode(
+        bytes.fromhex(
+            "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+            "1f15c4890000000d49444154789c6360606060000000050001a5f645400000000049454e44ae426082"
+        )
+    ).decode()
+
+    def __init__(self, seed: int = 0, models: Any = None, latency: float = 0.0) -> None:
+        self.seed = seed
+        self.models = frozenset(models or ("gpt-4o-mini", "gpt-4o", "o3-mini", "dall-e-2", "dall-e-3"))
+        self.latency = latency
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _token(self) -> str:
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        return hashlib.sha256(f"{self.seed}:{counter}".encode()).hexdigest()[:12]
+
+    def _item(self, key: str, schema: dict[str, Any], flag_format: str) -> Any:
+        if schema.get("type") == "object":
+            return {name: self._item(name, prop, flag_format) for name, prop in schema.get("properties", {}).items()}
+        token = self._token()
+        if key == "flags":
+            return FlagFormat.parse(flag_format).wrap(token)
+        if key == "title":
+            return f"Title {token}"
+        if key in ("story", "stories"):
+            return f"Story {token}: the team traced the breach back to a forgotten test server."
+        return f"{key} {token}"
+
+    def _output_text(self, params: dict[str, Any]) -> str:
+        schema = ((params.get("text") or {}).get("format") or {}).get("schema")
+        if not schema:
+            return f"A detailed illustration for a capture-the-flag challenge ({self._token()})."
+        prompt = json.dumps(params.get("input")) + json.dumps(params.get("instructions"))
+        amount = self._AMOUNT.search(prompt)
+        flag_format = self._FORMAT.search(str(params.get("instructions") or ""))
+        output = {}
+        for key, prop in schema.get("properties", {}).items():
+            fmt = flag_format.group(1) if flag_format else "ctf{..}"
+            if prop.get("type") == "array":
+                count = int(amount.group(1)) if amount else 1
+                output[key] = [self._item(key, prop.get("items", {}), fmt) for _ in range(count)]
+            else:
+                output[key] = self._item(key, prop, fmt)
+        return json.dumps(output)
+
+    @staticmethod
+    def _usage(params: dict[str, Any], text: str) -> dict[str, Any]:
+        instructions = len(str(params.get("instructions") or "")) // 4
+        input_tokens = instructions + len(json.dumps(params.get("input"))) // 4
+        return {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": instructions},
+            "output_tokens": len(text) // 4,
+            "total_tokens": input_tokens + len(text) // 4,
+        }
+
+    def _response(self, params: dict[str, Any]) -> Any:
+        text = self._output_text(params)
+        return SimpleNamespace(output_text=text, usage=self._usage(params, text), model=params.get("model"))
+
+    def _events(self, params: dict[str, Any]) -> list[Any]:
+        response = self._response(params)
+        text = response.output_text
+        events = [SimpleNamespace(type="response.output_text.delta", delta=text[i:i + 16]) for i in range(0, len(text), 16)]
+        events.append(SimpleNamespace(type="response.completed", response=response))
+        return events
+
+    def _images(self, params: dict[str, Any]) -> Any:
+        return SimpleNamespace(data=[{"b64_json": self._PNG} for _ in range(int(params.get("n") or 1))])
+
+    def create_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._response(params), None
+
+    async def acreate_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._response(params), None
+
+    def stream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            time.sleep(self.latency)
+        return _FakeStream(self._events(params)), None
+
+    async def astream_response(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return _AsyncFakeStream(self._events(params)), None
+
+    def generate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._images(params), None
+
+    async def agenerate_images(self, params: dict[str, Any]) -> tuple[Any, Headers | None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._images(params), None
+
+    def list_models(self) -> frozenset[str]:
+        return self.models
+
+    def __repr__(self) -> str:
+        return f"FakeBackend(seed={self.seed})"
+
+
+def resolve_backend(backend: Backend | str | None = None, base_url: str | None = None, **client_options: Any) -> Backend:
+    """
+    Build the backend a `Session` uses.
+
+    Args:
+        backend (Backend | str | None): A backend instance, "openai", "fake",
+            or the URL of an OpenAI-compatible server. Defaults to the
+            `CTF_ASSETS_BACKEND` environment variable, then "openai".
+        base_url (str | None): Shortcut for an OpenAI-compatible server.
+        **client_options: `OpenAIBackend` arguments (api_key, timeout,
+            http_client, async_http_client, max_retries). Ignored for
+            backend instances and the fake backend.
+
+    Returns:
+        Backend: The resolved backend.
+
+    Raises:
+        ValueError: If `backend` is not a known name or URL.
+    """
+    if isinstance(backend, Backend):
+        return backend
+
+    name = (backend or os.getenv("CTF_ASSETS_BACKEND") or "openai").strip()
+    if base_url or "://" in name:
+        return OpenAICompatibleBackend(base_url or name, **client_options)
+    if name.lower() == "openai":
+        return OpenAIBackend(**client_options)
+    if name.lower() == "fake":
+        return FakeBackend()
+    raise ValueError(f"Unknown backend {name!r}; expected one of {', '.join(BACKEND_NAMES)} or a server URL.")
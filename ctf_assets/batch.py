@@ -0,0 +1,275 @@
+"""
+Bulk manifest runner.
+
+Runs a manifest of mixed flag, story and image jobs in one process on the
+async API, with a concurrency limit. Each result is appended to an output
+JSONL file as soon as its job finishes, and a summary reports per-job
+latency and failures.
+
+Manifest format (JSONL, one job per line; YAML or JSON lists also work):
+
+    {"id": "intro-flag", "asset": "flags", "theme": "Pirates", "amt": 3}
+    {"asset": "stories", "function": "generate_stories_with_titles", "theme": "Mars"}
+    {"asset": "images", "theme": "Star Wars", "output_dir": "event/images"}
+
+`asset` is required. `function` defaults to the main generator of the asset
+category and `id` defaults to the job's position in the manifest. Every
+other key is passed to the generator.
+
+Functions:
+    - load_manifest: Read jobs from a JSONL, JSON or YAML manifest.
+    - run_batch: Run jobs concurrently and stream results to a JSONL file.
+    - format_summary: Render a BatchSummary as text.
+
+Example:
+    summary = asyncio.run(run_batch(load_manifest("jobs.jsonl"), "results.jsonl", concurrency=8))
+    print(format_summary(summary))
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import importlib
+import inspect
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ctf_assets.session import Session, get_default_session
+
+# Async generator for each (asset, function) pair allowed in a manifest
+_JOB_FUNCTIONS = {
+    "flags": {
+        "generate_flags": ("ctf_assets.flag_generator", "agenerate_flags"),
+        "generate_procedural_flags": ("ctf_assets.flag_engine", "agenerate_procedural_flags"),
+    },
+    "stories": {
+        "generate_stories": ("ctf_assets.story_generator", "agenerate_stories"),
+        "generate_stories_with_titles": ("ctf_assets.story_generator", "agenerate_stories_with_titles"),
+    },
+    "images": {
+        "generate_images": ("ctf_assets.image_generator", "agenerate_images"),
+        "generate_stego_images": ("ctf_assets.image_generator", "agenerate_stego_images"),
+    },
+}
+
+_DEFAULT_FUNCTIONS = {
+    "flags": "generate_flags",
+    "stories": "generate_stories",
+    "images": "generate_images",
+}
+
+
+@dataclass(frozen=True)
+class JobResult:
+    id: str
+    asset: str
+    function: str
+    ok: bool
+    latency: float
+    result: Any = None
+    error: str | None = None
+
+
+@dataclass
+class BatchSummary:
+    results: list[JobResult] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    @property
+    def failures(self) -> list[JobResult]:
+        return [r for r in self.results if not r.ok]
+
+
+def load_manifest(path: str | Path) -> list[dict[str, Any]]:
+    """
+    Read jobs from a manifest file.
+
+    `.jsonl` files hold one job object per line (blank lines and lines
+    starting with "#" are skipped). `.json` files hold a list of jobs.
+    `.yaml`/`.yml` files hold a list of jobs or a mapping with a `jobs` list
+    and require PyYAML.
+
+    Raises:
+        ValueError: If the manifest is malformed.
+        RuntimeError: If a YAML manifest is given and PyYAML is not installed.
+    """
+    path = Path(path).expanduser()
+    text = path.read_text(encoding="utf-8")
+    suffix = path.suffix.lower()
+
+    if suffix in {".yaml", ".yml"}:
+        try:
+            import yaml
+        except ImportError as e:
+            raise RuntimeError("YAML manifests require PyYAML: pip install 'ctf-assets[yaml]'") from e
+        data = yaml.safe_load(text)
+        jobs = data.get("jobs") if isinstance(data, dict) else data
+    elif suffix == ".json":
+        jobs = json.loads(text)
+    else:
+        jobs = []
+        for lineno, line in enumerate(text.splitlines(), start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                jobs.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{lineno}: invalid JSON ({e.msg})") from e
+
+    if not isinstance(jobs, list) or not all(isinstance(job, dict) for job in jobs):
+        raise ValueError(f"{path}: manifest must be a list of job objects")
+    return jobs
+
+
+def _resolve_job(job: dict[str, Any]):
+    """Return (asset, function name, async callable, kwargs) for a manifest job."""
+    params = dict(job)
+    params.pop("id", None)
+    asset = params.pop("asset", None)
+    if asset not in _JOB_FUNCTIONS:
+        raise ValueError(f"Unknown asset {asset!r}. Use one of: {', '.join(_JOB_FUNCTIONS)}")
+
+    function_name = str(params.pop("function", _DEFAULT_FUNCTIONS[asset])).replace("-", "_")
+    if function_name not in _JOB_FUNCTIONS[asset]:
+        raise ValueError(f"Function {function_name!r} is not allowed for asset {asset!r}")
+
+    module_name, attr = _JOB_FUNCTIONS[asset][function_name]
+    func = getattr(importlib.import_module(module_name), attr)
+
+    accepted = inspect.signature(func).parameters
+    unknown = sorted(k for k in params if k not in accepted or k == "session")
+    if unknown:
+        raise TypeError(f"Unexpected parameters for {function_name}: {', '.join(unknown)}")
+
+    return asset, function_name, func, params
+
+
+def _jsonable(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    return value
+
+
+def _output_files(job_result: JobResult) -> list[str]:
+    """Resolved paths of the files an image job reports writing."""
+    result = job_result.result
+    if job_result.asset != "images" or not job_result.ok:
+        return []
+    if isinstance(result, dict):
+        files = list(result.get("files") or [])
+        for paths in (result.get("variants") or {}).values():
+            files.extend(paths)
+        files.extend((result.get("stego") or {}).values())
+    elif isinstance(result, list):
+        files = result
+    else:
+        return []
+    return [str(Path(f).resolve()) for f in files if isinstance(f, str)]
+
+
+async def run_batch(
+        jobs: list[dict[str, Any]],
+        output: str | Path,
+        concurrency: int = 8,
+        session: Session | None = None,
+        defaults: dict[str, Any] | None = None,
+) -> BatchSummary:
+    """
+    Run manifest jobs concurrently and stream results to a JSONL file.
+
+    Each job is written to `output` as soon as it finishes, so a long run
+    can be followed with `tail -f` and partial results survive a crash. A
+    failing job is recorded with its error and does not stop the batch. An
+    image job reporting a file another job already reported is recorded as
+    failed, since one of them no longer holds what it claims.
+
+    Args:
+        jobs (list[dict]): Jobs as returned by `load_manifest`.
+        output (str | Path): Output JSONL file. Overwritten if it exists.
+        concurrency (int): Maximum number of jobs in flight. Defaults to 8.
+        session (Session | None): Session shared by all jobs. Defaults to the process-wide session.
+        defaults (dict | None): Parameters applied to every job that accepts
+            them, unless the job sets them itself (e.g. `{"cache": False}`).
+
+    Returns:
+        BatchSummary: Per-job results and the total wall time.
+    """
+    session = session or get_default_session()
+    defaults = defaults or {}
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    summary = BatchSummary()
+
+    output = Path(output).expanduser()
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    async def _run(index: int, job: dict[str, Any]) -> JobResult:
+        job_id = str(job.get("id", index))
+        asset = str(job.get("asset", ""))
+        function_name = str(job.get("function", _DEFAULT_FUNCTIONS.get(asset, "")))
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                asset, function_name, func, params = _resolve_job(job)
+                accepted = inspect.signature(func).parameters
+                kwargs = {k: v for k, v in defaults.items() if k in accepted}
+                kwargs.update(params)
+                result = await func(session=session, **kwargs)
+            except Exception as e:
+                return JobResult(job_id, asset, function_name, False, time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            return JobResult(job_id, asset, function_name, True, time.perf_counter() - start, result=_jsonable(result))
+
+    # Output file -> id of the job that reported it first
+    owners: dict[str, str] = {}
+
+    started = time.perf_counter()
+    with output.open("w", encoding="utf-8") as fh:
+        tasks = [asyncio.ensure_future(_run(i, job)) for i, job in enumerate(jobs)]
+        for next_done in asyncio.as_completed(tasks):
+            job_result = await next_done
+            files = _output_files(job_result)
+            shared = [f for f in files if f in owners]
+            if shared:
+                job_result = dataclasses.replace(
+                    job_result, ok=False,
+                    error=f"Output file(s) also reported by job {owners[shared[0]]!r}: {', '.join(shared)}",
+                )
+            for f in files:
+                owners.setdefault(f, job_result.id)
+            summary.results.append(job_result)
+            fh.write(json.dumps(dataclasses.asdict(job_result), ensure_ascii=False) + "\n")
+            fh.flush()
+    summary.wall_time = time.perf_counter() - started
+
+    return summary
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def format_summary(summary: BatchSummary) -> str:
+    """Render per-job latency, failures and aggregate latency percentiles."""
+    lines = [f"{'job':<24} {'asset':<8} {'status':<6} {'latency':>9}"]
+    for r in sorted(summary.results, key=lambda r: r.id):
+        lines.append(f"{r.id[:24]:<24} {r.asset[:8]:<8} {'ok' if r.ok else 'FAIL':<6} {r.latency:>8.2f}s")
+
+    latencies = [r.latency for r in summary.results]
+    lines.append("")
+    lines.append(
+        f"{len(summary.results)} jobs, {len(summary.failures)} failed, "
+        f"wall {summary.wall_time:.2f}s, "
+        f"p50 {_percentile(latencies, 50):.2f}s, p95 {_percentile(latencies, 95):.2f}s, "
+        f"max {max(latencies, default=0.0):.2f}s"
+    )
+    for r in summary.failures:
+        lines.append(f"  [{r.id}] {r.error}")
+    return "\n".join(lines)
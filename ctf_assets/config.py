@@ -2,6 +2,7 @@
 
 import os
 import warnings
+from pathlib import Path
 
 # Cache for the OpenAI API key
 _openai_api_key = None
@@ -55,3 +56,66 @@ def fetch_openai_key(strict: bool = True) -> str | None:
         _openai_api_key = key
 
     return _openai_api_key
+
+
+# Default lifetime of the on-disk model catalogue, in seconds (one day)
+DEFAULT_MODEL_CACHE_TTL = 24 * 60 * 60
+
+
+def cache_dir() -> Path:
+    """
+    Return the directory used for ctf-assets on-disk caches.
+
+    Resolved from `CTF_ASSETS_CACHE_DIR`, then `$XDG_CACHE_HOME/ctf_assets`,
+    then `~/.cache/ctf_assets`. The directory is not created here.
+
+    Returns:
+        Path: The cache directory.
+    """
+    override = os.getenv("CTF_ASSETS_CACHE_DIR")
+    if override:
+        return Path(override).expanduser()
+
+    base = os.getenv("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base).expanduser() / "ctf_assets"
+
+
+def model_cache_ttl() -> float:
+    """
+    Return the model catalogue TTL in seconds.
+
+    Read from `CTF_ASSETS_MODEL_CACHE_TTL`; falls back to one day if the
+    variable is missing or not a number. A TTL of 0 disables the disk cache.
+    """
+    value = os.getenv("CTF_ASSETS_MODEL_CACHE_TTL")
+    if value is None:
+        return DEFAULT_MODEL_CACHE_TTL
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        warnings.warn(f"Invalid CTF_ASSETS_MODEL_CACHE_TTL={value!r}. Using {DEFAULT_MODEL_CACHE_TTL}s.")
+        return DEFAULT_MODEL_CACHE_TTL
+
+
+def flag_secret(strict: bool = True) -> bytes | None:
+    """
+    Return the secret used to derive per-team flags.
+
+    Read from `CTF_ASSETS_FLAG_SECRET` (environment or `.env`). Keep it out of
+    the repository: anyone holding it can compute every team's flags.
+
+    Args:
+        strict (bool): Raise if the secret is missing instead of returning None. Defaults to True.
+
+    Raises:
+        RuntimeError: If `strict=True` and the secret is missing.
+    """
+    value = os.getenv("CTF_ASSETS_FLAG_SECRET")
+    if not value:
+        if strict:
+            raise RuntimeError(
+                "CTF_ASSETS_FLAG_SECRET is missing! "
+                "Set it in your system environment variables or .env file, or pass secret= explicitly."
+            )
+        return None
+    return value.encode("utf-8")
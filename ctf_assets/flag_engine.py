@@ -0,0 +1,751 @@
+"""
+Procedural flag engine: LLM-seeded word pools, local expansion.
+
+`generate_flags` pays one model round trip per batch of flags, which is too
+slow for tens of thousands of per-team or per-instance flags. This module
+makes a single call for themed vocabulary (adjectives, nouns and verbs),
+caches it through the session's response cache, and then composes flags
+locally in `flag_format`:
+
+    ctf{st34lthy_r0ck3t_orbits_5c0e9a}
+
+Each flag takes one spelling per word slot, with leetspeak spellings added
+to the pools, and a random hex tail long enough to reach `entropy_bits`.
+Flags are picked through a seeded permutation of every possible flag, so
+an engine never repeats one, and the same seed, pools and options give the
+same flags on every machine. With NumPy installed
+(`pip install 'ctf-assets[fast]'`) composition is vectorized and runs at
+millions of flags per second on one core; without it a pure Python path
+produces identical flags at around a hundred thousand per second.
+
+Classes:
+    WordPools: Normalized adjective, noun and verb pools.
+    FlagEngine: Seeded, vectorized composition of flags from word pools.
+
+Functions:
+    fetch_word_pools: One LLM call for themed word pools.
+    afetch_word_pools: Async counterpart of fetch_word_pools.
+    generate_procedural_flags: Fetch (or reuse) pools and expand them to `amt` flags.
+    agenerate_procedural_flags: Async counterpart of generate_procedural_flags.
+
+Example:
+    flags = generate_procedural_flags(theme="NASA", amt=50_000, seed=7)
+
+    pools = fetch_word_pools(theme="NASA", language="en")
+    engine = FlagEngine(pools, flag_format="FLAG{..}", entropy_bits=64, seed=7)
+    for batch in engine.iter_batches(1_000_000):
+        write(batch)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import re
+import sys
+import unicodedata
+from array import array
+from dataclasses import dataclass
+from typing import Any, Iterable, Iterator
+
+from ctf_assets.session import Session, get_default_session
+from ctf_assets.utils import sdk
+from ctf_assets.utils.flag_format import BODY_CHARS, MAX_BODY_LENGTH, FlagFormat
+from ctf_assets.utils.flag_index import FlagIndex, resolve_flag_index
+from ctf_assets.utils.prompts import word_pool_prompt_parts
+from ctf_assets.utils.response_parser import parse_word_pools
+
+POOL_NAMES = ("adjectives", "nouns", "verbs")
+
+# Letters swapped for digits in leetspeak spellings
+LEET_MAP = {"a": "4", "e": "3", "i": "1", "o": "0", "s": "5", "t": "7"}
+_LEET_TABLE = str.maketrans(LEET_MAP)
+
+MAX_WORD_LENGTH = 12
+
+# Characters of normalized words and hex tails; a separator needs one character
+# outside this set, or slot boundaries (and so distinct flags) become ambiguous
+_SLOT_CHARS = re.compile(r"[a-z0-9]*")
+_SEPARATOR = re.compile(rf"[{BODY_CHARS}]+")
+
+# Flags composed per vectorized step; bounds the memory of one step
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Neighbouring slots are merged into one lookup table up to this many entries,
+# so each flag is joined from fewer pieces
+_FUSE_LIMIT = 1 << 16
+
+# Slot combinations numbered by the permutation, within uint64 arithmetic
+_PERMUTED_LIMIT = 1 << 62
+_FEISTEL_ROUNDS = 4
+_MIX = (0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+_MASK64 = (1 << 64) - 1
+
+# Array typecode of unsigned 32-bit draws for the pure Python path
+_U32 = next(code for code in ("I", "L") if array(code).itemsize == 4)
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def normalize_word(word: str) -> str:
+    """Lowercase ASCII form of `word` with everything but letters and digits removed."""
+    ascii_word = unicodedata.normalize("NFKD", word).encode("ascii", "ignore").decode("ascii").lower()
+    return re.sub(r"[^a-z0-9]", "", ascii_word)[:MAX_WORD_LENGTH]
+
+
+def leet_variants(word: str, limit: int = 3) -> list[str]:
+    """
+    Spellings of `word`: itself, its full leetspeak form, then one-letter substitutions.
+
+    Args:
+        word (str): A normalized word.
+        limit (int): Maximum number of spellings; 1 keeps only the word. Defaults to 3.
+    """
+    variants = [word]
+    candidates = [word.translate(_LEET_TABLE)]
+    candidates += [word.replace(letter, LEET_MAP[letter]) for letter in dict.fromkeys(word) if letter in LEET_MAP]
+    for candidate in candidates:
+        if len(variants) >= limit:
+            break
+        if candidate not in variants:
+            variants.append(candidate)
+    return variants[:max(1, limit)]
+
+
+@dataclass(frozen=True)
+class WordPools:
+    """Adjective, noun and verb pools, normalized and deduplicated."""
+
+    adjectives: tuple[str, ...] = ()
+    nouns: tuple[str, ...] = ()
+    verbs: tuple[str, ...] = ()
+
+    @classmethod
+    def from_lists(cls, **pools: Iterable[str]) -> WordPools:
+        """
+        Build pools from raw word lists, e.g. a model response or your own vocabulary.
+
+        Words are reduced to lowercase ASCII letters and digits; words shorter
+        than two characters and repeats are dropped. Unknown pool names are ignored.
+        """
+        cleaned = {}
+        for name in POOL_NAMES:
+            words = (normalize_word(word) for word in pools.get(name, ()) if isinstance(word, str))
+            cleaned[name] = tuple(dict.fromkeys(word for word in words if len(word) >= 2))
+        return cls(**cleaned)
+
+    def __getitem__(self, name: str) -> tuple[str, ...]:
+        if name not in POOL_NAMES:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def to_dict(self) -> dict[str, list[str]]:
+        return {name: list(self[name]) for name in POOL_NAMES}
+
+
+class _Permutation:
+    """
+    Keyed bijection of range(size): a balanced Feistel network over the
+    next even number of bits, cycle-walked back into range. Walking a counter
+    through it gives pseudo-random values that never repeat.
+    """
+
+    def __init__(self, size: int, rng: random.Random) -> None:
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.size = size
+        self.half = bits // 2
+        self.mask = (1 << self.half) - 1
+        self.keys = [rng.getrandbits(64) for _ in range(_FEISTEL_ROUNDS)]
+
+    def values(self, start: int, n: int) -> list[int]:
+        """Images of start, start + 1, ..., start + n - 1."""
+        half, mask, size, keys = self.half, self.mask, self.size, self.keys
+        mix0, mix1 = _MIX
+        out = []
+        for value in range(start, start + n):
+            while True:
+                left, right = value >> half, value & mask
+                for key in keys:
+                    mixed = ((right ^ key) * mix0) & _MASK64
+                    mixed = ((mixed ^ (mixed >> 31)) * mix1) & _MASK64
+                    left, right = right, left ^ ((mixed >> 32) & mask)
+                value = (left << half) | right
+                if value < size:
+                    break
+            out.append(value)
+        return out
+
+    def _feistel_array(self, np: Any, values: Any) -> Any:
+        # Same rounds as `values` on uint64 arrays, which wrap like the masked ints
+        half, mask = np.uint64(self.half), np.uint64(self.mask)
+        left, right = values >> half, values & mask
+        for key in self.keys:
+            mixed = (right ^ np.uint64(key)) * np.uint64(_MIX[0])
+            mixed = (mixed ^ (mixed >> np.uint64(31))) * np.uint64(_MIX[1])
+            left, right = right, left ^ ((mixed >> np.uint64(32)) & mask)
+        return (left << half) | right
+
+    def array(self, np: Any, values: Any) -> Any:
+        values = self._feistel_array(np, values)
+        pending = np.flatnonzero(values >= self.size)
+        while pending.size:
+            values[pending] = self._feistel_array(np, values[pending])
+            pending = pending[values[pending] >= self.size]
+        return values
+
+
+class FlagEngine:
+    """
+    Compose flags locally from word pools.
+
+    A flag is `flag_format` around `words` word slots joined by `separator`,
+    cycling through adjectives, nouns and verbs, plus a random hex tail when
+    the slots alone give less than `entropy_bits` bits. Every slot and tail
+    digit is drawn uniformly, so `entropy_bits` is exact as long as words
+    don't contain the separator.
+
+    Flags are numbered through a seeded permutation of all possible flags,
+    so an engine never repeats one and needs no record of what it issued.
+    This is not a cryptographic generator: flags are hard to guess from the
+    theme, not from a large sample of other flags.
+
+    Args:
+        pools (WordPools): Vocabulary to draw from.
+        flag_format (str): Flag template, e.g. "ctf{..}". Defaults to "ctf{..}".
+        words (int): Word slots per flag. Defaults to 3.
+        leet (int): Spellings per word, leetspeak ones included; 1 turns leetspeak off. Defaults to 3.
+        entropy_bits (float): Minimum entropy per flag, in bits. Defaults to 48.
+        separator (str): Text between slots: flag body characters, at least one
+            of them neither a lowercase letter nor a digit. Defaults to "_".
+        seed (int | None): Seed for reproducible output. Defaults to None (random).
+        use_numpy (bool | None): Force the NumPy (True) or pure Python (False)
+            path. Defaults to None: NumPy when installed.
+
+    Raises:
+        ValueError: If a pool the slots need is empty, there is nothing to
+            draw, the separator is invalid or the longest flag body would
+            exceed `MAX_BODY_LENGTH`.
+        RuntimeError: If use_numpy=True and NumPy is not installed.
+    """
+
+    def __init__(
+            self,
+            pools: WordPools,
+            flag_format: str = "ctf{..}",
+            words: int = 3,
+            leet: int = 3,
+            entropy_bits: float = 48.0,
+            separator: str = "_",
+            seed: int | None = None,
+            use_numpy: bool | None = None,
+    ) -> None:
+        self.pools = pools
+        self.format = FlagFormat.parse(flag_format)
+        self.pattern = tuple(POOL_NAMES[i % len(POOL_NAMES)] for i in range(max(0, int(words))))
+        self.separator = separator
+        self.seed = seed
+        self._rng = random.Random(seed)
+
+        np = _numpy() if use_numpy is not False else None
+        if use_numpy and np is None:
+            raise RuntimeError("use_numpy=True requires NumPy: pip install 'ctf-assets[fast]'")
+
+        columns = self._word_columns(max(1, int(leet)))
+        bits = sum(math.log2(len(column)) for column in columns)
+        tail_digits = max(0, math.ceil((float(entropy_bits) - bits) / 4))
+        columns += self._tail_columns(tail_digits, leading=bool(columns))
+        if not columns:
+            raise ValueError("Nothing to draw: use at least one word slot or a positive entropy_bits")
+        joins = len(self.pattern) + bool(tail_digits) - 1
+        if joins and (not _SEPARATOR.fullmatch(separator) or _SLOT_CHARS.fullmatch(separator)):
+            raise ValueError(
+                f"Invalid separator {separator!r}: use flag body characters (letters, digits, _-!?@$.+), "
+                f"at least one of them not a lowercase letter or digit"
+            )
+        longest = sum(max(len(piece) for piece in column) for column in columns)
+        if longest > MAX_BODY_LENGTH:
+            raise ValueError(
+                f"Flag bodies of up to {longest} characters exceed the {MAX_BODY_LENGTH} a flag may hold; "
+                f"lower entropy_bits or words"
+            )
+        sample = self.format.wrap("".join(column[0] for column in columns))
+        if not self.format.matches(sample):
+            raise ValueError(f"Flags such as {sample!r} don't match {self.format}")
+
+        self._columns = self._fuse(columns)
+        # Fixed text goes into the first and last table, not into every join
+        self._columns[0] = [f"{self.format.prefix}{piece}" for piece in self._columns[0]]
+        self._columns[-1] = [f"{piece}{self.format.suffix}" for piece in self._columns[-1]]
+        self._sizes = [len(column) for column in self._columns]
+
+        # The leading slots, up to 2**62 combinations, are numbered through the
+        # permutation, which is what keeps flags distinct; any slots past that
+        # (only at very high entropy_bits) are drawn from the seeded stream
+        self._permuted = 1
+        while self._permuted < len(self._sizes) and math.prod(self._sizes[:self._permuted + 1]) <= _PERMUTED_LIMIT:
+            self._permuted += 1
+        self._permutation = _Permutation(math.prod(self._sizes[:self._permuted]), self._rng)
+        self._issued = 0
+
+        # NumPy path: each table as NUL-padded UTF-8 bytes, the last piece of
+        # every flag ending in a newline. Pieces that contain either character
+        # can't be packed that way and use the pure Python path.
+        packable = not any("\0" in piece or "\n" in piece for column in self._columns for piece in column)
+        self._np = np if packable else None
+        if self._np is not None:
+            self._byte_columns = [np.array([piece.encode("utf-8") for piece in column]) for column in self._columns]
+            self._byte_columns[-1] = np.array([piece.encode("utf-8") + b"\n" for piece in self._columns[-1]])
+            widths = [table.dtype.itemsize for table in self._byte_columns]
+            self._byte_offsets = [sum(widths[:slot]) for slot in range(len(widths) + 1)]
+
+    def _word_columns(self, leet: int) -> list[list[str]]:
+        columns = []
+        for slot, name in enumerate(self.pattern):
+            if not self.pools[name]:
+                raise ValueError(f"The {name} pool is empty")
+            spellings = dict.fromkeys(variant for word in self.pools[name] for variant in leet_variants(word, leet))
+            lead = self.separator if slot else ""
+            columns.append([f"{lead}{spelling}" for spelling in spellings])
+        return columns
+
+    def _tail_columns(self, digits: int, leading: bool) -> list[list[str]]:
+        columns = []
+        while digits > 0:
+            width = min(2, digits)
+            lead = self.separator if leading and not columns else ""
+            columns.append([f"{lead}{value:0{width}x}" for value in range(16 ** width)])
+            digits -= width
+        return columns
+
+    @staticmethod
+    def _fuse(columns: list[list[str]]) -> list[list[str]]:
+        fused = [columns[0]]
+        for column in columns[1:]:
+            if len(fused[-1]) * len(column) <= _FUSE_LIMIT:
+                fused[-1] = [f"{left}{right}" for left in fused[-1] for right in column]
+            else:
+                fused.append(column)
+        return fused
+
+    @property
+    def entropy_bits(self) -> float:
+        """Entropy of one flag, in bits."""
+        return sum(math.log2(size) for size in self._sizes)
+
+    @property
+    def space(self) -> int:
+        """Number of distinct flags the engine can produce."""
+        return math.prod(self._sizes)
+
+    @property
+    def remaining(self) -> int:
+        """Flags this engine can still issue without repeating one."""
+        return self._permutation.size - self._issued
+
+    @property
+    def vectorized(self) -> bool:
+        """Whether flags are composed with NumPy."""
+        return self._np is not None
+
+    def _draw(self, n: int) -> list[str]:
+        # Flags number self._issued onwards, mapped through the permutation and
+        # split into one index per permuted slot. Other slots take a 32-bit draw
+        # each from the seeded stream, index (draw * size) >> 32. Both paths
+        # compute exactly the same indices.
+        start, self._issued = self._issued, self._issued + n
+        permuted, free = self._sizes[:self._permuted], self._sizes[self._permuted:]
+        data = self._rng.randbytes(4 * n * len(free)) if free else b""
+
+        np = self._np
+        if np is not None:
+            numbers = self._permutation.array(np, np.arange(start, start + n, dtype=np.uint64))
+            indexes = []
+            for size in permuted:
+                indexes.append((numbers % np.uint64(size)).astype(np.intp))
+                numbers //= np.uint64(size)
+            draws = np.frombuffer(data, dtype="<u4").reshape(len(free), n).astype(np.uint64)
+            indexes += [((row * np.uint64(size)) >> np.uint64(32)).astype(np.intp) for row, size in zip(draws, free)]
+
+            # Gather each slot's pieces into its byte columns of an (n, width)
+            # matrix, drop the NUL padding, and split the text once at the newlines
+            offsets = self._byte_offsets
+            matrix = np.empty((n, offsets[-1]), dtype=np.uint8)
+            for slot, (index, table) in enumerate(zip(indexes, self._byte_columns)):
+                width = offsets[slot + 1] - offsets[slot]
+                matrix[:, offsets[slot]:offsets[slot + 1]] = table.take(index).view(np.uint8).reshape(n, width)
+            return matrix[matrix != 0].tobytes().decode("utf-8").split("\n")[:-1]
+
+        pieces = []
+        numbers = self._permutation.values(start, n)
+        for table, size in zip(self._columns, permuted):
+            pieces.append([table[number % size] for number in numbers])
+            numbers = [number // size for number in numbers]
+        draws = array(_U32)
+        draws.frombytes(data)
+        if sys.byteorder == "big":
+            draws.byteswap()
+        for slot, (table, size) in enumerate(zip(self._columns[self._permuted:], free)):
+            pieces.append([table[(draw * size) >> 32] for draw in draws[slot * n:(slot + 1) * n]])
+        return pieces[0] if len(pieces) == 1 else list(map("".join, zip(*pieces)))
+
+    def iter_batches(
+            self,
+            amt: int,
+            batch_size: int = DEFAULT_CHUNK_SIZE,
+            unique_index: FlagIndex | None = None,
+    ) -> Iterator[list[str]]:
+        """
+        Yield `amt` new flags in lists of up to `batch_size`.
+
+        Args:
+            amt (int): Total number of flags.
+            batch_size (int): Flags per yielded list. Defaults to 65536.
+            unique_index (FlagIndex | None): Also skip flags issued before,
+                e.g. by runs with another seed, and record the new ones.
+
+        Raises:
+            ValueError: If the engine has fewer than `amt` unissued flags left.
+        """
+        amt = max(0, int(amt))
+        batch_size = max(1, int(batch_size))
+        remaining = amt
+        while remaining > 0:
+            if remaining > self.remaining:
+                raise ValueError(
+                    f"Only {self.remaining} more distinct flags are possible with these pools; "
+                    f"raise entropy_bits or words to get {amt}"
+                )
+            batch = self._draw(min(remaining, batch_size))
+            if unique_index is not None:
+                # Dropped flags are replaced by the next ones of the permutation
+                batch = unique_index.claim(batch)
+            if batch:
+                remaining -= len(batch)
+                yield batch
+
+    def generate(self, amt: int, unique_index: FlagIndex | None = None) -> list[str]:
+        """Return `amt` new flags; see `iter_batches`."""
+        flags: list[str] = []
+        for batch in self.iter_batches(amt, unique_index=unique_index):
+            flags.extend(batch)
+        return flags
+
+    def __repr__(self) -> str:
+        return (
+            f"FlagEngine(format={str(self.format)!r}, pattern={self.pattern}, "
+            f"entropy_bits={self.entropy_bits:.1f}, vectorized={self.vectorized})"
+        )
+
+
+def _word_pool_request(
+        session: Session,
+        theme: str,
+        tone: str,
+        pool_size: int,
+        model: str,
+        language: str,
+        additional_instructions: str,
+        additional_system_instructions: str,
+        temperature: float,
+) -> dict:
+    """Responses API parameters for the word-pool call."""
+    # Word pools are flag vocabulary, so they follow the session's "flags" route
+    model = session.route("flags", model)
+
+    instructions, prompt = word_pool_prompt_parts(
+        theme=theme,
+        tone=tone,
+        amt=pool_size,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+    )
+
+    responses_parameters = {
+        "model": model,
+        "instructions": instructions,
+        "input": prompt,
+        "text": session.schemas["word_pools"],
+    }
+    if session.supports_temperature(model):
+        responses_parameters["temperature"] = temperature
+    return responses_parameters
+
+
+def _pools_from_output(output_text: str) -> WordPools:
+    pools = WordPools.from_lists(**parse_word_pools(output_text))
+    missing = [name for name in POOL_NAMES if not pools[name]]
+    if missing:
+        raise RuntimeError(f"The model returned no usable {', '.join(missing)} for the word pools")
+    return pools
+
+
+def fetch_word_pools(
+        theme: str = "",
+        tone: str = "neutral",
+        pool_size: int = 64,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.9,
+        session: Session | None = None,
+        cache: bool = True,
+        refresh: bool = False,
+) -> WordPools:
+    """
+    Ask the model once for themed adjectives, nouns and verbs.
+
+    The response is kept in the session's response cache (on by default), so
+    later runs with the same theme, language and model reuse the pools
+    without a call.
+
+    Args:
+        theme (str): The thematic context for the words. Defaults to an empty string.
+        tone (str): Desired tone of the words. Defaults to "neutral".
+        pool_size (int): Words asked per pool. Defaults to 64.
+        model (str): OpenAI model name to use. Defaults to "gpt-4o-mini".
+        language (str): Language of the words. Defaults to "es-PR".
+        additional_instructions (str): Optional extra instructions for the word choice.
+        additional_system_instructions (str): Optional system-level instructions for the LLM.
+        temperature (float): Sampling temperature. Defaults to 0.9.
+        session (Session | None): Session to call through. Defaults to the process-wide session.
+        cache (bool): Serve and store the pools in the response cache. Defaults to True.
+        refresh (bool): Ask the model again and replace the cached pools. Defaults to False.
+
+    Returns:
+        WordPools: The normalized pools.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails or a pool comes back empty.
+    """
+    session = session or get_default_session()
+    metrics = session.metrics
+
+    with metrics.stage("procedural_flags", "prompt_build"):
+        responses_parameters = _word_pool_request(
+            session=session,
+            theme=theme,
+            tone=tone,
+            pool_size=pool_size,
+            model=model,
+            language=language,
+            additional_instructions=additional_instructions,
+            additional_system_instructions=additional_system_instructions,
+            temperature=temperature,
+        )
+
+    try:
+        with metrics.stage("procedural_flags", "network"):
+            output_text = session.respond(responses_parameters, cache=cache, refresh=refresh, route="flags")
+
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
+
+    with metrics.stage("procedural_flags", "parse"):
+        return _pools_from_output(output_text)
+
+
+async def afetch_word_pools(
+        theme: str = "",
+        tone: str = "neutral",
+        pool_size: int = 64,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.9,
+        session: Session | None = None,
+        cache: bool = True,
+        refresh: bool = False,
+) -> WordPools:
+    """Async counterpart of `fetch_word_pools`."""
+    session = session or get_default_session()
+    metrics = session.metrics
+
+    # Model validation may hit the network the first time, keep it off the event loop
+    with metrics.stage("procedural_flags", "prompt_build"):
+        responses_parameters = await asyncio.to_thread(
+            _word_pool_request,
+            session=session,
+            theme=theme,
+            tone=tone,
+            pool_size=pool_size,
+            model=model,
+            language=language,
+            additional_instructions=additional_instructions,
+            additional_system_instructions=additional_system_instructions,
+            temperature=temperature,
+        )
+
+    try:
+        with metrics.stage("procedural_flags", "network"):
+            output_text = await session.arespond(responses_parameters, cache=cache, refresh=refresh, route="flags")
+
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
+
+    with metrics.stage("procedural_flags", "parse"):
+        return _pools_from_output(output_text)
+
+
+def _expand(
+        session: Session,
+        pools: WordPools,
+        amt: int,
+        flag_format: str,
+        words: int,
+        leet: int,
+        entropy_bits: float,
+        separator: str,
+        seed: int | None,
+        unique_index: FlagIndex | str | bool | None,
+) -> list[str]:
+    metrics = session.metrics
+    with metrics.stage("procedural_flags", "expand"):
+        engine = FlagEngine(
+            pools,
+            flag_format=flag_format,
+            words=words,
+            leet=leet,
+            entropy_bits=entropy_bits,
+            separator=separator,
+            seed=seed,
+        )
+        flags = engine.generate(amt, unique_index=resolve_flag_index(unique_index))
+    metrics.inc("ctf_assets_items_requested_total", amt, generator="procedural_flags")
+    metrics.inc("ctf_assets_items_returned_total", len(flags), generator="procedural_flags")
+    return flags
+
+
+def generate_procedural_flags(
+        theme: str = "",
+        tone: str = "neutral",
+        amt: int = 1,
+        model: str = "gpt-4o-mini",
+        flag_format: str = "ctf{..}",
+        language: str = "es-PR",
+        words: int = 3,
+        leet: int = 3,
+        entropy_bits: float = 48.0,
+        separator: str = "_",
+        seed: int | None = None,
+        pool_size: int = 64,
+        pools: WordPools | None = None,
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.9,
+        session: Session | None = None,
+        cache: bool = True,
+        refresh: bool = False,
+        unique_index: FlagIndex | str | bool | None = None,
+) -> list[str]:
+    """
+    Generate many themed flags from one LLM call.
+
+    Fetches word pools with `fetch_word_pools` (one call, cached) unless
+    `pools` is given, then composes `amt` distinct flags locally with a
+    `FlagEngine`. The same pools and seed always give the same flags.
+
+    Args:
+        theme (str): The thematic context for the flags. Defaults to an empty string.
+        tone (str): Desired tone of the words. Defaults to "neutral".
+        amt (int): Number of flags to generate. Defaults to 1.
+        model (str): OpenAI model for the word pools. Defaults to "gpt-4o-mini".
+        flag_format (str): Format template for the flag, e.g., "ctf{..}". Defaults to "ctf{..}".
+        language (str): Language of the words. Defaults to "es-PR".
+        words (int): Word slots per flag. Defaults to 3.
+        leet (int): Spellings per word, leetspeak ones included; 1 turns leetspeak off. Defaults to 3.
+        entropy_bits (float): Minimum entropy per flag; a hex tail fills the gap. Defaults to 48.
+        separator (str): Text between slots. Defaults to "_".
+        seed (int | None): Seed for reproducible flags. Defaults to None (random).
+        pool_size (int): Words asked per pool. Defaults to 64.
+        pools (WordPools | None): Use these pools instead of asking the model.
+        additional_instructions (str): Optional extra instructions for the word choice.
+        additional_system_instructions (str): Optional system-level instructions for the LLM.
+        temperature (float): Sampling temperature of the word-pool call. Defaults to 0.9.
+        session (Session | None): Session to call through. Defaults to the process-wide session.
+        cache (bool): Reuse cached word pools. Defaults to True.
+        refresh (bool): Ask for new word pools and replace the cached ones. Defaults to False.
+        unique_index (FlagIndex | str | bool | None): Persistent index of issued flags; see
+            `generate_flags`. Defaults to None.
+
+    Returns:
+        list[str]: Exactly `amt` distinct flags.
+
+    Raises:
+        RuntimeError: If the word-pool call fails or returns an empty pool.
+        ValueError: If the pools can't produce `amt` distinct flags.
+    """
+    session = session or get_default_session()
+    if pools is None:
+        pools = fetch_word_pools(
+            theme=theme,
+            tone=tone,
+            pool_size=pool_size,
+            model=model,
+            language=language,
+            additional_instructions=additional_instructions,
+            additional_system_instructions=additional_system_instructions,
+            temperature=temperature,
+            session=session,
+            cache=cache,
+            refresh=refresh,
+        )
+    return _expand(session, pools, amt, flag_format, words, leet, entropy_bits, separator, seed, unique_index)
+
+
+async def agenerate_procedural_flags(
+        theme: str = "",
+        tone: str = "neutral",
+        amt: int = 1,
+        model: str = "gpt-4o-mini",
+        flag_format: str = "ctf{..}",
+        language: str = "es-PR",
+        words: int = 3,
+        leet: int = 3,
+        entropy_bits: float = 48.0,
+        separator: str = "_",
+        seed: int | None = None,
+        pool_size: int = 64,
+        pools: WordPools | None = None,
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.9,
+        session: Session | None = None,
+        cache: bool = True,
+        refresh: bool = False,
+        unique_index: FlagIndex | str | bool | None = None,
+) -> list[str]:
+    """
+    Async counterpart of `generate_procedural_flags`.
+
+    The word-pool call is awaited; the local expansion runs on a worker
+    thread so large amounts don't block the event loop.
+    """
+    session = session or get_default_session()
+    if pools is None:
+        pools = await afetch_word_pools(
+            theme=theme,
+            tone=tone,
+            pool_size=pool_size,
+            model=model,
+            language=language,
+            additional_instructions=additional_instructions,
+            additional_system_instructions=additional_system_instructions,
+            temperature=temperature,
+            session=session,
+            cache=cache,
+            refresh=refresh,
+        )
+    return await asyncio.to_thread(
+        _expand, session, pools, amt, flag_format, words, leet, entropy_bits, separator, seed, unique_index
+    )
@@ -8,6 +8,8 @@ OpenAI API to generate flags accordingly.
 
 Functions:
     generate_flags: Generates one or more CTF flags based on provided parameters.
+    agenerate_flags: Async counterpart of generate_flags built on AsyncOpenAI.
+    iter_flags / aiter_flags: Stream flags one by one as the model produces them.
 
 Example:
     flags = generate_flags(
@@ -22,16 +24,124 @@ Example:
         temperature=0.65
     )
     print(flags)
+
+    # From a running event loop
+    flags = await agenerate_flags(theme="Hackathon", amt=3)
 """
 
-from openai import OpenAIError
-from openai import OpenAI
-import json
-from ctf_assets.utils.helpers import validate_openai_model, get_reasoning_openai_models
-from ctf_assets.utils.prompts import flag_prompt
-from ctf_assets.schema.json_schema import get_flag_schema
-from ctf_assets.config import fetch_openai_key
-from ctf_assets.utils.response_parser import parse_flags
+import asyncio
+import warnings
+from typing import AsyncIterator, Iterator
+from ctf_assets.session import Session, get_default_session
+from ctf_assets.utils import sdk
+from ctf_assets.utils.prompts import flag_prompt_parts
+from ctf_assets.utils.flag_format import FlagFormat
+from ctf_assets.utils.flag_index import FlagIndex, resolve_flag_index
+from ctf_assets.utils.metrics import MetricsRegistry
+from ctf_assets.utils.response_parser import IncrementalArrayParser, parse_flags
+from ctf_assets.utils.sharding import ITEM_TOKEN_ESTIMATES, acollect_sharded, collect_sharded, with_hint
+from ctf_assets.utils.usage import GenerationResult, Usage
+
+def _flag_request(
+        session: Session,
+        theme: str,
+        tone: str,
+        amt: int,
+        model: str,
+        flag_format: str,
+        language: str,
+        additional_instructions: str,
+        additional_system_instructions: str,
+        temperature: float,
+) -> dict:
+    """
+    Build the Responses API parameters for a flag generation request.
+
+    Shared by `generate_flags` and `agenerate_flags` so both send exactly the
+    same request.
+
+    Returns:
+        dict: Keyword arguments for `client.responses.create`.
+    """
+    # Validate model selection. If the model is not supported, default to "gpt-4o-mini".
+    # A session router picks the model itself from its "flags" route.
+    model = session.route("flags", model)
+
+    # Static prefix as instructions (provider prompt cache), variable suffix as input
+    instructions, prompt = flag_prompt_parts(
+        asset_type="flags",
+        theme=theme,
+        tone=tone,
+        amt=max(1, amt),  # Ensure at least one flag is generated
+        flag_format=flag_format,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+    )
+
+    responses_parameters = {
+        "model": model,
+        "instructions": instructions,
+        "input": prompt,
+        "text": session.schemas["flags"],
+    }
+
+    if session.supports_temperature(model):
+        # Reasoning models reject the temperature parameter
+        responses_parameters["temperature"] = temperature
+
+    return responses_parameters
+
+
+def _valid_flags(flags: list, flag_format: str, metrics: MetricsRegistry | None = None) -> list[str]:
+    """
+    Keep the flags that match `flag_format`, repairing trivial defects.
+
+    Each flag is checked against the compiled format; malformed ones get the
+    cheap local fixes of `FlagFormat.repair` and are dropped if those aren't
+    enough. Dropped flags are simply missing from the result, so the top-up
+    round of `collect_sharded` re-requests only that many.
+    """
+    fmt = FlagFormat.parse(flag_format)
+    valid = []
+    repaired = rejected = 0
+    for flag in flags:
+        if not isinstance(flag, str):
+            rejected += 1
+            continue
+        flag = flag.strip()
+        if fmt.matches(flag):
+            valid.append(flag)
+            continue
+        fixed = fmt.repair(flag)
+        if fixed is None:
+            rejected += 1
+        else:
+            repaired += 1
+            valid.append(fixed)
+
+    if metrics is not None:
+        if repaired:
+            metrics.inc("ctf_assets_flags_repaired_total", repaired, generator="flags")
+        if rejected:
+            metrics.inc("ctf_assets_flags_rejected_total", rejected, generator="flags")
+    return valid
+
+
+def _claim_returned(flags: list[str], amt: int, index: FlagIndex | None) -> list[str]:
+    """
+    Claim the flags actually returned in the index, and warn about a shortfall.
+
+    Shards only skip flags the index already holds (`filter_new`); claiming
+    happens here, after the merge and the truncation to `amt`, so surplus
+    flags from over-producing shards are not burned.
+    """
+    if index is not None:
+        flags = index.claim(flags)
+    if len(flags) < amt:
+        warnings.warn(f"Only {len(flags)} of {amt} flags could be generated", stacklevel=3)
+    return flags
+
 
 def generate_flags(
         theme: str = "",
@@ -42,8 +152,13 @@ def generate_flags(
         language: str = "es-PR",
         additional_instructions: str = "",
         additional_system_instructions: str = "",
-        temperature: float = 0.65
-) -> list[str]:
+        temperature: float = 0.65,
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        unique_index: FlagIndex | str | bool | None = None,
+        return_usage: bool = False,
+) -> list[str] | GenerationResult:
     """
     Generate CTF flags using an LLM based on the provided parameters.
 
@@ -52,6 +167,17 @@ def generate_flags(
     customization of the flag theme, tone, format, language, and additional 
     instructions to fine-tune the generation.
 
+    Large amounts are split into shards that fit the model's output budget.
+    Shards run concurrently with distinct variation seeds; results are
+    deduplicated and topped up so exactly `amt` flags are returned, with a
+    warning if the model keeps falling short. With a `unique_index`, flags
+    issued by earlier runs count as duplicates too, and cached responses
+    are never read (they would replay flags the index already holds).
+
+    Every flag is validated against `flag_format`. Trivial defects (wrong
+    prefix case, missing braces, spaces) are repaired locally; flags that
+    can't be repaired are dropped and only that many are re-requested.
+
     Args:
         theme (str): The thematic context for the flags. Defaults to an empty string.
         tone (str): Desired tone for the flags (e.g., neutral, playful). Defaults to "neutral".
@@ -62,72 +188,246 @@ def generate_flags(
         additional_instructions (str): Optional extra instructions for flag generation. Defaults to an empty string.
         additional_system_instructions (str): Optional system-level instructions for the LLM. Defaults to an empty string.
         temperature (float): Sampling temperature for generation randomness. Defaults to 0.7.
+        session (Session | None): Session whose pooled client is used. Defaults to the process-wide session.
+        cache (bool): Serve repeated requests from the session's response cache. Defaults to False.
+        refresh (bool): Bypass cached responses but store the new one. Defaults to False.
+            Implied by `unique_index`.
+        unique_index (FlagIndex | str | bool | None): Persistent index of issued flags. Flags already
+            in it are dropped and re-requested; only the returned flags are recorded. A path opens that database,
+            True uses the default one in the cache directory. Defaults to None (no cross-run check).
+        return_usage (bool): Return a `GenerationResult` with the token usage of all calls,
+            including `cached_tokens` served from the provider's prompt cache. Defaults to False.
 
     Returns:
-        dict: A dictionary containing the generated flags.
+        list[str]: Exactly `amt` unique flags, unless the model repeatedly
+            fails to produce enough valid ones.
+        GenerationResult: (items, usage) if return_usage=True.
 
     Raises:
-        ValueError: If the OpenAI client fails to initialize.
+        RuntimeError: If the OpenAI API call fails.
     """
-    
-    # Load environment
-    
-    # Validate model selection. If the model is not supported, default to "gpt-4o-mini"
-    model = validate_openai_model(model=model) 
+    session = session or get_default_session()
+    index = resolve_flag_index(unique_index)
+    usage = Usage()
+    metrics = session.metrics
+    # A replayed response only holds flags the index already has
+    refresh = refresh or index is not None
 
-    # # Initialize OpenAI API client
-    # client = openai.OpenAI()
+    def fetch(count: int, hint: str) -> list[str]:
+        with metrics.stage("flags", "prompt_build"):
+            responses_parameters = _flag_request(
+                session=session,
+                theme=theme,
+                tone=tone,
+                amt=count,
+                model=model,
+                flag_format=flag_format,
+                language=language,
+                additional_instructions=with_hint(additional_instructions, hint),
+                additional_system_instructions=additional_system_instructions,
+                temperature=temperature,
+            )
 
-    # Initialize OpenAI API client
-    client = OpenAI(api_key=fetch_openai_key(strict=True))
+        try:
+            # Generate flags using Responses from OpenAI
+            with metrics.stage("flags", "network"):
+                output_text = session.respond(responses_parameters, cache=cache, refresh=refresh, usage=usage, route="flags")
 
-    if client is None:
-        raise ValueError("OpenAI client failed to initialize. Exiting.")
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error: {e}")
 
-    # Construct the prompt using provided parameters
-    prompt = flag_prompt(
-        asset_type="flags",
+        with metrics.stage("flags", "parse"):
+            flags = _valid_flags(parse_flags(response=output_text), flag_format, metrics)
+        # Yield per call: items asked for vs valid items parsed
+        metrics.inc("ctf_assets_items_asked_total", count, generator="flags")
+        metrics.inc("ctf_assets_items_parsed_total", len(flags), generator="flags")
+        if index is not None:
+            # Drop flags issued before; the shortfall is re-requested by the top-up round
+            flags = index.filter_new(flags)
+        return flags
+
+    # Large amounts are split into concurrent shards and topped up to exactly amt
+    flags = collect_sharded(fetch, amt=amt, per_item_tokens=ITEM_TOKEN_ESTIMATES["flags"])
+    flags = _claim_returned(flags, amt, index)
+    metrics.inc("ctf_assets_items_requested_total", amt, generator="flags")
+    metrics.inc("ctf_assets_items_returned_total", len(flags), generator="flags")
+    return GenerationResult(items=flags, usage=usage) if return_usage else flags
+
+
+async def agenerate_flags(
+        theme: str = "",
+        tone: str = "neutral",
+        amt: int = 1,
+        model: str = "gpt-4o-mini",
+        flag_format: str = "ctf{..}",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        unique_index: FlagIndex | str | bool | None = None,
+        return_usage: bool = False,
+) -> list[str] | GenerationResult:
+    """
+    Async counterpart of `generate_flags`.
+
+    Takes the same arguments and returns the same result, but awaits the
+    network call on `AsyncOpenAI` so many requests can share one event loop.
+    Use `ctf_assets.utils.concurrency.gather_bounded` to fan out calls under
+    a concurrency limit.
+
+    Returns:
+        list[str]: The generated flags.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails.
+    """
+    session = session or get_default_session()
+    index = resolve_flag_index(unique_index)
+
+    usage = Usage()
+    metrics = session.metrics
+    refresh = refresh or index is not None
+
+    async def fetch(count: int, hint: str) -> list[str]:
+        # Model validation may hit the network the first time, keep it off the event loop
+        with metrics.stage("flags", "prompt_build"):
+            responses_parameters = await asyncio.to_thread(
+                _flag_request,
+                session=session,
+                theme=theme,
+                tone=tone,
+                amt=count,
+                model=model,
+                flag_format=flag_format,
+                language=language,
+                additional_instructions=with_hint(additional_instructions, hint),
+                additional_system_instructions=additional_system_instructions,
+                temperature=temperature,
+            )
+
+        try:
+            with metrics.stage("flags", "network"):
+                output_text = await session.arespond(responses_parameters, cache=cache, refresh=refresh, usage=usage, route="flags")
+
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error: {e}") from e
+
+        with metrics.stage("flags", "parse"):
+            flags = _valid_flags(parse_flags(response=output_text), flag_format, metrics)
+        metrics.inc("ctf_assets_items_asked_total", count, generator="flags")
+        metrics.inc("ctf_assets_items_parsed_total", len(flags), generator="flags")
+        if index is not None:
+            flags = await asyncio.to_thread(index.filter_new, flags)
+        return flags
+
+    flags = await acollect_sharded(fetch, amt=amt, per_item_tokens=ITEM_TOKEN_ESTIMATES["flags"])
+    flags = await asyncio.to_thread(_claim_returned, flags, amt, index)
+    metrics.inc("ctf_assets_items_requested_total", amt, generator="flags")
+    metrics.inc("ctf_assets_items_returned_total", len(flags), generator="flags")
+    return GenerationResult(items=flags, usage=usage) if return_usage else flags
+
+
+def iter_flags(
+        theme: str = "",
+        tone: str = "neutral",
+        amt: int = 1,
+        model: str = "gpt-4o-mini",
+        flag_format: str = "ctf{..}",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+        unique_index: FlagIndex | str | bool | None = None,
+) -> Iterator[str]:
+    """
+    Stream flags one by one as the model produces them.
+
+    Uses a single streaming Responses call and yields each flag as soon as
+    its JSON array element closes, so the first flag arrives long before the
+    whole response. Unlike `generate_flags` the request is not sharded, not
+    cached and not topped up; duplicates within the stream are skipped, and
+    flags that don't match `flag_format` are repaired or skipped.
+
+    Yields:
+        str: Each generated flag.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails.
+    """
+    session = session or get_default_session()
+    index = resolve_flag_index(unique_index)
+
+    responses_parameters = _flag_request(
+        session=session,
         theme=theme,
         tone=tone,
-        amt=max(1, amt),  # Ensure at least one flag is generated
+        amt=amt,
+        model=model,
         flag_format=flag_format,
         language=language,
         additional_instructions=additional_instructions,
         additional_system_instructions=additional_system_instructions,
+        temperature=temperature,
     )
 
-    openai_reasoning_models = get_reasoning_openai_models()
+    parser = IncrementalArrayParser("flags")
+    seen: set[str] = set()
+    try:
+        for delta in session.stream_text(responses_parameters):
+            for flag in _valid_flags(parser.feed(delta), flag_format, session.metrics):
+                if flag in seen or (index is not None and not index.claim([flag])):
+                    continue
+                seen.add(flag)
+                yield flag
 
-    # Get the flag schema as a dict directly without converting it to a string
-    flag_schema = get_flag_schema()
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
 
-    responses_parameters= {
-        "model": model,
-        "input": prompt,
-        "text": flag_schema,
-    }
 
-    if model not in openai_reasoning_models:
-        # Add the temperature parameter to the responses_parameters dictionary
-        responses_parameters["temperature"] = temperature
+async def aiter_flags(
+        theme: str = "",
+        tone: str = "neutral",
+        amt: int = 1,
+        model: str = "gpt-4o-mini",
+        flag_format: str = "ctf{..}",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+        unique_index: FlagIndex | str | bool | None = None,
+) -> AsyncIterator[str]:
+    """Async counterpart of `iter_flags`; use with `async for`."""
+    session = session or get_default_session()
+    index = resolve_flag_index(unique_index)
 
+    responses_parameters = await asyncio.to_thread(
+        _flag_request,
+        session=session,
+        theme=theme,
+        tone=tone,
+        amt=amt,
+        model=model,
+        flag_format=flag_format,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+        temperature=temperature,
+    )
+
+    parser = IncrementalArrayParser("flags")
+    seen: set[str] = set()
     try:
-        if model not in openai_reasoning_models:          # Generate flags using Responses from OpenAI
-            response = client.responses.create( 
-                model=model,
-                temperature=temperature,
-                input=prompt,
-                text=flag_schema
-            )
-        else:
-            # Generate flags using OpenAI Completions
-            response = client.responses.create( 
-                model=model,
-                input=prompt,
-                text=flag_schema
-            )
+        async for delta in session.astream_text(responses_parameters):
+            for flag in _valid_flags(parser.feed(delta), flag_format, session.metrics):
+                if flag in seen or (index is not None and not index.claim([flag])):
+                    continue
+                seen.add(flag)
+                yield flag
 
-    except OpenAIError as e:
-        raise RuntimeError(f"OpenAI API error: {e}")
-    
-    return parse_flags(response=response.output_text)
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
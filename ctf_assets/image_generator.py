@@ -1,15 +1,21 @@
 from __future__ import annotations
 
-import base64
-from dataclasses import dataclass
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Mapping, Optional, Sequence
 
-from openai import OpenAI, OpenAIError
-
-from ctf_assets.config import fetch_openai_key
-from ctf_assets.utils.prompts import image_prompt
+from ctf_assets.session import Session, get_default_session
+from ctf_assets.utils import sdk
+from ctf_assets.utils.create_file import write_base64_file
+from ctf_assets.utils.image_processing import ImagePostProcess, postprocess_images
+from ctf_assets.utils.prompts import image_prompt, image_prompt_batch
+from ctf_assets.utils.response_parser import IncrementalArrayParser
+from ctf_assets.utils.rate_limit import TokenBucket
+from ctf_assets.utils.stego import StegoJob, embed_flags
 
 
 def image_directory(dir_name: str = "downloaded_images") -> Path:
@@ -23,12 +29,396 @@ def image_directory(dir_name: str = "downloaded_images") -> Path:
 class ImageResult:
     files: list[str]
     prompt: str
+    errors: list[str] = field(default_factory=list)
+    prompts: list[str] = field(default_factory=list)
+    # Source file -> resized / re-encoded variants, when post-processing ran
+    variants: dict[str, list[str]] = field(default_factory=dict)
+    # Team (or flag index) -> image with that flag hidden in it
+    stego: dict[str, str] = field(default_factory=dict)
 
 
 def _timestamp() -> str:
     return datetime.now().astimezone().strftime("%Y-%m-%d_%I-%M-%S_%p")
 
 
+def _normalize_image_model(image_model: str, amt: int) -> tuple[str, int]:
+    """Validate the image model and clamp `amt` to what the model supports.
+
+    DALL·E 3 only accepts n=1 per request, so any `amt` above 1 is served by
+    fanning out one request per image.
+    """
+    image_model = (image_model or "dall-e-3").lower()
+    if image_model not in {"dall-e-2", "dall-e-3"}:
+        image_model = "dall-e-3"
+
+    amt = int(amt) if amt and int(amt) > 0 else 1
+    if image_model == "dall-e-2":
+        # DALL·E 2 supports 1..10
+        amt = max(1, min(10, amt))
+
+    return image_model, amt
+
+
+def _image_params(
+    image_model: str,
+    prompt: str,
+    amt: int,
+    size: str,
+    quality: str,
+    style: str,
+    dalle3_options: bool = True,
+) -> dict:
+    """Build the keyword arguments for `client.images.generate`."""
+    params = {
+        "model": image_model,
+        "prompt": prompt,
+        "n": amt,
+        "size": size,
+        "response_format": "b64_json",
+    }
+    if dalle3_options:
+        params["quality"] = quality if image_model == "dall-e-3" else None
+        params["style"] = style if image_model == "dall-e-3" else None
+    return params
+
+
+def _file_prefix(filename_prefix: Optional[str], theme: str) -> str:
+    prefix = (filename_prefix or theme or "image").strip().replace(" ", "_")
+    return "".join(ch for ch in prefix if ch.isalnum() or ch in "-_") or "image"
+
+
+def _payload(item) -> Optional[str]:
+    if isinstance(item, dict):
+        return item.get("b64_json")
+    return getattr(item, "b64_json", None)
+
+
+def _release_payload(item) -> None:
+    """Drop the base64 payload from the response item once it is on disk."""
+    try:
+        if isinstance(item, dict):
+            item["b64_json"] = None
+        else:
+            item.b64_json = None
+    except (AttributeError, TypeError, ValueError):
+        pass
+
+
+def _reserve_path(path: Path) -> Path:
+    """Atomically create `path`, or the first free `<stem>-<n>` next to it, and return it.
+
+    Concurrent calls (e.g. two batch jobs with the same theme in the same
+    second) share the timestamped name; creating the file exclusively means
+    a write never replaces an image another call already produced.
+    """
+    candidate, n = path, 0
+    while True:
+        try:
+            with open(candidate, "xb"):
+                return candidate
+        except FileExistsError:
+            n += 1
+            candidate = path.with_name(f"{path.stem}-{n}{path.suffix}")
+
+
+def _write_one(item, path: Path) -> str:
+    path = _reserve_path(path)
+    write_base64_file(path, _payload(item))
+    _release_payload(item)
+    return str(path)
+
+
+def _write_images(
+    img_resp,
+    outdir: Path,
+    prefix: str,
+    max_workers: int = 4,
+    stamp: Optional[str] = None,
+    start: int = 0,
+) -> list[str]:
+    """Decode the b64 payloads of an images response and write them to `outdir`.
+
+    Each payload is decoded in chunks straight to its file on a thread pool,
+    and released from the response as soon as it is persisted, so the
+    decoded images never all sit in memory at once.
+    """
+    stamp = stamp or _timestamp()
+    items = list(getattr(img_resp, "data", []) or [])
+
+    for item in items:
+        if not _payload(item):
+            # If the API returned URLs instead, we can't download without internet in this library.
+            # Fail clearly so caller can switch response_format.
+            raise RuntimeError("Image response did not include base64 data (b64_json).")
+
+    paths = [outdir / f"{stamp}_{prefix}_{start + i}.png" for i in range(len(items))]
+    if len(items) <= 1:
+        return [_write_one(item, path) for item, path in zip(items, paths)]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(_write_one, items, paths))
+
+
+def _request_images(session: Session, image_model: str, prompt: str, n: int, size: str, quality: str, style: str):
+    """Generate images through the session, retrying without DALL·E 3 options on old SDKs."""
+    try:
+        return session.create_images(_image_params(image_model, prompt, n, size, quality, style))
+    except TypeError:
+        # Some SDK versions don't accept None for these params; retry without them.
+        try:
+            return session.create_images(
+                _image_params(image_model, prompt, n, size, quality, style, dalle3_options=False)
+            )
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
+
+
+async def _arequest_images(session: Session, image_model: str, prompt: str, n: int, size: str, quality: str, style: str):
+    """Async counterpart of `_request_images`."""
+    try:
+        return await session.acreate_images(_image_params(image_model, prompt, n, size, quality, style))
+    except TypeError:
+        # Some SDK versions don't accept None for these params; retry without them.
+        try:
+            return await session.acreate_images(
+                _image_params(image_model, prompt, n, size, quality, style, dalle3_options=False)
+            )
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
+
+
+# Rounds of prompt requests before giving up on reaching `amt` distinct prompts
+_MAX_PROMPT_ROUNDS = 3
+
+
+def _prompt_batch_request(session: Session, prompt_model: str, theme: str, tone: str, amt: int, language: str) -> dict:
+    """Build the structured-output request for `amt` distinct image prompts."""
+    return {
+        "model": session.route("image_prompts", prompt_model),
+        "input": image_prompt_batch(theme=theme, tone=tone, amt=amt, language=language),
+        "text": session.schemas["image_prompts"],
+    }
+
+
+def _iter_image_prompts(
+    session: Session,
+    prompt_model: str,
+    theme: str,
+    tone: str,
+    amt: int,
+    language: str,
+) -> Iterator[str]:
+    """
+    Stream up to `amt` distinct text-to-image prompts.
+
+    One structured-output call asks for all the prompts and each one is
+    yielded as soon as its array element closes, so image requests can start
+    while the rest are still being written. Prompts lost to duplicates or a
+    short answer are requested again, up to `_MAX_PROMPT_ROUNDS` calls.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails.
+    """
+    seen: set[str] = set()
+    for _ in range(_MAX_PROMPT_ROUNDS):
+        missing = amt - len(seen)
+        if missing <= 0:
+            return
+        params = _prompt_batch_request(session, prompt_model, theme, tone, missing, language)
+        session.metrics.inc("ctf_assets_items_asked_total", missing, generator="image_prompts")
+        parser = IncrementalArrayParser("prompts")
+        try:
+            for delta in session.stream_text(params):
+                for prompt in parser.feed(delta):
+                    prompt = prompt.strip() if isinstance(prompt, str) else ""
+                    if not prompt or prompt in seen or len(seen) >= amt:
+                        continue
+                    seen.add(prompt)
+                    session.metrics.inc("ctf_assets_items_parsed_total", generator="image_prompts")
+                    yield prompt
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error while generating image prompts: {e}") from e
+
+
+async def _aiter_image_prompts(
+    session: Session,
+    prompt_model: str,
+    theme: str,
+    tone: str,
+    amt: int,
+    language: str,
+) -> AsyncIterator[str]:
+    """Async counterpart of `_iter_image_prompts`."""
+    seen: set[str] = set()
+    for _ in range(_MAX_PROMPT_ROUNDS):
+        missing = amt - len(seen)
+        if missing <= 0:
+            return
+        params = _prompt_batch_request(session, prompt_model, theme, tone, missing, language)
+        session.metrics.inc("ctf_assets_items_asked_total", missing, generator="image_prompts")
+        parser = IncrementalArrayParser("prompts")
+        try:
+            async for delta in session.astream_text(params):
+                for prompt in parser.feed(delta):
+                    prompt = prompt.strip() if isinstance(prompt, str) else ""
+                    if not prompt or prompt in seen or len(seen) >= amt:
+                        continue
+                    seen.add(prompt)
+                    session.metrics.inc("ctf_assets_items_parsed_total", generator="image_prompts")
+                    yield prompt
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error while generating image prompts: {e}") from e
+
+
+def _record_image_yield(session: Session, amt: int, files: list[str]) -> None:
+    """Count images requested vs written."""
+    session.metrics.inc("ctf_assets_items_requested_total", amt, generator="images")
+    session.metrics.inc("ctf_assets_items_returned_total", len(files), generator="images")
+
+
+def _post_process(session: Session, files: list[str], options: Optional[ImagePostProcess], errors: list[str]) -> dict[str, list[str]]:
+    """Run the post-processing stage over the written files, adding its failures to `errors`."""
+    if options is None or not files:
+        return {}
+    with session.metrics.stage("images", "post_process"):
+        variants, failed = postprocess_images(files, options)
+    if failed:
+        warnings.warn(f"{len(failed)} image(s) failed post-processing: {'; '.join(failed)}")
+        errors.extend(failed)
+    return variants
+
+
+def _fan_out_result(files_by_index: dict[int, list[str]], errors: list[str]) -> list[str]:
+    files = [f for i in sorted(files_by_index) for f in files_by_index[i]]
+    if not files:
+        if not errors:
+            raise RuntimeError("No image prompts were generated.")
+        raise RuntimeError(f"All {len(errors)} image requests failed. First error: {errors[0]}")
+    if errors:
+        warnings.warn(f"{len(errors)} image request(s) failed: {'; '.join(errors)}")
+    return files
+
+
+def _fan_out_images(
+    session: Session,
+    image_model: str,
+    prompts: Iterable[str],
+    size: str,
+    quality: str,
+    style: str,
+    outdir: Path,
+    prefix: str,
+    concurrency: int,
+    requests_per_minute: Optional[float],
+) -> tuple[list[str], list[str], list[str]]:
+    """Issue one single-image request per prompt concurrently.
+
+    `prompts` may be a lazy iterator: each image request is submitted as soon
+    as its prompt arrives. Each image is written as soon as its request
+    completes. A failed request is recorded and does not affect the others.
+
+    Returns:
+        tuple[list[str], list[str], list[str]]: Written files in prompt order,
+            errors, and the prompts that were used.
+    """
+    stamp = _timestamp()
+    bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    metrics = session.metrics
+
+    def one(index: int, prompt: str) -> list[str]:
+        if bucket is not None:
+            bucket.acquire()
+        with metrics.stage("images", "network"):
+            img_resp = _request_images(session, image_model, prompt, 1, size, quality, style)
+        with metrics.stage("images", "file_write"):
+            return _write_images(img_resp, outdir, prefix, stamp=stamp, start=index)
+
+    files_by_index: dict[int, list[str]] = {}
+    errors: list[str] = []
+    used: list[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        futures = {}
+        try:
+            for i, prompt in enumerate(prompts):
+                used.append(prompt)
+                futures[pool.submit(one, i, prompt)] = i
+        except RuntimeError as e:
+            # Keep the images whose prompts already arrived
+            if not futures:
+                raise
+            errors.append(f"prompts: {e}")
+
+        for future in as_completed(futures):
+            try:
+                files_by_index[futures[future]] = future.result()
+            except Exception as e:
+                errors.append(f"image {futures[future]}: {e}")
+
+    return _fan_out_result(files_by_index, errors), errors, used
+
+
+async def _afan_out_images(
+    session: Session,
+    image_model: str,
+    prompts: Iterable[str] | AsyncIterable[str],
+    size: str,
+    quality: str,
+    style: str,
+    outdir: Path,
+    prefix: str,
+    concurrency: int,
+    requests_per_minute: Optional[float],
+) -> tuple[list[str], list[str], list[str]]:
+    """Async counterpart of `_fan_out_images`; `prompts` may be an async iterator."""
+    stamp = _timestamp()
+    bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    metrics = session.metrics
+
+    files_by_index: dict[int, list[str]] = {}
+    errors: list[str] = []
+    used: list[str] = []
+    tasks: list[asyncio.Task] = []
+
+    async def one(index: int, prompt: str) -> None:
+        async with semaphore:
+            try:
+                if bucket is not None:
+                    await bucket.aacquire()
+                with metrics.stage("images", "network"):
+                    img_resp = await _arequest_images(session, image_model, prompt, 1, size, quality, style)
+                with metrics.stage("images", "file_write"):
+                    files_by_index[index] = await asyncio.to_thread(
+                        _write_images, img_resp, outdir, prefix, stamp=stamp, start=index
+                    )
+            except Exception as e:
+                errors.append(f"image {index}: {e}")
+
+    def submit(prompt: str) -> None:
+        tasks.append(asyncio.ensure_future(one(len(used), prompt)))
+        used.append(prompt)
+
+    try:
+        if isinstance(prompts, AsyncIterable):
+            async for prompt in prompts:
+                submit(prompt)
+        else:
+            for prompt in prompts:
+                submit(prompt)
+    except RuntimeError as e:
+        # Keep the images whose prompts already arrived
+        if not tasks:
+            raise
+        errors.append(f"prompts: {e}")
+
+    await asyncio.gather(*tasks)
+    return _fan_out_result(files_by_index, errors), errors, used
+
+
 def generate_images(
     image_model: str = "dall-e-3",
     theme: str = "",
@@ -43,101 +433,371 @@ def generate_images(
     filename_prefix: Optional[str] = None,
     prompt_override: Optional[str] = None,
     return_prompt: bool = False,
+    session: Optional[Session] = None,
+    concurrency: int = 4,
+    requests_per_minute: Optional[float] = None,
+    batch_prompts: bool = False,
+    post_process: ImagePostProcess | dict | bool | None = None,
 ) -> list[str] | ImageResult:
     """Generate images and write them to files.
 
+    DALL·E 3 accepts one image per request, so `amt > 1` fans out `amt`
+    concurrent single-image requests (at most `concurrency` in flight and
+    `requests_per_minute` if set). Each image is written as soon as its
+    request completes; failed requests are reported in `ImageResult.errors`
+    (and as a warning) without losing the images that succeeded.
+
+    With `batch_prompts=True` and `amt > 1`, one structured-output call on
+    `prompt_model` returns `amt` distinct prompts, one per image, instead of
+    every image sharing a single prompt. The prompts are streamed and each
+    image request starts as soon as its prompt arrives. This works for both
+    models; DALL·E 2 then also sends one request per image.
+
+    With `post_process` (an `ImagePostProcess`, its fields as a dict, or
+    True for the defaults) the written PNGs are resized, thumbnailed and
+    re-encoded to WebP/AVIF/JPEG on a process pool once all are on disk.
+    The variant paths are returned in `ImageResult.variants`, keyed by the
+    original file. Requires Pillow (`pip install 'ctf-assets[images]'`).
+
     Returns:
         - list[str]: paths of images written to disk (default)
-        - ImageResult: (files, prompt) if return_prompt=True
+        - ImageResult: (files, prompt, errors, prompts, variants) if return_prompt=True
     """
-    api_key = fetch_openai_key(strict=True)
-    client = OpenAI(api_key=api_key)
+    session = session or get_default_session()
 
     # Normalize / validate
-    image_model = (image_model or "dall-e-3").lower()
-    if image_model not in {"dall-e-2", "dall-e-3"}:
-        image_model = "dall-e-3"
+    image_model, amt = _normalize_image_model(image_model, amt)
+    post_process = ImagePostProcess.coerce(post_process)
+    strip_prompt_override = (prompt_override or "").strip()
+    distinct = batch_prompts and amt > 1 and not strip_prompt_override
+    fan_out = distinct or (image_model == "dall-e-3" and amt > 1)
 
-    amt = int(amt) if amt and int(amt) > 0 else 1
-    if image_model == "dall-e-3":
-        # DALL·E 3 currently supports n=1
-        amt = 1
+    outdir = Path(output_dir).expanduser().resolve()
+    outdir.mkdir(parents=True, exist_ok=True)
+    prefix = _file_prefix(filename_prefix, theme)
+
+    if distinct:
+        # 1-3) One prompt call for the whole batch, pipelined into the image requests
+        prompts = _iter_image_prompts(session, prompt_model, theme, tone, amt, language)
+        files, errors, used = _fan_out_images(
+            session, image_model, prompts, size, quality, style,
+            outdir, prefix, concurrency, requests_per_minute,
+        )
+        _record_image_yield(session, amt, files)
+        variants = _post_process(session, files, post_process, errors)
+        if return_prompt:
+            return ImageResult(files=files, prompt=used[0], errors=errors, prompts=used, variants=variants)
+        return files
+
+    # 1) Build or override the text-to-image prompt
+    if strip_prompt_override:
+        prompt_t2i = strip_prompt_override
     else:
-        # DALL·E 2 supports 1..10
-        amt = max(1, min(10, amt))
+        with session.metrics.stage("images", "prompt_build"):
+            prompt_for_llm = image_prompt(
+                theme=theme,
+                tone=tone,
+                amt=1 if fan_out else amt,
+                language=language,
+            )
+        try:
+            with session.metrics.stage("images", "network"):
+                output_text = session.respond({
+                    "model": session.route("image_prompts", prompt_model),
+                    "input": prompt_for_llm,
+                }, route="image_prompts")
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error while generating image prompt: {e}") from e
+
+        prompt_t2i = output_text.strip()
+        if not prompt_t2i:
+            raise RuntimeError("Empty prompt generated for image creation.")
+
+    errors: list[str] = []
+
+    if fan_out:
+        # 2-3) One request per image, each written as it completes
+        files, errors, _ = _fan_out_images(
+            session, image_model, [prompt_t2i] * amt, size, quality, style,
+            outdir, prefix, concurrency, requests_per_minute,
+        )
+    else:
+        # 2) Generate images
+        with session.metrics.stage("images", "network"):
+            img_resp = _request_images(session, image_model, prompt_t2i, amt, size, quality, style)
+
+        # 3) Write to files
+        with session.metrics.stage("images", "file_write"):
+            files = _write_images(img_resp, outdir, prefix)
+
+    _record_image_yield(session, amt, files)
+    # 4) Resize and re-encode
+    variants = _post_process(session, files, post_process, errors)
+    if return_prompt:
+        return ImageResult(files=files, prompt=prompt_t2i, errors=errors, prompts=[prompt_t2i], variants=variants)
+    return files
+
+
+async def agenerate_images(
+    image_model: str = "dall-e-3",
+    theme: str = "",
+    tone: str = "neutral",
+    amt: int = 1,
+    style: str = "vivid",
+    quality: str = "standard",
+    size: str = "1024x1024",
+    prompt_model: str = "gpt-4o-mini",
+    language: str = "es-PR",
+    output_dir: str | Path = "downloaded_images",
+    filename_prefix: Optional[str] = None,
+    prompt_override: Optional[str] = None,
+    return_prompt: bool = False,
+    session: Optional[Session] = None,
+    concurrency: int = 4,
+    requests_per_minute: Optional[float] = None,
+    batch_prompts: bool = False,
+    post_process: ImagePostProcess | dict | bool | None = None,
+) -> list[str] | ImageResult:
+    """Async counterpart of `generate_images`.
+
+    Awaits the prompt and image calls on `AsyncOpenAI`; decoding and writing
+    the files runs in a worker thread so the event loop stays responsive, and
+    so does waiting on the post-processing pool.
+    """
+    session = session or get_default_session()
+
+    image_model, amt = _normalize_image_model(image_model, amt)
+    post_process = ImagePostProcess.coerce(post_process)
+    strip_prompt_override = (prompt_override or "").strip()
+    distinct = batch_prompts and amt > 1 and not strip_prompt_override
+    fan_out = distinct or (image_model == "dall-e-3" and amt > 1)
 
     outdir = Path(output_dir).expanduser().resolve()
     outdir.mkdir(parents=True, exist_ok=True)
+    prefix = _file_prefix(filename_prefix, theme)
+
+    if distinct:
+        prompts = _aiter_image_prompts(session, prompt_model, theme, tone, amt, language)
+        files, errors, used = await _afan_out_images(
+            session, image_model, prompts, size, quality, style,
+            outdir, prefix, concurrency, requests_per_minute,
+        )
+        _record_image_yield(session, amt, files)
+        variants = await asyncio.to_thread(_post_process, session, files, post_process, errors)
+        if return_prompt:
+            return ImageResult(files=files, prompt=used[0], errors=errors, prompts=used, variants=variants)
+        return files
 
     # 1) Build or override the text-to-image prompt
-    strip_prompt_override = (prompt_override or "").strip()
     if strip_prompt_override:
         prompt_t2i = strip_prompt_override
     else:
-        prompt_for_llm = image_prompt(
-            theme=theme,
-            tone=tone,
-            amt=amt,
-            language=language,
-        )
-        try:
-            resp = client.responses.create(
-                model=prompt_model,
-                input=prompt_for_llm,
+        with session.metrics.stage("images", "prompt_build"):
+            prompt_for_llm = image_prompt(
+                theme=theme,
+                tone=tone,
+                amt=1 if fan_out else amt,
+                language=language,
             )
-        except OpenAIError as e:
+        try:
+            with session.metrics.stage("images", "network"):
+                output_text = await session.arespond({
+                    "model": await asyncio.to_thread(session.route, "image_prompts", prompt_model),
+                    "input": prompt_for_llm,
+                }, route="image_prompts")
+        except sdk.OpenAIError as e:
             raise RuntimeError(f"OpenAI API error while generating image prompt: {e}") from e
 
-        prompt_t2i = (resp.output_text or "").strip()
+        prompt_t2i = output_text.strip()
         if not prompt_t2i:
             raise RuntimeError("Empty prompt generated for image creation.")
 
-    # 2) Generate images
-    try:
-        img_resp = client.images.generate(
-            model=image_model,
-            prompt=prompt_t2i,
-            n=amt,
-            size=size,
-            quality=quality if image_model == "dall-e-3" else None,
-            style=style if image_model == "dall-e-3" else None,
-            response_format="b64_json",
+    errors: list[str] = []
+
+    if fan_out:
+        files, errors, _ = await _afan_out_images(
+            session, image_model, [prompt_t2i] * amt, size, quality, style,
+            outdir, prefix, concurrency, requests_per_minute,
         )
-    except TypeError:
-        # Some SDK versions don't accept None for these params; retry without them.
-        try:
-            img_resp = client.images.generate(
-                model=image_model,
-                prompt=prompt_t2i,
-                n=amt,
-                size=size,
-                response_format="b64_json",
-            )
-        except OpenAIError as e:
-            raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
-    except OpenAIError as e:
-        raise RuntimeError(f"OpenAI API error while generating images: {e}") from e
+    else:
+        # 2) Generate images
+        with session.metrics.stage("images", "network"):
+            img_resp = await _arequest_images(session, image_model, prompt_t2i, amt, size, quality, style)
 
-    # 3) Write to files
-    prefix = (filename_prefix or theme or "image").strip().replace(" ", "_")
-    prefix = "".join(ch for ch in prefix if ch.isalnum() or ch in "-_") or "image"
-    stamp = _timestamp()
+        # 3) Write to files
+        with session.metrics.stage("images", "file_write"):
+            files = await asyncio.to_thread(_write_images, img_resp, outdir, prefix)
 
-    files: list[str] = []
-    for i, item in enumerate(getattr(img_resp, "data", []) or []):
-        if isinstance(item, dict):
-            b64 = item.get("b64_json")
-        else:
-            b64 = getattr(item, "b64_json", None)
-        if not b64:
-            # If the API returned URLs instead, we can't download without internet in this library.
-            # Fail clearly so caller can switch response_format.
-            raise RuntimeError("Image response did not include base64 data (b64_json).")
+    _record_image_yield(session, amt, files)
+    # 4) Resize and re-encode
+    variants = await asyncio.to_thread(_post_process, session, files, post_process, errors)
+    if return_prompt:
+        return ImageResult(files=files, prompt=prompt_t2i, errors=errors, prompts=[prompt_t2i], variants=variants)
+    return files
+
+
+def _stego_labels(flags: Mapping[str, str] | Sequence[str] | str) -> dict[str, str]:
+    """Label -> flag: teams as given, list positions as "0", "1", ..."""
+    if isinstance(flags, str):
+        flags = [flags]
+    if isinstance(flags, Mapping):
+        labelled = {str(label): str(flag) for label, flag in flags.items()}
+    else:
+        labelled = {str(i): str(flag) for i, flag in enumerate(flags)}
+    if not labelled:
+        raise ValueError("At least one flag to hide is required.")
+    return labelled
+
+
+def stego_variants(
+    base_image: str | Path,
+    flags: Mapping[str, str] | Sequence[str] | str,
+    output_dir: str | Path | None = None,
+    method: str = "lsb",
+    key: Optional[str] = None,
+    verify: bool = True,
+    max_workers: Optional[int] = None,
+) -> tuple[dict[str, str], list[str]]:
+    """Hide a different flag in a copy of one image per team.
 
-        data = base64.b64decode(b64)
-        filename = f"{stamp}_{prefix}_{i}.png"
-        path = outdir / filename
-        path.write_bytes(data)
-        files.append(str(path))
+    The variants are written as PNG next to the base image (or in
+    `output_dir`), named `<base>_<team>.png`, on a process pool; each worker
+    decodes the base image once. See `ctf_assets.utils.stego` for the
+    methods, and `extract_flag` to read a flag back.
 
-    return ImageResult(files=files, prompt=prompt_t2i) if return_prompt else files
+    Args:
+        base_image (str | Path): The image to hide flags in, e.g. from `generate_images`.
+        flags (Mapping[str, str] | Sequence[str] | str): Team -> flag (e.g. from
+            `iter_team_flags`), or a list of flags labelled by position.
+        output_dir (str | Path | None): Where to write the variants. Defaults to the base image's directory.
+        method (str): "lsb" or "palette". Defaults to "lsb".
+        key (str | None): Scatter the bits over positions derived from this key. Defaults to None.
+        verify (bool): Extract every flag again and report mismatches as errors. Defaults to True.
+        max_workers (int | None): Worker processes. Defaults to one per CPU.
+
+    Returns:
+        tuple[dict[str, str], list[str]]: Label -> written image, and one error per failed variant.
+
+    Raises:
+        ValueError: If no flags are given or the method is unknown.
+        RuntimeError: If NumPy or Pillow is missing.
+    """
+    base = Path(base_image).expanduser().resolve()
+    outdir = Path(output_dir).expanduser().resolve() if output_dir else base.parent
+    labelled = _stego_labels(flags)
+
+    names: set[str] = set()
+    jobs = []
+    for i, (label, flag) in enumerate(labelled.items()):
+        name = f"{base.stem}_{_file_prefix(label, '')}"
+        # Labels that only differ in characters dropped from file names
+        if name in names:
+            name = f"{name}_{i}"
+        names.add(name)
+        jobs.append(StegoJob(source=str(base), flag=flag, output=str(outdir / f"{name}.png")))
+
+    paths, errors = embed_flags(jobs, method=method, key=key, max_workers=max_workers, verify=verify)
+    written = {label: path for label, path in zip(labelled, paths) if path is not None}
+    return written, errors
+
+
+def _stego_result(session: Session, base: ImageResult, flags, output_dir, method, key, verify, max_workers) -> ImageResult:
+    if not base.files:
+        details = f": {'; '.join(base.errors)}" if base.errors else ""
+        raise RuntimeError(f"No base image was generated to hide the flags in{details}")
+    with session.metrics.stage("images", "stego"):
+        written, errors = stego_variants(
+            base.files[0], flags, output_dir=output_dir, method=method, key=key,
+            verify=verify, max_workers=max_workers,
+        )
+    if errors:
+        warnings.warn(f"{len(errors)} stego variant(s) failed: {'; '.join(errors)}")
+    return ImageResult(
+        files=base.files, prompt=base.prompt, errors=base.errors + errors,
+        prompts=base.prompts, variants=base.variants, stego=written,
+    )
+
+
+def generate_stego_images(
+    flags: Mapping[str, str] | Sequence[str] | str,
+    stego_method: str = "lsb",
+    stego_key: Optional[str] = None,
+    verify: bool = True,
+    image_model: str = "dall-e-3",
+    theme: str = "",
+    tone: str = "neutral",
+    style: str = "vivid",
+    quality: str = "standard",
+    size: str = "1024x1024",
+    prompt_model: str = "gpt-4o-mini",
+    language: str = "es-PR",
+    output_dir: str | Path = "downloaded_images",
+    filename_prefix: Optional[str] = None,
+    prompt_override: Optional[str] = None,
+    session: Optional[Session] = None,
+    max_workers: Optional[int] = None,
+) -> ImageResult:
+    """Generate one image and hide a flag in a copy of it per team.
+
+    One image call produces the base image; every flag is then embedded
+    locally (see `stego_variants`), so 500 teams cost one generation and
+    500 PNG encodes spread over a process pool.
+
+    Args:
+        flags (Mapping[str, str] | Sequence[str] | str): Team -> flag, or a list of flags.
+        stego_method (str): "lsb" or "palette" (drops transparency, see
+            `embed_flag`). Defaults to "lsb".
+        stego_key (str | None): Scatter the bits over positions derived from this key. Defaults to None.
+        verify (bool): Extract every flag again after embedding. Defaults to True.
+        max_workers (int | None): Worker processes for the embedding. Defaults to one per CPU.
+        Other arguments: See `generate_images`.
+
+    Returns:
+        ImageResult: The base image in `files` and label -> image in `stego`.
+
+    Raises:
+        RuntimeError: If the API call fails or returns no image, or NumPy or Pillow is missing.
+        ValueError: If no flags are given or a flag doesn't fit in the image.
+    """
+    session = session or get_default_session()
+    _stego_labels(flags)  # fail before paying for the image
+    base = generate_images(
+        image_model=image_model, theme=theme, tone=tone, amt=1, style=style, quality=quality,
+        size=size, prompt_model=prompt_model, language=language, output_dir=output_dir,
+        filename_prefix=filename_prefix, prompt_override=prompt_override, return_prompt=True,
+        session=session,
+    )
+    return _stego_result(session, base, flags, output_dir, stego_method, stego_key, verify, max_workers)
+
+
+async def agenerate_stego_images(
+    flags: Mapping[str, str] | Sequence[str] | str,
+    stego_method: str = "lsb",
+    stego_key: Optional[str] = None,
+    verify: bool = True,
+    image_model: str = "dall-e-3",
+    theme: str = "",
+    tone: str = "neutral",
+    style: str = "vivid",
+    quality: str = "standard",
+    size: str = "1024x1024",
+    prompt_model: str = "gpt-4o-mini",
+    language: str = "es-PR",
+    output_dir: str | Path = "downloaded_images",
+    filename_prefix: Optional[str] = None,
+    prompt_override: Optional[str] = None,
+    session: Optional[Session] = None,
+    max_workers: Optional[int] = None,
+) -> ImageResult:
+    """Async counterpart of `generate_stego_images`; the embedding runs off the event loop."""
+    session = session or get_default_session()
+    _stego_labels(flags)
+    base = await agenerate_images(
+        image_model=image_model, theme=theme, tone=tone, amt=1, style=style, quality=quality,
+        size=size, prompt_model=prompt_model, language=language, output_dir=output_dir,
+        filename_prefix=filename_prefix, prompt_override=prompt_override, return_prompt=True,
+        session=session,
+    )
+    return await asyncio.to_thread(
+        _stego_result, session, base, flags, output_dir, stego_method, stego_key, verify, max_workers,
+    )
@@ -0,0 +1,304 @@
+"""
+Provider Batch API mode for large offline generation runs.
+
+Instead of one interactive call per job, the Responses requests that
+`generate_flags` / `generate_stories` would make are compiled into a batch
+input JSONL, submitted to the provider's Batch API, polled until the batch
+finishes, and the outputs are mapped back through `parse_flags` /
+`parse_stories` / `parse_titled_stories`. Batches trade latency (up to the
+completion window) for higher throughput and lower cost.
+
+Flags go through the same checks as interactive runs: each is validated
+against the job's `flag_format` (trivial defects repaired, the rest
+dropped) and, with `unique_index`, claimed in the index. There is no
+top-up round, so a job may return fewer than `amt` flags.
+
+Jobs use the same shape as `ctf-assets batch` manifests, restricted to
+flags and stories:
+
+    {"id": "f1", "asset": "flags", "theme": "Pirates", "amt": 20}
+    {"id": "s1", "asset": "stories", "function": "generate_stories_with_titles", "amt": 5}
+
+Classes:
+    BatchTransport: Protocol for submitting and polling a batch.
+    OpenAIBatchTransport: Transport backed by the OpenAI Files and Batches APIs.
+    ProviderBatchResult: Parsed results and per-job errors.
+
+Functions:
+    - compile_requests: Turn jobs into Batch API request lines.
+    - run_provider_batch: Submit, poll and parse a batch.
+
+Example:
+    result = run_provider_batch(load_manifest("overnight.jsonl"), poll_interval=60)
+    print(result.results["f1"])
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Protocol
+
+from ctf_assets.session import Session, get_default_session
+from ctf_assets.utils.flag_index import resolve_flag_index
+from ctf_assets.utils.response_parser import (
+    output_text_from_body,
+    parse_flags,
+    parse_stories,
+    parse_titled_stories,
+)
+
+RESPONSES_ENDPOINT = "/v1/responses"
+
+# Batch states after which polling stops
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+@dataclass(frozen=True)
+class BatchRequest:
+    custom_id: str
+    kind: str  # "flags", "stories" or "stories_with_titles"
+    body: dict[str, Any]
+    # Flag jobs: what their output is validated and claimed against
+    flag_format: str | None = None
+    unique_index: Any = None
+
+    def to_line(self) -> str:
+        return json.dumps(
+            {"custom_id": self.custom_id, "method": "POST", "url": RESPONSES_ENDPOINT, "body": self.body},
+            ensure_ascii=False,
+        )
+
+
+@dataclass(frozen=True)
+class BatchStatus:
+    id: str
+    status: str
+    output_file_id: str | None = None
+    error_file_id: str | None = None
+
+
+@dataclass
+class ProviderBatchResult:
+    batch_id: str
+    status: str
+    results: dict[str, list] = field(default_factory=dict)
+    errors: dict[str, str] = field(default_factory=dict)
+
+
+class BatchTransport(Protocol):
+    """Where a batch is submitted. Swap in a stand-in to test without the provider."""
+
+    def submit(self, jsonl: bytes, endpoint: str) -> str:
+        """Upload the input JSONL, create the batch and return its id."""
+        ...
+
+    def poll(self, batch_id: str) -> BatchStatus:
+        """Return the current state of the batch."""
+        ...
+
+    def download(self, file_id: str) -> str:
+        """Return the content of an output or error file."""
+        ...
+
+
+class OpenAIBatchTransport:
+    """Batch transport using the OpenAI Files and Batches APIs of a session's client."""
+
+    def __init__(self, session: Session | None = None, completion_window: str = "24h") -> None:
+        self.session = session or get_default_session()
+        self.completion_window = completion_window
+
+    def submit(self, jsonl: bytes, endpoint: str) -> str:
+        client = self.session.client
+        input_file = client.files.create(file=("batch_input.jsonl", jsonl), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=endpoint,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def poll(self, batch_id: str) -> BatchStatus:
+        batch = self.session.client.batches.retrieve(batch_id)
+        return BatchStatus(
+            id=batch.id,
+            status=batch.status,
+            output_file_id=getattr(batch, "output_file_id", None),
+            error_file_id=getattr(batch, "error_file_id", None),
+        )
+
+    def download(self, file_id: str) -> str:
+        return self.session.client.files.content(file_id).text
+
+
+def _bind(func, params: dict[str, Any]) -> dict[str, Any]:
+    """Fill in the generator's defaults for the parameters a job leaves out."""
+    bound = inspect.signature(func).bind_partial(**params)
+    bound.apply_defaults()
+    return dict(bound.arguments)
+
+
+def compile_requests(jobs: Iterable[dict[str, Any]], session: Session | None = None) -> list[BatchRequest]:
+    """
+    Compile flag and story jobs into Batch API requests.
+
+    Each request body is exactly what the interactive generator would send,
+    built by the same helpers.
+
+    Raises:
+        ValueError: If a job is not a flag or story job, or ids repeat.
+        TypeError: If a job has parameters the generator does not accept.
+    """
+    from ctf_assets.flag_generator import _flag_request, generate_flags
+    from ctf_assets.story_generator import _story_request, generate_stories
+
+    session = session or get_default_session()
+    requests: list[BatchRequest] = []
+    seen: set[str] = set()
+
+    for index, job in enumerate(jobs):
+        params = dict(job)
+        custom_id = str(params.pop("id", index))
+        asset = params.pop("asset", None)
+        function_name = str(params.pop("function", f"generate_{asset}")).replace("-", "_")
+        for ignored in ("cache", "refresh", "session"):
+            params.pop(ignored, None)
+
+        if custom_id in seen:
+            raise ValueError(f"Duplicate job id {custom_id!r}")
+        seen.add(custom_id)
+
+        if asset == "flags" and function_name == "generate_flags":
+            args = _bind(generate_flags, params)
+            builder, kind = _flag_request, "flags"
+        elif asset == "stories" and function_name in {"generate_stories", "generate_stories_with_titles"}:
+            if function_name == "generate_stories_with_titles":
+                params["title"] = True
+            args = _bind(generate_stories, params)
+            builder = _story_request
+            kind = "stories_with_titles" if args.get("title") else "stories"
+        else:
+            raise ValueError(f"Job {custom_id!r}: provider batches support flag and story jobs only")
+
+        accepted = inspect.signature(builder).parameters
+        body = builder(**{k: v for k, v in args.items() if k in accepted and k != "session"}, session=session)
+        if kind == "flags":
+            request = BatchRequest(
+                custom_id=custom_id, kind=kind, body=body,
+                flag_format=args["flag_format"], unique_index=args["unique_index"],
+            )
+        else:
+            request = BatchRequest(custom_id=custom_id, kind=kind, body=body)
+        requests.append(request)
+
+    return requests
+
+
+_PARSERS = {
+    "flags": parse_flags,
+    "stories": parse_stories,
+    "stories_with_titles": parse_titled_stories,
+}
+
+
+def _parse_output(request: BatchRequest, output_text: str, session: Session) -> list:
+    items = _PARSERS[request.kind](response=output_text)
+    if request.kind != "flags":
+        return items
+
+    from ctf_assets.flag_generator import _valid_flags
+
+    flags = list(dict.fromkeys(_valid_flags(items, request.flag_format, session.metrics)))
+    index = resolve_flag_index(request.unique_index)
+    return index.claim(flags) if index is not None else flags
+
+
+def _collect_output(text: str, requests: dict[str, BatchRequest], result: ProviderBatchResult, session: Session) -> None:
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        custom_id = str(record.get("custom_id"))
+        if custom_id not in requests:
+            continue
+
+        error = record.get("error")
+        response = record.get("response") or {}
+        status_code = response.get("status_code", 200)
+        if error or status_code >= 400:
+            message = (error or {}).get("message") if isinstance(error, dict) else error
+            body_error = (response.get("body") or {}).get("error") if isinstance(response.get("body"), dict) else None
+            if not message and isinstance(body_error, dict):
+                message = body_error.get("message")
+            result.errors[custom_id] = str(message or f"HTTP {status_code}")
+            continue
+
+        output_text = output_text_from_body(response.get("body") or {})
+        result.results[custom_id] = _parse_output(requests[custom_id], output_text, session)
+
+
+def run_provider_batch(
+        jobs: Iterable[dict[str, Any]],
+        transport: BatchTransport | None = None,
+        poll_interval: float = 30.0,
+        timeout: float | None = None,
+        session: Session | None = None,
+) -> ProviderBatchResult:
+    """
+    Compile jobs, submit them as one provider batch and wait for the results.
+
+    Args:
+        jobs (Iterable[dict]): Flag and story jobs (see module docstring).
+        transport (BatchTransport | None): Where to submit the batch.
+            Defaults to `OpenAIBatchTransport` on the session.
+        poll_interval (float): Seconds between status checks. Defaults to 30.
+        timeout (float | None): Give up waiting after this many seconds.
+            Defaults to waiting until the batch reaches a terminal state.
+        session (Session | None): Session used to validate models and,
+            by default, to submit. Defaults to the process-wide session.
+
+    Returns:
+        ProviderBatchResult: Parsed results keyed by job id, and per-job errors
+            for requests that failed or never produced output.
+
+    Raises:
+        TimeoutError: If `timeout` elapses before the batch finishes.
+    """
+    session = session or get_default_session()
+    transport = transport or OpenAIBatchTransport(session=session)
+
+    requests = compile_requests(jobs, session=session)
+    by_id = {r.custom_id: r for r in requests}
+    if not requests:
+        return ProviderBatchResult(batch_id="", status="completed")
+
+    jsonl = ("\n".join(r.to_line() for r in requests) + "\n").encode("utf-8")
+    batch_id = transport.submit(jsonl, RESPONSES_ENDPOINT)
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        status = transport.poll(batch_id)
+        if status.status in TERMINAL_STATES:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"Batch {batch_id} still {status.status!r} after {timeout}s")
+        time.sleep(poll_interval)
+
+    result = ProviderBatchResult(batch_id=batch_id, status=status.status)
+    for file_id in (status.output_file_id, status.error_file_id):
+        if file_id:
+            _collect_output(transport.download(file_id), by_id, result, session)
+
+    for custom_id in by_id:
+        if custom_id not in result.results and custom_id not in result.errors:
+            result.errors[custom_id] = f"No output (batch {status.status})"
+
+    return result
@@ -78,3 +78,56 @@ def get_titled_story_schema():
     }
 
 
+
+def get_image_prompt_schema():
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": "ImagePromptResponse",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "prompts": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "List of distinct text-to-image prompts",
+                    },
+                },
+                "required": ["prompts"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        }
+    }
+
+
+def get_word_pool_schema():
+    return {
+        "format": {
+            "type": "json_schema",
+            "name": "WordPoolResponse",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "adjectives": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Single-word themed adjectives",
+                    },
+                    "nouns": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Single-word themed nouns",
+                    },
+                    "verbs": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Single-word themed verbs",
+                    },
+                },
+                "required": ["adjectives", "nouns", "verbs"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        }
+    }
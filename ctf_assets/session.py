@@ -0,0 +1,696 @@
+"""
+Reusable generation session.
+
+A `Session` owns one backend (by default the OpenAI API through a
+connection-pooled client and its async twin), the resolved model
+capabilities and the prebuilt JSON schemas, so that many generation calls
+reuse the same HTTP keep-alive connections and TLS sessions instead of
+building a fresh client per asset. Every call also goes through
+the session's `AdaptiveRateLimiter`, so parallel generators share one view
+of the provider's rate limits, and its `Resilience` layer, so transient
+failures are retried with backoff instead of losing the work. Attempts,
+latencies, tokens and retries are recorded in the session's
+`MetricsRegistry`.
+
+Classes:
+    Session: Shared client, model capabilities and schemas for generators.
+
+Functions:
+    get_default_session: Return the process-wide session used when a
+        generator is called without an explicit `session`.
+    set_default_session: Replace the process-wide session.
+
+Example:
+    with Session() as session:
+        for theme in themes:
+            flags = session.generate_flags(theme=theme, amt=5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import threading
+import time
+import warnings
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Iterator
+
+from ctf_assets.backends import Backend, resolve_backend
+from ctf_assets.schema.json_schema import (
+    get_flag_schema,
+    get_image_prompt_schema,
+    get_story_schema,
+    get_titled_story_schema,
+    get_word_pool_schema,
+)
+from ctf_assets.utils import sdk
+from ctf_assets.utils.helpers import (
+    get_image_models,
+    get_reasoning_openai_models,
+    get_supported_openai_models,
+)
+from ctf_assets.utils.metrics import MetricsRegistry, get_default_registry
+from ctf_assets.utils.model_catalog import is_image_model, is_reasoning_model, supports_temperature
+from ctf_assets.utils.rate_limit import AdaptiveRateLimiter, estimate_tokens
+from ctf_assets.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    Resilience,
+    RetryPolicy,
+    is_retryable,
+)
+from ctf_assets.utils.response_cache import ResponseCache, response_cache_key
+from ctf_assets.utils.routing import ModelRouter
+from ctf_assets.utils.usage import Usage
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+_default_session: Session | None = None
+_default_session_lock = threading.Lock()
+
+
+class Session:
+    """
+    Shared backend, model capabilities and schemas for generators.
+
+    The backend's clients are created lazily on first use and kept for the
+    lifetime of the session, so the SDK's connection pool stays warm across
+    calls. Model capabilities are resolved once and stored as frozensets for
+    O(1) membership checks.
+
+    Args:
+        api_key (str | None): OpenAI API key. Defaults to `fetch_openai_key()`.
+        timeout (float): Per-request timeout in seconds. Defaults to 600.
+        http_client (Any): Optional HTTP client for the sync OpenAI client,
+            e.g. to tune connection pool limits. Defaults to the SDK's pool.
+        async_http_client (Any): Optional HTTP client for the async client.
+        backend (Backend | str | None): Where calls go: a `Backend`, "openai",
+            "fake" or the URL of an OpenAI-compatible server. Defaults to the
+            `CTF_ASSETS_BACKEND` environment variable, then "openai". The four
+            arguments above configure the OpenAI backends only.
+        base_url (str | None): URL of an OpenAI-compatible server, e.g. a local
+            inference server. Shortcut for `backend=<url>`.
+        router (ModelRouter | None): Picks the model of flag, story and image
+            prompt requests from per-asset tiers by recent latency and error
+            rate, and falls back to the next model when a call fails. Routed
+            asset types ignore the generators' `model` argument.
+        response_cache (ResponseCache | None): Cache used by calls made with
+            `cache=True`. Defaults to a `ResponseCache` in the cache directory,
+            opened on first use.
+        rate_limiter (AdaptiveRateLimiter | bool | None): Limiter every call
+            goes through. Pass one instance to several sessions to share it,
+            or False to disable limiting. Defaults to a new limiter.
+        retry (RetryPolicy | bool | None): Backoff for timeouts, connection
+            errors, 429s and 5xx responses. False makes a single attempt.
+            Defaults to `RetryPolicy()`; the SDK's own retries are then off.
+        circuit_breaker (CircuitBreaker | bool | None): Per-model breaker.
+            False disables it. Defaults to `CircuitBreaker()`.
+        hedge (HedgePolicy | bool | None): Fire a duplicate Responses call
+            once the first is slower than the model's recent p95 latency.
+            True uses `HedgePolicy()`. Defaults to off. Image and streaming
+            calls are never hedged.
+        metrics (MetricsRegistry | None): Registry for API and generator
+            metrics. Defaults to the process-wide `get_default_registry()`.
+    """
+
+    def __init__(
+            self,
+            api_key: str | None = None,
+            timeout: float = 600.0,
+            http_client: Any = None,
+            async_http_client: Any = None,
+            response_cache: ResponseCache | None = None,
+            rate_limiter: AdaptiveRateLimiter | bool | None = None,
+            retry: RetryPolicy | bool | None = None,
+            circuit_breaker: CircuitBreaker | bool | None = None,
+            hedge: HedgePolicy | bool | None = None,
+            metrics: MetricsRegistry | None = None,
+            backend: Backend | str | None = None,
+            base_url: str | None = None,
+            router: ModelRouter | None = None,
+    ) -> None:
+        self._response_cache = response_cache
+        if rate_limiter is None or rate_limiter is True:
+            rate_limiter = AdaptiveRateLimiter()
+        self.rate_limiter: AdaptiveRateLimiter | None = rate_limiter or None
+        # Token totals of every call made through this session
+        self.usage = Usage()
+        self.metrics = metrics if metrics is not None else get_default_registry()
+        self.resilience = Resilience(
+            metrics=self.metrics,
+            retry=RetryPolicy() if retry is None or retry is True else (retry or None),
+            circuit_breaker=CircuitBreaker() if circuit_breaker is None or circuit_breaker is True else (circuit_breaker or None),
+            hedge=HedgePolicy() if hedge is True else (hedge or None),
+        )
+        self.backend = resolve_backend(
+            backend,
+            base_url,
+            api_key=api_key,
+            timeout=timeout,
+            http_client=http_client,
+            async_http_client=async_http_client,
+            # Retries happen in `self.resilience`; SDK retries on top would multiply them
+            max_retries=0 if self.resilience.retry is not None else None,
+        )
+        self.router = router
+        self._lock = threading.Lock()
+        # Model list of backends that don't share the on-disk catalogue
+        self._models: frozenset[str] | None = None
+        self._substituted_models: set[str] = set()
+        # Models that answered "temperature not supported" with a 400
+        self._no_temperature: set[str] = set()
+
+        # Prebuilt schemas, shared by every request issued through this session
+        self.schemas: dict[str, dict[str, Any]] = {
+            "flags": get_flag_schema(),
+            "stories": get_story_schema(),
+            "stories_with_titles": get_titled_story_schema(),
+            "image_prompts": get_image_prompt_schema(),
+            "word_pools": get_word_pool_schema(),
+        }
+
+    @property
+    def client(self) -> OpenAI:
+        """The backend's pooled OpenAI client, for APIs without a session method."""
+        return self.backend.client
+
+    @property
+    def response_cache(self) -> ResponseCache:
+        if self._response_cache is None:
+            with self._lock:
+                if self._response_cache is None:
+                    self._response_cache = ResponseCache()
+        return self._response_cache
+
+    @property
+    def supported_models(self) -> frozenset[str]:
+        if self.backend.uses_model_catalog:
+            return get_supported_openai_models(self.client)
+        if self._models is None:
+            with self._lock:
+                if self._models is None:
+                    self._models = self.backend.list_models()
+        return self._models
+
+    @property
+    def reasoning_models(self) -> frozenset[str]:
+        if self.backend.uses_model_catalog:
+            return get_reasoning_openai_models(self.client)
+        return frozenset(model for model in self.supported_models if is_reasoning_model(model))
+
+    @property
+    def image_models(self) -> frozenset[str]:
+        if self.backend.uses_model_catalog:
+            return get_image_models(self.client)
+        return frozenset(model for model in self.supported_models if is_image_model(model))
+
+    def refresh_models(self) -> frozenset[str]:
+        """Re-query the model list; for the OpenAI API also rewrite the disk cache."""
+        if self.backend.uses_model_catalog:
+            return get_supported_openai_models(self.client, refresh=True)
+        self._models = None
+        return self.supported_models
+
+    def validate_model(self, model: str) -> str:
+        """
+        Return `model` if the backend serves it, otherwise the backend's
+        default model ("gpt-4o-mini" for OpenAI). Backends that can't list
+        their models accept any name.
+        """
+        models = self.supported_models
+        if not models or model in models:
+            return model
+        fallback = self.backend.default_model or model
+        # Shards validate the model from worker threads; warn once per model
+        with self._lock:
+            first = model not in self._substituted_models
+            self._substituted_models.add(model)
+        if first:
+            warnings.warn(f"Model {model!r} is not available; using {fallback!r} instead.")
+        return fallback
+
+    # Model routing
+
+    def _unavailable(self, models: Iterable[str]) -> set[str]:
+        """Models that can't take a request now: circuit open, or not served by the backend."""
+        served = self.supported_models
+        breaker = self.resilience.circuit_breaker
+        return {
+            model for model in models
+            if (served and model not in served) or (breaker is not None and breaker.state(model) == "open")
+        }
+
+    def route(self, asset_type: str, model: str, exclude: Iterable[str] = ()) -> str:
+        """
+        Model for one `asset_type` request.
+
+        The router's pick if it has a route for `asset_type`, otherwise
+        `validate_model(model)`.
+        """
+        router = self.router
+        routed = router.models(asset_type) if router is not None else []
+        if not routed:
+            return self.validate_model(model)
+        chosen = router.choose(asset_type, exclude=set(exclude) | self._unavailable(routed))
+        # Every routed model is unavailable: let the call fail (and fall back) on the first one
+        return chosen or routed[0]
+
+    def _with_model(self, params: dict[str, Any], model: str) -> dict[str, Any]:
+        params = {**params, "model": model}
+        if not self.supports_temperature(model):
+            params.pop("temperature", None)
+        return params
+
+    def _fallback(self, route: str | None, params: dict[str, Any], error: Exception, tried: set[str]) -> dict[str, Any] | None:
+        """Parameters for the next routed model after `error`, or None to raise it."""
+        if route is None or self.router is None or not isinstance(error, (sdk.OpenAIError, CircuitOpenError)):
+            return None
+        failed = params.get("model", "")
+        tried.add(failed)
+        model = self.router.choose(route, exclude=tried | self._unavailable(self.router.models(route)))
+        if model is None:
+            return None
+        self.metrics.inc("ctf_assets_fallbacks_total", route=route, model=failed)
+        return self._with_model(params, model)
+
+    def supports_temperature(self, model: str) -> bool:
+        """Reasoning models reject the temperature parameter, and so did any model that answered a 400 for it."""
+        return model not in self._no_temperature and supports_temperature(model)
+
+    def _without_rejected_temperature(self, params: dict[str, Any], error: BaseException) -> dict[str, Any] | None:
+        """
+        `params` without temperature if `error` is the 400 rejecting it, else None.
+
+        Models missing from the bundled capability table are assumed to take
+        a temperature; a new reasoning model is learned here instead, once
+        per session, and later requests leave the parameter out.
+        """
+        if "temperature" not in params or not isinstance(error, sdk.BadRequestError):
+            return None
+        if "temperature" not in str(error).lower():
+            return None
+        model = params.get("model", "")
+        with self._lock:
+            self._no_temperature.add(model)
+        return {k: v for k, v in params.items() if k != "temperature"}
+
+    # Rate-limited calls
+
+    def _finish_attempt(
+            self,
+            endpoint: str,
+            model: str,
+            started: float,
+            call: dict[str, Any],
+            error: BaseException | None = None,
+    ) -> None:
+        """Release the attempt's limiter slot and record its latency and outcome."""
+        elapsed = time.perf_counter() - started
+        headers = call.get("headers")
+        release: dict[str, Any] = {}
+        if error is None:
+            outcome = "ok"
+        elif not isinstance(error, Exception):
+            # Cancelled: a hedge loser, or a stream closed by its consumer
+            outcome, release = "cancelled", {"ok": False}
+        elif isinstance(error, sdk.RateLimitError):
+            outcome, headers, release = "throttled", error.response.headers, {"throttled": True}
+        elif isinstance(error, sdk.APIStatusError):
+            outcome, headers, release = "error", error.response.headers, {"ok": False}
+        else:
+            outcome, release = "error", {"ok": False}
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.release(model, headers, **release)
+        # Only what says the model is unhealthy (5xx, 429, timeouts, connection
+        # errors) counts against it; a 400 for this request's own parameters
+        # or content is recorded as neither success nor failure
+        if self.router is not None and (error is None or is_retryable(error)):
+            self.router.record(model, elapsed, ok=error is None)
+        self.metrics.observe("ctf_assets_api_seconds", elapsed, endpoint=endpoint, model=model)
+        self.metrics.inc("ctf_assets_api_calls_total", endpoint=endpoint, model=model, outcome=outcome)
+
+    @contextlib.contextmanager
+    def _rate_limited(self, model: str, tokens: float, endpoint: str = "responses") -> Iterator[dict[str, Any]]:
+        """
+        Hold a rate-limiter slot for one attempt and record its metrics.
+
+        The caller stores the response headers in the yielded dict so the
+        limiter can learn the provider's limits from them.
+        """
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(model, tokens)
+        call: dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            self._finish_attempt(endpoint, model, started, call, e)
+            raise
+        self._finish_attempt(endpoint, model, started, call)
+
+    @contextlib.asynccontextmanager
+    async def _arate_limited(self, model: str, tokens: float, endpoint: str = "responses") -> AsyncIterator[dict[str, Any]]:
+        """Async counterpart of `_rate_limited`."""
+        if self.rate_limiter is not None:
+            await self.rate_limiter.aacquire(model, tokens)
+        call: dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            self._finish_attempt(endpoint, model, started, call, e)
+            raise
+        self._finish_attempt(endpoint, model, started, call)
+
+    # Responses calls
+
+    def create_response(self, params: dict[str, Any]) -> Any:
+        """Issue a rate-limited, retried (and optionally hedged) `responses.create` call."""
+        model = params.get("model", "")
+
+        def attempt() -> Any:
+            with self._rate_limited(model, estimate_tokens(params)) as call:
+                response, call["headers"] = self.backend.create_response(params)
+                return response
+
+        try:
+            return self.resilience.call(model, attempt, hedge=True)
+        except Exception as e:
+            retry_params = self._without_rejected_temperature(params, e)
+            if retry_params is None:
+                raise
+            return self.create_response(retry_params)
+
+    async def acreate_response(self, params: dict[str, Any]) -> Any:
+        """Async counterpart of `create_response`."""
+        model = params.get("model", "")
+
+        async def attempt() -> Any:
+            async with self._arate_limited(model, estimate_tokens(params)) as call:
+                response, call["headers"] = await self.backend.acreate_response(params)
+                return response
+
+        try:
+            return await self.resilience.acall(model, attempt, hedge=True)
+        except Exception as e:
+            retry_params = self._without_rejected_temperature(params, e)
+            if retry_params is None:
+                raise
+            return await self.acreate_response(retry_params)
+
+    def create_images(self, params: dict[str, Any]) -> Any:
+        """Issue a rate-limited, retried `images.generate` call and return the parsed response."""
+        model = params.get("model", "")
+
+        def attempt() -> Any:
+            with self._rate_limited(model, 0, endpoint="images") as call:
+                response, call["headers"] = self.backend.generate_images(params)
+                return response
+
+        return self.resilience.call(model, attempt)
+
+    async def acreate_images(self, params: dict[str, Any]) -> Any:
+        """Async counterpart of `create_images`."""
+        model = params.get("model", "")
+
+        async def attempt() -> Any:
+            async with self._arate_limited(model, 0, endpoint="images") as call:
+                response, call["headers"] = await self.backend.agenerate_images(params)
+                return response
+
+        return await self.resilience.acall(model, attempt)
+
+    def _record_usage(self, model: str, response_usage: Any, usage: Usage | None) -> None:
+        if response_usage is None:
+            return
+        call_usage = Usage()
+        call_usage.record(response_usage)
+        self.usage.record(response_usage)
+        if usage is not None:
+            usage.record(response_usage)
+        self.metrics.inc("ctf_assets_tokens_total", call_usage.input_tokens, model=model, kind="input")
+        self.metrics.inc("ctf_assets_tokens_total", call_usage.output_tokens, model=model, kind="output")
+        self.metrics.inc("ctf_assets_tokens_total", call_usage.cached_tokens, model=model, kind="cached")
+
+    def _record_cache_hit(self, usage: Usage | None) -> None:
+        if usage is not None:
+            usage.record_cache_hit()
+        self.metrics.inc("ctf_assets_response_cache_hits_total")
+
+    def respond(
+            self,
+            params: dict[str, Any],
+            cache: bool = False,
+            refresh: bool = False,
+            usage: Usage | None = None,
+            route: str | None = None,
+    ) -> str:
+        """
+        Issue a Responses call and return its output text.
+
+        Args:
+            params (dict): Keyword arguments for `client.responses.create`.
+            cache (bool): Serve from and store into the response cache. Defaults to False.
+            refresh (bool): Skip cache lookups but still store the fresh result. Defaults to False.
+            usage (Usage | None): Also add the call's token usage here. The
+                session's own `usage` totals are always updated.
+            route (str | None): Asset type the request was routed for. If the
+                call fails, it is retried on the router's next model.
+
+        Returns:
+            str: The response `output_text`.
+        """
+        use_cache = cache or refresh
+        key = response_cache_key(params) if use_cache else None
+        if cache and not refresh:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                self._record_cache_hit(usage)
+                return cached
+
+        tried: set[str] = set()
+        while True:
+            try:
+                response = self.create_response(params)
+                break
+            except Exception as e:
+                # A routed request moves on to the next model once this one gives up
+                params = self._fallback(route, params, e, tried)
+                if params is None:
+                    raise
+        self._record_usage(params.get("model", ""), getattr(response, "usage", None), usage)
+        output_text = response.output_text or ""
+
+        if use_cache and output_text:
+            self.response_cache.set(key, output_text)
+        return output_text
+
+    async def arespond(
+            self,
+            params: dict[str, Any],
+            cache: bool = False,
+            refresh: bool = False,
+            usage: Usage | None = None,
+            route: str | None = None,
+    ) -> str:
+        """Async counterpart of `respond`."""
+        use_cache = cache or refresh
+        key = response_cache_key(params) if use_cache else None
+        if cache and not refresh:
+            cached = await asyncio.to_thread(self.response_cache.get, key)
+            if cached is not None:
+                self._record_cache_hit(usage)
+                return cached
+
+        tried: set[str] = set()
+        while True:
+            try:
+                response = await self.acreate_response(params)
+                break
+            except Exception as e:
+                # A routed request moves on to the next model once this one gives up
+                params = self._fallback(route, params, e, tried)
+                if params is None:
+                    raise
+        self._record_usage(params.get("model", ""), getattr(response, "usage", None), usage)
+        output_text = response.output_text or ""
+
+        if use_cache and output_text:
+            await asyncio.to_thread(self.response_cache.set, key, output_text)
+        return output_text
+
+    def stream_text(self, params: dict[str, Any], usage: Usage | None = None) -> Iterator[str]:
+        """
+        Issue a streaming Responses call and yield output text deltas.
+
+        Streamed calls bypass the response cache. The rate-limiter slot is
+        held until the stream ends. A failure before the first delta is
+        retried; once text has been yielded the error is raised. Token usage
+        from the final event is added to `usage` and the session totals.
+        """
+        model = params.get("model", "")
+        attempt = 0
+        while True:
+            started = False
+            self.resilience.before_attempt(model)
+            try:
+                with self._rate_limited(model, estimate_tokens(params)) as call:
+                    stream, call["headers"] = self.backend.stream_response(params)
+                    try:
+                        for event in stream:
+                            event_type = getattr(event, "type", None)
+                            if event_type == "response.output_text.delta":
+                                started = True
+                                yield event.delta
+                            elif event_type == "response.completed":
+                                self._record_usage(model, getattr(event.response, "usage", None), usage)
+                    finally:
+                        stream.close()
+            except Exception as e:
+                backoff = None if started else self.resilience.on_failure(model, e, attempt)
+                if backoff is None:
+                    retry_params = None if started else self._without_rejected_temperature(params, e)
+                    if retry_params is None:
+                        raise
+                    params = retry_params
+                    continue
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                # Closed by the consumer or cancelled: free a half-open trial slot
+                self.resilience.on_abort(model)
+                raise
+            self.resilience.on_success(model)
+            return
+
+    async def astream_text(self, params: dict[str, Any], usage: Usage | None = None) -> AsyncIterator[str]:
+        """Async counterpart of `stream_text`."""
+        model = params.get("model", "")
+        attempt = 0
+        while True:
+            started = False
+            self.resilience.before_attempt(model)
+            try:
+                async with self._arate_limited(model, estimate_tokens(params)) as call:
+                    stream, call["headers"] = await self.backend.astream_response(params)
+                    try:
+                        async for event in stream:
+                            event_type = getattr(event, "type", None)
+                            if event_type == "response.output_text.delta":
+                                started = True
+                                yield event.delta
+                            elif event_type == "response.completed":
+                                self._record_usage(model, getattr(event.response, "usage", None), usage)
+                    finally:
+                        await stream.close()
+            except Exception as e:
+                backoff = None if started else self.resilience.on_failure(model, e, attempt)
+                if backoff is None:
+                    retry_params = None if started else self._without_rejected_temperature(params, e)
+                    if retry_params is None:
+                        raise
+                    params = retry_params
+                    continue
+                await asyncio.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                # Closed by the consumer or cancelled: free a half-open trial slot
+                self.resilience.on_abort(model)
+                raise
+            self.resilience.on_success(model)
+            return
+
+    # Generators bound to this session
+
+    def generate_flags(self, **kwargs: Any) -> list[str]:
+        from ctf_assets.flag_generator import generate_flags
+        return generate_flags(session=self, **kwargs)
+
+    def generate_stories(self, **kwargs: Any) -> list[str] | list[dict[str, str]]:
+        from ctf_assets.story_generator import generate_stories
+        return generate_stories(session=self, **kwargs)
+
+    def generate_stories_with_titles(self, **kwargs: Any) -> list[dict[str, str]]:
+        from ctf_assets.story_generator import generate_stories_with_titles
+        return generate_stories_with_titles(session=self, **kwargs)
+
+    def generate_images(self, **kwargs: Any):
+        from ctf_assets.image_generator import generate_images
+        return generate_images(session=self, **kwargs)
+
+    def generate_procedural_flags(self, **kwargs: Any) -> list[str]:
+        from ctf_assets.flag_engine import generate_procedural_flags
+        return generate_procedural_flags(session=self, **kwargs)
+
+    async def agenerate_flags(self, **kwargs: Any) -> list[str]:
+        from ctf_assets.flag_generator import agenerate_flags
+        return await agenerate_flags(session=self, **kwargs)
+
+    async def agenerate_stories(self, **kwargs: Any) -> list[str] | list[dict[str, str]]:
+        from ctf_assets.story_generator import agenerate_stories
+        return await agenerate_stories(session=self, **kwargs)
+
+    async def agenerate_stories_with_titles(self, **kwargs: Any) -> list[dict[str, str]]:
+        from ctf_assets.story_generator import agenerate_stories_with_titles
+        return await agenerate_stories_with_titles(session=self, **kwargs)
+
+    async def agenerate_images(self, **kwargs: Any):
+        from ctf_assets.image_generator import agenerate_images
+        return await agenerate_images(session=self, **kwargs)
+
+    async def agenerate_procedural_flags(self, **kwargs: Any) -> list[str]:
+        from ctf_assets.flag_engine import agenerate_procedural_flags
+        return await agenerate_procedural_flags(session=self, **kwargs)
+
+    # Lifecycle
+
+    def close(self) -> None:
+        """Close the backend's synchronous client, its connection pool and the response cache."""
+        self.backend.close()
+        if self._response_cache is not None:
+            self._response_cache.close()
+        self.resilience.close()
+
+    async def aclose(self) -> None:
+        """Close both clients and their connection pools."""
+        await self.backend.aclose()
+        self.close()
+
+    def __enter__(self) -> Session:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    async def __aenter__(self) -> Session:
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+def get_default_session() -> Session:
+    """Return the process-wide session, creating it on first use."""
+    global _default_session
+
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = Session()
+    return _default_session
+
+
+def set_default_session(session: Session | None) -> None:
+    """
+    Replace the process-wide session, e.g. to send every generator call to
+    another backend. None resets it to be created again on next use.
+    """
+    global _default_session
+
+    with _default_session_lock:
+        _default_session = session
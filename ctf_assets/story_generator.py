@@ -7,43 +7,53 @@ generate stories based on a theme and tone. It replies in JSON format.
 Functions:
     - generate_stories- Generates stories based on theme and tone.
     - generate_stories_with_titles- Generates stories with titles based on theme and tone.
+    - agenerate_stories- Async counterpart of generate_stories.
+    - agenerate_stories_with_titles- Async counterpart of generate_stories_with_titles.
+    - iter_stories / aiter_stories- Stream stories one by one as the model produces them.
 
 Usage Example:
     - generate_stories(theme="Cyberattacks", tone="dramatic", amt=1, model="o1-mini", language="en")
     - generate_stories_with_titles(theme="Cybersecurity", tone="dramatic", amt=1, model="gpt-4o-mini", language="es-PR")    
+    - await agenerate_stories(theme="Cyberattacks", tone="dramatic", amt=1)
 """
 
-from openai import OpenAI, OpenAIError
-from ctf_assets.config import fetch_openai_key
-from ctf_assets.utils.helpers import validate_openai_model
-from ctf_assets.utils.prompts import story_prompt
-from ctf_assets.utils.helpers import get_reasoning_openai_models
-from ctf_assets.schema.json_schema import get_story_schema
-from ctf_assets.schema.json_schema import get_titled_story_schema
-from ctf_assets.utils.response_parser import parse_stories, parse_titled_stories
-def generate_stories(
-        amt: int = 1,
-        theme: str="",
-        tone: str = "neutral",
-        title: bool = False,
-        model: str = "gpt-4o-mini",
-        language: str = "es-PR",
-        additional_instructions: str = "",
-        additional_system_instructions: str = "",
-        temperature: float = 0.65  # Default temperature
-    ) -> list[str] | list[dict[str, str]]:    
-
-    # Validate model. If not supported, defualt to "gtp4o-mini"
-    model = validate_openai_model(model=model)
-    
-    # Initialize the OpenAI API client
-    client = OpenAI(api_key=fetch_openai_key(strict=True))
-    
-    if client is None:
-        raise RuntimeError("OpenAI client failed to initialize. Check OPENAI_API_KEY.")
-
-    # Create the user's role content (prompt)
-    prompt = story_prompt(
+import asyncio
+from typing import AsyncIterator, Iterator
+from ctf_assets.session import Session, get_default_session
+from ctf_assets.utils import sdk
+from ctf_assets.utils.prompts import story_prompt_parts
+from ctf_assets.utils.response_parser import IncrementalArrayParser, parse_stories, parse_titled_stories
+from ctf_assets.utils.sharding import ITEM_TOKEN_ESTIMATES, acollect_sharded, collect_sharded, with_hint
+from ctf_assets.utils.usage import GenerationResult, Usage
+
+
+def _story_request(
+        session: Session,
+        amt: int,
+        theme: str,
+        tone: str,
+        title: bool,
+        model: str,
+        language: str,
+        additional_instructions: str,
+        additional_system_instructions: str,
+        temperature: float,
+) -> dict:
+    """
+    Build the Responses API parameters for a story generation request.
+
+    Shared by `generate_stories` and `agenerate_stories` so both send exactly
+    the same request.
+
+    Returns:
+        dict: Keyword arguments for `client.responses.create`.
+    """
+    # Validate model. If not supported, defualt to "gtp4o-mini".
+    # A session router picks the model itself from its "stories" route.
+    model = session.route("stories", model)
+
+    # Static prefix as instructions (provider prompt cache), variable suffix as input
+    instructions, prompt = story_prompt_parts(
         asset_type="stories",
         title= title,
         theme = theme,
@@ -54,50 +64,184 @@ def generate_stories(
         additional_system_instructions = additional_system_instructions,
     )
 
-    openai_reasoning_models = get_reasoning_openai_models()
-
     if title:
-        story_schema = get_titled_story_schema()
+        story_schema = session.schemas["stories_with_titles"]
     else:
-        story_schema = get_story_schema()
+        story_schema = session.schemas["stories"]
 
     responses_parameters = {
         "model": model,
+        "instructions": instructions,
         "input": prompt,
         "text": story_schema,
     }
 
-
-    if model not in openai_reasoning_models:
+    if session.supports_temperature(model):
         # Add the temperature parameter to the responses_parameters dictionary
         responses_parameters["temperature"] = temperature  
 
-    try:
-        if model not in openai_reasoning_models: 
-            response = client.responses.create( 
+    return responses_parameters
+
+
+def _parse_story_output(output_text: str, title: bool) -> list[str] | list[dict[str, str]]:
+    """Parse the model output into plain or titled stories."""
+    if title:
+        return parse_titled_stories(response=output_text)
+    else:
+        return [story for story in parse_stories(response=output_text) if isinstance(story, str) and story.strip()]
+
+
+def _streamed_stories(items: list, title: bool) -> list[str] | list[dict[str, str]]:
+    """Validate array elements emitted by the incremental parser."""
+    if title:
+        return parse_titled_stories(response={"stories_with_titles": items})
+    return [story for story in items if isinstance(story, str) and story.strip()]
+
+
+def _story_key(story: str | dict[str, str]) -> str:
+    """Deduplication key: the story text, ignoring case and surrounding whitespace."""
+    text = story["story"] if isinstance(story, dict) else story
+    return text.strip().casefold()
+
+
+def _story_tokens(title: bool) -> int:
+    return ITEM_TOKEN_ESTIMATES["stories_with_titles" if title else "stories"]
+
+
+def generate_stories(
+        amt: int = 1,
+        theme: str="",
+        tone: str = "neutral",
+        title: bool = False,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,  # Default temperature
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        return_usage: bool = False,
+    ) -> list[str] | list[dict[str, str]] | GenerationResult:
+
+    """
+    Generate CTF stories using an LLM.
+
+    Large amounts are split into shards that fit the model's output budget,
+    issued concurrently with distinct variation seeds, then deduplicated and
+    topped up so exactly `amt` stories are returned.
+
+    With `return_usage=True` a `GenerationResult` is returned instead, whose
+    `usage` includes the `cached_tokens` served from the provider's prompt cache.
+
+    Returns:
+        list[str] | list[dict[str, str]]: Plain stories, or
+            {'title': ..., 'story': ...} items if `title` is True.
+        GenerationResult: (items, usage) if return_usage=True.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails.
+    """
+    # Reuse the session's pooled OpenAI API client
+    session = session or get_default_session()
+    usage = Usage()
+    metrics = session.metrics
+
+    def fetch(count: int, hint: str) -> list:
+        with metrics.stage("stories", "prompt_build"):
+            responses_parameters = _story_request(
+                session=session,
+                amt=count,
+                theme=theme,
+                tone=tone,
+                title=title,
                 model=model,
+                language=language,
+                additional_instructions=with_hint(additional_instructions, hint),
+                additional_system_instructions=additional_system_instructions,
                 temperature=temperature,
-                input=prompt,
-                text=story_schema
             )
-        else:
-            # Generate flags using OpenAI Completions
-            response = client.responses.create( 
+
+        try:
+            with metrics.stage("stories", "network"):
+                output_text = session.respond(responses_parameters, cache=cache, refresh=refresh, usage=usage, route="stories")
+
+        except sdk.OpenAIError as e:
+            print(f"[ERROR] OpenAI API error: {e}")
+            raise RuntimeError(f"OpenAI API error: {e}")
+
+        with metrics.stage("stories", "parse"):
+            stories = _parse_story_output(output_text, title)
+        # Yield per call: items asked for vs valid items parsed
+        metrics.inc("ctf_assets_items_asked_total", count, generator="stories")
+        metrics.inc("ctf_assets_items_parsed_total", len(stories), generator="stories")
+        return stories
+
+    stories = collect_sharded(fetch, amt=amt, per_item_tokens=_story_tokens(title), key=_story_key)
+    metrics.inc("ctf_assets_items_requested_total", amt, generator="stories")
+    metrics.inc("ctf_assets_items_returned_total", len(stories), generator="stories")
+    return GenerationResult(items=stories, usage=usage) if return_usage else stories
+
+
+async def agenerate_stories(
+        amt: int = 1,
+        theme: str="",
+        tone: str = "neutral",
+        title: bool = False,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        return_usage: bool = False,
+    ) -> list[str] | list[dict[str, str]] | GenerationResult:
+    """
+    Async counterpart of `generate_stories`.
+
+    Takes the same arguments and returns the same result, but awaits the
+    network call on `AsyncOpenAI` so many requests can share one event loop.
+    """
+    session = session or get_default_session()
+    usage = Usage()
+    metrics = session.metrics
+
+    async def fetch(count: int, hint: str) -> list:
+        # Model validation may hit the network the first time, keep it off the event loop
+        with metrics.stage("stories", "prompt_build"):
+            responses_parameters = await asyncio.to_thread(
+                _story_request,
+                session=session,
+                amt=count,
+                theme=theme,
+                tone=tone,
+                title=title,
                 model=model,
-                input=prompt,
-                text=story_schema
+                language=language,
+                additional_instructions=with_hint(additional_instructions, hint),
+                additional_system_instructions=additional_system_instructions,
+                temperature=temperature,
             )
 
-    except OpenAIError as e:
-        print(f"[ERROR] OpenAI API error: {e}")
-        raise RuntimeError(f"OpenAI API error: {e}")
-    
-    if title:
-        return parse_titled_stories(response=response.output_text) 
-    else:
-        return parse_stories(response=response.output_text)
-    
+        try:
+            with metrics.stage("stories", "network"):
+                output_text = await session.arespond(responses_parameters, cache=cache, refresh=refresh, usage=usage, route="stories")
 
+        except sdk.OpenAIError as e:
+            raise RuntimeError(f"OpenAI API error: {e}") from e
+
+        with metrics.stage("stories", "parse"):
+            stories = _parse_story_output(output_text, title)
+        metrics.inc("ctf_assets_items_asked_total", count, generator="stories")
+        metrics.inc("ctf_assets_items_parsed_total", len(stories), generator="stories")
+        return stories
+
+    stories = await acollect_sharded(fetch, amt=amt, per_item_tokens=_story_tokens(title), key=_story_key)
+    metrics.inc("ctf_assets_items_requested_total", amt, generator="stories")
+    metrics.inc("ctf_assets_items_returned_total", len(stories), generator="stories")
+    return GenerationResult(items=stories, usage=usage) if return_usage else stories
 
 
 def generate_stories_with_titles(
@@ -109,7 +253,11 @@ def generate_stories_with_titles(
         additional_instructions: str = "",
         additional_system_instructions: str = "",
         temperature: float = 0.65,
-    ) -> list[dict[str, str]]:
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        return_usage: bool = False,
+    ) -> list[dict[str, str]] | GenerationResult:
     """Convenience wrapper that always returns titled stories."""
     return generate_stories(
         amt=amt,
@@ -121,4 +269,127 @@ def generate_stories_with_titles(
         additional_instructions=additional_instructions,
         additional_system_instructions=additional_system_instructions,
         temperature=temperature,
+        session=session,
+        cache=cache,
+        refresh=refresh,
+        return_usage=return_usage,
     )
+
+
+async def agenerate_stories_with_titles(
+        amt: int = 1,
+        theme: str = "",
+        tone: str = "neutral",
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+        cache: bool = False,
+        refresh: bool = False,
+        return_usage: bool = False,
+    ) -> list[dict[str, str]] | GenerationResult:
+    """Async convenience wrapper that always returns titled stories."""
+    return await agenerate_stories(
+        amt=amt,
+        theme=theme,
+        tone=tone,
+        title=True,
+        model=model,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+        temperature=temperature,
+        session=session,
+        cache=cache,
+        refresh=refresh,
+        return_usage=return_usage,
+    )
+
+
+def iter_stories(
+        amt: int = 1,
+        theme: str = "",
+        tone: str = "neutral",
+        title: bool = False,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+    ) -> Iterator[str] | Iterator[dict[str, str]]:
+    """
+    Stream stories one by one as the model produces them.
+
+    Uses a single streaming Responses call and yields each story (or
+    {'title': ..., 'story': ...} item) as soon as its JSON array element
+    closes. Time-to-first-story no longer equals total generation time, and
+    the full response is never held in memory. Streams are not sharded or
+    cached.
+
+    Raises:
+        RuntimeError: If the OpenAI API call fails.
+    """
+    session = session or get_default_session()
+
+    responses_parameters = _story_request(
+        session=session,
+        amt=amt,
+        theme=theme,
+        tone=tone,
+        title=title,
+        model=model,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+        temperature=temperature,
+    )
+
+    parser = IncrementalArrayParser("stories_with_titles" if title else "stories")
+    try:
+        for delta in session.stream_text(responses_parameters):
+            yield from _streamed_stories(parser.feed(delta), title)
+
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
+
+
+async def aiter_stories(
+        amt: int = 1,
+        theme: str = "",
+        tone: str = "neutral",
+        title: bool = False,
+        model: str = "gpt-4o-mini",
+        language: str = "es-PR",
+        additional_instructions: str = "",
+        additional_system_instructions: str = "",
+        temperature: float = 0.65,
+        session: Session | None = None,
+    ) -> AsyncIterator[str] | AsyncIterator[dict[str, str]]:
+    """Async counterpart of `iter_stories`; use with `async for`."""
+    session = session or get_default_session()
+
+    responses_parameters = await asyncio.to_thread(
+        _story_request,
+        session=session,
+        amt=amt,
+        theme=theme,
+        tone=tone,
+        title=title,
+        model=model,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+        temperature=temperature,
+    )
+
+    parser = IncrementalArrayParser("stories_with_titles" if title else "stories")
+    try:
+        async for delta in session.astream_text(responses_parameters):
+            for story in _streamed_stories(parser.feed(delta), title):
+                yield story
+
+    except sdk.OpenAIError as e:
+        raise RuntimeError(f"OpenAI API error: {e}") from e
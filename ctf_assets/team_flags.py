@@ -0,0 +1,343 @@
+"""
+Per-team flag derivation for dynamic-flag challenges.
+
+Every team gets its own variant of each challenge flag without another
+model call: the base flag (e.g. from `generate_flags`) is kept and an HMAC
+tag of (challenge, team, base flag) under an event secret is appended to
+its body, inside `flag_format`:
+
+    base   ctf{r0ck3t_l4unch}
+    team   ctf{r0ck3t_l4unch_9c1e04b27fd3a856}
+
+Flags are deterministic, so they can be recomputed at any time from the
+secret instead of being stored, and a flag submitted by the wrong team
+identifies the team it was derived for. Submissions are checked with a
+constant-time comparison.
+
+The secret is read from `CTF_ASSETS_FLAG_SECRET` unless passed explicitly.
+
+Classes:
+    TeamFlag: One (team, challenge, flag) row.
+    FlagDeriver: Derives and verifies per-team flags under one secret.
+
+Functions:
+    derive_team_flag: Derive one team's flag.
+    verify_team_flag: Check a submission in constant time.
+    iter_team_flags: Stream every (team, challenge, flag) row.
+    write_team_flags: Stream all rows to a CSV or JSONL file.
+    load_challenges / load_teams: Read the inputs of the bulk mode from files.
+
+Example:
+    bases = generate_flags(theme="NASA", amt=50)
+    challenges = {f"chall-{i:02}": flag for i, flag in enumerate(bases)}
+    teams = [f"team-{i:04}" for i in range(1000)]
+    write_team_flags("team_flags.csv", challenges, teams)   # 50,000 rows
+
+    deriver = FlagDeriver()
+    deriver.verify(submission, challenges["chall-07"], team="team-0042", challenge="chall-07")
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import hmac
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+from ctf_assets.config import flag_secret
+from ctf_assets.utils.flag_format import MAX_BODY_LENGTH, FlagFormat
+
+# Versioned domain label, so tags can't be confused with other uses of the secret
+_DOMAIN = b"ctf-assets/team-flag/v1"
+
+DEFAULT_TAG_LENGTH = 16
+
+
+@dataclass(frozen=True)
+class TeamFlag:
+    team: str
+    challenge: str
+    flag: str
+
+
+def _secret_bytes(secret: str | bytes | None) -> bytes:
+    if secret is None:
+        return flag_secret()
+    value = secret.encode("utf-8") if isinstance(secret, str) else bytes(secret)
+    if not value:
+        raise ValueError("The flag secret must not be empty")
+    return value
+
+
+class FlagDeriver:
+    """
+    Derive and verify per-team flags with HMAC-SHA256.
+
+    The tag is the first `tag_length` hex characters of
+    HMAC(secret, challenge, team, base flag). 16 characters (64 bits) make
+    guessing another team's flag hopeless while keeping flags short.
+
+    Args:
+        secret (str | bytes | None): Event secret. Defaults to `CTF_ASSETS_FLAG_SECRET`.
+        flag_format (str): Format of the derived flags, e.g. "ctf{..}". Defaults to "ctf{..}".
+        tag_length (int): Hex characters of the tag, 8 to 64. Defaults to 16.
+        separator (str): Text between the base body and the tag. Defaults to "_".
+
+    Raises:
+        RuntimeError: If no secret is given and `CTF_ASSETS_FLAG_SECRET` is missing.
+        ValueError: If the secret is empty or `tag_length` is out of range.
+    """
+
+    def __init__(
+            self,
+            secret: str | bytes | None = None,
+            flag_format: str = "ctf{..}",
+            tag_length: int = DEFAULT_TAG_LENGTH,
+            separator: str = "_",
+    ) -> None:
+        if not 8 <= tag_length <= 64:
+            raise ValueError("tag_length must be between 8 and 64 hex characters")
+        # Keyed once; each tag copies the keyed state instead of rehashing the key
+        self._mac = hmac.new(_secret_bytes(secret), _DOMAIN, hashlib.sha256)
+        self.format = FlagFormat.parse(flag_format)
+        self.tag_length = tag_length
+        self.separator = separator
+
+    def _body(self, base_flag: str) -> str:
+        # The base body is kept: a flag already in flag_format is unwrapped,
+        # any other braced flag loses its own wrapper, anything else is used whole
+        base_flag = base_flag.strip()
+        body = self.format.body(base_flag)
+        if body is not None:
+            return body
+        open_brace, close_brace = base_flag.find("{"), base_flag.rfind("}")
+        if open_brace != -1 and close_brace > open_brace:
+            return base_flag[open_brace + 1:close_brace]
+        return base_flag
+
+    def tag(self, base_flag: str, team: str, challenge: str = "") -> str:
+        """Hex HMAC tag of (challenge, team, base flag)."""
+        mac = self._mac.copy()
+        # JSON keeps the fields unambiguous whatever characters they contain
+        mac.update(json.dumps([challenge, team, base_flag.strip()], ensure_ascii=False).encode("utf-8"))
+        return mac.hexdigest()[:self.tag_length]
+
+    def derive(self, base_flag: str, team: str, challenge: str = "") -> str:
+        """
+        Return `team`'s variant of `base_flag`.
+
+        Args:
+            base_flag (str): The challenge's base flag.
+            team (str): Team identifier, e.g. its id on the scoreboard.
+            challenge (str): Challenge identifier. Defaults to "". Use it
+                when two challenges could share a base flag.
+
+        Returns:
+            str: The derived flag, in `flag_format`.
+
+        Raises:
+            ValueError: If the derived flag doesn't match `flag_format`, e.g.
+                the base body is empty, has spaces or other characters a
+                flag can't hold, or is too long to take the tag.
+        """
+        base_body = self._body(base_flag)
+        body = f"{base_body}{self.separator}{self.tag(base_flag, team, challenge)}"
+        flag = self.format.wrap(body)
+        if not base_body or not self.format.matches(flag):
+            if len(body) > MAX_BODY_LENGTH:
+                limit = MAX_BODY_LENGTH - len(body) + len(base_body)
+                raise ValueError(
+                    f"Base flag {base_flag!r} is too long to derive team flags from "
+                    f"(body of at most {limit} characters with this tag length)"
+                )
+            raise ValueError(f"Can't derive a team flag in {self.format} from base flag {base_flag!r}")
+        return flag
+
+    def verify(self, submission: str, base_flag: str, team: str, challenge: str = "") -> bool:
+        """
+        Check `submission` against `team`'s flag in constant time.
+
+        Surrounding whitespace is ignored; everything else must match exactly.
+        """
+        expected = self.derive(base_flag, team, challenge).encode("utf-8")
+        return hmac.compare_digest(submission.strip().encode("utf-8"), expected)
+
+    def identify(self, submission: str, base_flag: str, teams: Iterable[str], challenge: str = "") -> str | None:
+        """
+        Return the team `submission` was derived for, or None.
+
+        Useful to spot flag sharing: a valid flag of another team submitted
+        by this one.
+        """
+        match = None
+        for team in teams:
+            # Keep scanning after a match so timing doesn't reveal its position
+            if self.verify(submission, base_flag, team, challenge) and match is None:
+                match = team
+        return match
+
+    def iter_rows(self, challenges: Mapping[str, str], teams: Iterable[str]) -> Iterator[TeamFlag]:
+        """Yield a `TeamFlag` for every team and challenge, team by team."""
+        for team in teams:
+            for challenge, base_flag in challenges.items():
+                yield TeamFlag(team=team, challenge=challenge, flag=self.derive(base_flag, team, challenge))
+
+
+def derive_team_flag(
+        base_flag: str,
+        team: str,
+        challenge: str = "",
+        secret: str | bytes | None = None,
+        flag_format: str = "ctf{..}",
+        tag_length: int = DEFAULT_TAG_LENGTH,
+) -> str:
+    """Derive one team's flag; see `FlagDeriver.derive`."""
+    return FlagDeriver(secret, flag_format=flag_format, tag_length=tag_length).derive(base_flag, team, challenge)
+
+
+def verify_team_flag(
+        submission: str,
+        base_flag: str,
+        team: str,
+        challenge: str = "",
+        secret: str | bytes | None = None,
+        flag_format: str = "ctf{..}",
+        tag_length: int = DEFAULT_TAG_LENGTH,
+) -> bool:
+    """Check a submission in constant time; see `FlagDeriver.verify`."""
+    deriver = FlagDeriver(secret, flag_format=flag_format, tag_length=tag_length)
+    return deriver.verify(submission, base_flag, team, challenge)
+
+
+def iter_team_flags(
+        challenges: Mapping[str, str],
+        teams: Iterable[str],
+        secret: str | bytes | None = None,
+        flag_format: str = "ctf{..}",
+        tag_length: int = DEFAULT_TAG_LENGTH,
+) -> Iterator[TeamFlag]:
+    """
+    Stream the flag of every team for every challenge.
+
+    Args:
+        challenges (Mapping[str, str]): Challenge id -> base flag.
+        teams (Iterable[str]): Team ids; may be a generator.
+        secret, flag_format, tag_length: See `FlagDeriver`.
+
+    Yields:
+        TeamFlag: One row per (team, challenge).
+    """
+    deriver = FlagDeriver(secret, flag_format=flag_format, tag_length=tag_length)
+    yield from deriver.iter_rows(challenges, teams)
+
+
+def write_team_flags(
+        path: str | Path,
+        challenges: Mapping[str, str],
+        teams: Iterable[str],
+        secret: str | bytes | None = None,
+        flag_format: str = "ctf{..}",
+        tag_length: int = DEFAULT_TAG_LENGTH,
+        file_format: str | None = None,
+) -> int:
+    """
+    Write every (team, challenge, flag) row to a CSV or JSONL file.
+
+    Rows are streamed, so memory stays flat however many teams there are.
+
+    Args:
+        path (str | Path): Output file; parent directories are created.
+        challenges (Mapping[str, str]): Challenge id -> base flag.
+        teams (Iterable[str]): Team ids.
+        secret, flag_format, tag_length: See `FlagDeriver`.
+        file_format (str | None): "csv" or "jsonl". Defaults to the file
+            extension, CSV unless it is .jsonl / .ndjson.
+
+    Returns:
+        int: Number of rows written.
+    """
+    path = Path(path).expanduser()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if file_format is None:
+        file_format = "jsonl" if path.suffix.lower() in {".jsonl", ".ndjson"} else "csv"
+    if file_format not in {"csv", "jsonl"}:
+        raise ValueError(f"Unknown file_format {file_format!r}; use csv or jsonl")
+
+    rows = iter_team_flags(challenges, teams, secret=secret, flag_format=flag_format, tag_length=tag_length)
+    count = 0
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        if file_format == "csv":
+            writer = csv.writer(fh)
+            writer.writerow(["team", "challenge", "flag"])
+            for row in rows:
+                writer.writerow((row.team, row.challenge, row.flag))
+                count += 1
+        else:
+            for row in rows:
+                fh.write(json.dumps(asdict(row), ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def load_challenges(path: str | Path) -> dict[str, str]:
+    """
+    Read challenge ids and base flags.
+
+    Accepts a JSON object {challenge: flag}, a JSON list or JSONL lines of
+    {"challenge": ..., "flag": ...}, or a CSV file with challenge and flag columns.
+
+    Raises:
+        ValueError: If the file has no usable rows.
+    """
+    path = Path(path).expanduser()
+    text = path.read_text(encoding="utf-8")
+    suffix = path.suffix.lower()
+
+    if suffix == ".csv":
+        records = list(csv.DictReader(text.splitlines()))
+    elif suffix == ".json":
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return {str(challenge): str(flag) for challenge, flag in data.items()}
+        records = data
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+    challenges = {}
+    for record in records:
+        if not isinstance(record, dict) or not record.get("challenge") or not record.get("flag"):
+            raise ValueError(f"Expected challenge and flag in every row of {path}, got {record!r}")
+        challenges[str(record["challenge"])] = str(record["flag"])
+    if not challenges:
+        raise ValueError(f"No challenges in {path}")
+    return challenges
+
+
+def load_teams(path: str | Path) -> list[str]:
+    """
+    Read team ids: one per line, a JSON list, or the `team` (else first) column of a CSV file.
+
+    Raises:
+        ValueError: If the file lists no teams.
+    """
+    path = Path(path).expanduser()
+    text = path.read_text(encoding="utf-8")
+    suffix = path.suffix.lower()
+
+    if suffix == ".json":
+        teams = [str(team) for team in json.loads(text)]
+    elif suffix == ".csv":
+        rows = list(csv.reader(text.splitlines()))
+        column = rows[0].index("team") if rows and "team" in rows[0] else 0
+        body = rows[1:] if rows and "team" in rows[0] else rows
+        teams = [row[column] for row in body if len(row) > column]
+    else:
+        teams = [line.strip() for line in text.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+
+    teams = [team for team in dict.fromkeys(team.strip() for team in teams) if team]
+    if not teams:
+        raise ValueError(f"No teams in {path}")
+    return teams
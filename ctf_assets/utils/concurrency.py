@@ -0,0 +1,45 @@
+"""
+Concurrency helpers for the asyncio API.
+
+Functions:
+    - gather_bounded: Await many coroutines with at most `limit` in flight.
+
+Example:
+    flags, stories = await gather_bounded(
+        [agenerate_flags(theme="Space"), agenerate_stories(theme="Space")],
+        limit=4,
+    )
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Iterable
+
+
+async def gather_bounded(
+        aws: Iterable[Awaitable[Any]],
+        limit: int = 8,
+        return_exceptions: bool = False,
+) -> list[Any]:
+    """
+    Run awaitables concurrently with at most `limit` of them in flight.
+
+    Results are returned in the same order as `aws`, like `asyncio.gather`.
+
+    Args:
+        aws (Iterable[Awaitable]): Coroutines or futures to await.
+        limit (int): Maximum number of awaitables running at once. Defaults to 8.
+        return_exceptions (bool): If True, exceptions are returned in the result
+            list instead of being raised. Defaults to False.
+
+    Returns:
+        list: The results of the awaitables, in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, int(limit)))
+
+    async def _run(aw: Awaitable[Any]) -> Any:
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(_run(aw) for aw in aws), return_exceptions=return_exceptions)
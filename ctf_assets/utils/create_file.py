@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import base64
+import binascii
 from pathlib import Path
 import re
 
@@ -19,3 +21,26 @@ def create_file(file_path: str | Path, content: str, *, encoding: str = "utf-8")
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(content, encoding=encoding)
     return path
+
+
+def write_base64_file(file_path: str | Path, data: str, *, chunk_size: int = 1 << 20) -> Path:
+    """Decode base64 `data` in chunks straight into a file. Returns the Path.
+
+    Only one decoded chunk (about `chunk_size` bytes) is held in memory at a
+    time instead of the whole decoded file.
+    """
+    # Chunked decoding needs 4-character alignment, which any line break or
+    # space shifts even when the total length happens to be a multiple of 4
+    data = "".join(data.split())
+    step = max(4, chunk_size - chunk_size % 4)
+
+    path = Path(file_path).expanduser().resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(path, "wb") as fh:
+            for start in range(0, len(data), step):
+                fh.write(base64.b64decode(data[start:start + step], validate=False))
+    except binascii.Error:
+        path.unlink(missing_ok=True)
+        raise
+    return path
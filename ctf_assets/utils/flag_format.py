@@ -0,0 +1,168 @@
+"""
+Parsing of `flag_format` templates.
+
+Generators take the flag format as a template such as "ctf{..}", where a
+run of dots (or an ellipsis) marks the variable body. `FlagFormat` splits
+such a template into the fixed text before and after the body, so flags
+built locally carry exactly the wrapper the model is asked to use.
+
+Templates without dots are read as:
+    "FLAG{}"  or "FLAG{anything}"   prefix "FLAG{", suffix "}"
+    "FLAG"                          prefix "FLAG{", suffix "}"
+    ""                              bare body
+
+Each format compiles once into a matcher for model output: the exact
+prefix and suffix around a body of letters, digits and `_-!?@$.+`.
+`repair` fixes the cheap defects (stray quotes or spaces, wrong prefix
+case, a missing or foreign wrapper, spaces inside a wrapped body) and gives
+up on the rest, so callers only re-request what is left. It never deletes
+body characters and never wraps prose, so a refusal such as "Sorry, I
+cannot help with that" is rejected rather than turned into a flag.
+
+Classes:
+    FlagFormat: Prefix and suffix of a flag template.
+
+Example:
+    fmt = FlagFormat.parse("ctf{..}")
+    fmt.wrap("r0ck3t_launch")   # "ctf{r0ck3t_launch}"
+    fmt.body("ctf{r0ck3t}")     # "r0ck3t"
+    fmt.repair("CTF{r0ck3t launch")   # "ctf{r0ck3t_launch}"
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+from dataclasses import dataclass
+
+# Two or more dots, or the ellipsis character, mark the body
+_PLACEHOLDER = re.compile(r"\.{2,}|…")
+
+# Body characters accepted in generated flags: word characters (accented
+# letters included, for non-English flags) and the usual leetspeak symbols
+BODY_CHARS = r"\w\-!?@$.+"
+MAX_BODY_LENGTH = 200
+
+_BODY = re.compile(rf"[{BODY_CHARS}]+")
+_WHITESPACE = re.compile(r"\s+")
+# A bare body holding any of these is a sentence, not a flag missing its wrapper
+_PROSE = re.compile(r"[\s.,;:!?]")
+# Quotes, backticks and list punctuation models put around a flag
+_WRAPPING = " \t\r\n\"'`,;"
+# What models put between the format's word and the body when the bracket is lost
+_STEM_SEPARATORS = (" ", ":", "-", "(", "[", "<")
+_CLOSERS = {"(": ")", "[": "]", "<": ">"}
+
+
+@dataclass(frozen=True)
+class FlagFormat:
+    """
+    Fixed text around the body of a flag.
+
+    Attributes:
+        template (str): The template it was parsed from.
+        prefix (str): Text before the body, e.g. "ctf{".
+        suffix (str): Text after the body, e.g. "}".
+    """
+
+    template: str
+    prefix: str
+    suffix: str
+
+    @classmethod
+    @functools.lru_cache(maxsize=64)
+    def parse(cls, flag_format: str) -> FlagFormat:
+        """Split `flag_format` into prefix and suffix around its body."""
+        flag_format = flag_format.strip()
+        placeholder = _PLACEHOLDER.search(flag_format)
+        if placeholder:
+            return cls(flag_format, flag_format[:placeholder.start()], flag_format[placeholder.end():])
+
+        open_brace = flag_format.find("{")
+        close_brace = flag_format.rfind("}")
+        if open_brace != -1 and close_brace > open_brace:
+            return cls(flag_format, flag_format[:open_brace + 1], flag_format[close_brace:])
+        if flag_format:
+            return cls(flag_format, f"{flag_format}{{", "}")
+        return cls(flag_format, "", "")
+
+    def wrap(self, body: str) -> str:
+        """Return `body` inside the prefix and suffix."""
+        return f"{self.prefix}{body}{self.suffix}"
+
+    def body(self, flag: str) -> str | None:
+        """The text between prefix and suffix, or None if `flag` isn't wrapped in them."""
+        if len(flag) < len(self.prefix) + len(self.suffix):
+            return None
+        if not (flag.startswith(self.prefix) and flag.endswith(self.suffix)):
+            return None
+        return flag[len(self.prefix):len(flag) - len(self.suffix)]
+
+    @functools.cached_property
+    def matcher(self) -> re.Pattern:
+        """Compiled pattern of a well-formed flag: prefix, allowed body, suffix."""
+        return re.compile(
+            rf"{re.escape(self.prefix)}[{BODY_CHARS}]{{1,{MAX_BODY_LENGTH}}}{re.escape(self.suffix)}"
+        )
+
+    def matches(self, flag: str) -> bool:
+        """True if `flag` is exactly in this format."""
+        return self.matcher.fullmatch(flag) is not None
+
+    def repair(self, flag: str) -> str | None:
+        """
+        Return `flag` in this format, fixing trivial defects, or None.
+
+        Fixed locally: surrounding whitespace, quotes and backticks, the
+        prefix in the wrong case, a missing bracket or suffix, another wrapper
+        such as "flag{..}" for "ctf{..}" and whitespace inside a wrapped body
+        (turned into "_"). A body with no wrapper at all is only wrapped if
+        it is a single token without sentence punctuation. Anything else is
+        rejected, e.g. characters outside the allowed set, which are never
+        dropped, or an empty or overlong body.
+
+        Args:
+            flag (str): A flag as returned by the model.
+
+        Returns:
+            str | None: The well-formed flag, or None if it can't be fixed cheaply.
+        """
+        flag = flag.strip(_WRAPPING)
+        if self.matches(flag):
+            return flag
+
+        body = flag
+        wrapped = True
+        stem = self.prefix[:-1].lower()
+        # Wrapper in the wrong case ("CTF{..}" for "ctf{..}"), or only half of it
+        if self.prefix and body.lower().startswith(self.prefix.lower()):
+            body = body[len(self.prefix):]
+        elif stem and body.lower().startswith(stem) and body[len(stem):len(stem) + 1] in _STEM_SEPARATORS:
+            # Opening bracket lost or replaced ("ctf x}", "ctf:x", "ctf(x)"); without
+            # the closing suffix too, "ctf: ..." may just as well start a sentence
+            opener = body[len(stem)]
+            body = body[len(stem) + 1:]
+            closer = _CLOSERS.get(opener)
+            if closer and body.endswith(closer):
+                body = body[:-1] + self.suffix
+            wrapped = bool(self.suffix) and body.lower().endswith(self.suffix.lower())
+        elif "{" in body:
+            # Another wrapper ("flag{..}"): keep what is inside its braces
+            body = body[body.find("{") + 1:]
+        else:
+            wrapped = False
+        if self.suffix and body.lower().endswith(self.suffix.lower()):
+            body = body[:len(body) - len(self.suffix)]
+
+        if wrapped:
+            # Spaces inside an explicit wrapper become separators
+            body = _WHITESPACE.sub("_", body.strip())
+        elif _PROSE.search(body):
+            return None
+        if not _BODY.fullmatch(body):
+            return None
+        repaired = self.wrap(body)
+        return repaired if self.matches(repaired) else None
+
+    def __str__(self) -> str:
+        return self.wrap("..")
@@ -0,0 +1,289 @@
+"""
+Persistent cross-run flag uniqueness index.
+
+Records every flag ever issued so no flag repeats across challenges, seasons
+or previous runs. Flags are stored by a 16-byte BLAKE2b digest as the primary
+key of a SQLite table, so the index stays compact and lookups stay fast with
+millions of entries. An optional in-memory Bloom filter answers most
+"never seen" queries without touching the database.
+
+Classes:
+    BloomFilter: Fixed-size Bloom filter over flag digests.
+    FlagIndex: SQLite-backed set of issued flags with an optional Bloom front.
+
+Functions:
+    resolve_flag_index: Turn a path / bool / FlagIndex argument into an open index.
+
+Example:
+    index = FlagIndex("event-flags.sqlite3")
+    fresh = index.claim(["ctf{a}", "ctf{b}"])   # flags not issued before, now reserved
+    "ctf{a}" in index                           # True
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import math
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Iterable
+
+from ctf_assets.config import cache_dir
+
+DEFAULT_INDEX_FILENAME = "flags.sqlite3"
+
+_BLOOM_HEADER = struct.Struct("<4sQQQ")  # magic, bits, hashes, items
+_BLOOM_MAGIC = b"CTFB"
+
+# Indexes opened from a path, shared by every call in the process
+_open_indexes: dict[Path, "FlagIndex"] = {}
+_open_indexes_lock = threading.Lock()
+
+
+def flag_digest(flag: str) -> bytes:
+    """Return the 16-byte digest used as the index key for `flag`."""
+    return hashlib.blake2b(flag.encode("utf-8"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Bloom filter over 16-byte digests.
+
+    Bit positions come from double hashing the two 64-bit halves of the
+    digest, so no extra hashing is done per lookup.
+
+    Args:
+        capacity (int): Expected number of items.
+        error_rate (float): Target false-positive rate at `capacity`.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001) -> None:
+        capacity = max(1, int(capacity))
+        bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.bits = max(64, bits)
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.items = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, digest: bytes) -> Iterable[int]:
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, digest: bytes) -> None:
+        for pos in self._positions(digest):
+            self._array[pos >> 3] |= 1 << (pos & 7)
+        self.items += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+    def save(self, path: str | Path) -> None:
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(_BLOOM_HEADER.pack(_BLOOM_MAGIC, self.bits, self.hashes, self.items))
+            fh.write(self._array)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> BloomFilter | None:
+        """Read a filter written by `save`, or return None if missing or corrupt."""
+        try:
+            with open(path, "rb") as fh:
+                magic, bits, hashes, items = _BLOOM_HEADER.unpack(fh.read(_BLOOM_HEADER.size))
+                array = bytearray(fh.read())
+        except (OSError, struct.error):
+            return None
+        if magic != _BLOOM_MAGIC or len(array) != (bits + 7) // 8:
+            return None
+
+        bloom = cls.__new__(cls)
+        bloom.bits, bloom.hashes, bloom.items, bloom._array = bits, hashes, items, array
+        return bloom
+
+
+class FlagIndex:
+    """
+    Persistent set of issued flags.
+
+    The SQLite table is always authoritative: `claim` inserts with
+    `INSERT OR IGNORE`, so two processes can never both claim the same flag.
+    The Bloom filter only short-cuts `__contains__` / `filter_new` for flags
+    that were never seen; it is saved next to the database on `close` and
+    rebuilt from the table when missing or out of date. It only knows the
+    rows present when it was loaded plus this instance's own claims, so once
+    another connection (another process, or another instance on the same
+    file) has written to the table, its negatives are confirmed in SQLite.
+
+    Args:
+        path (str | Path | None): SQLite database file. Defaults to
+            `flags.sqlite3` in the ctf-assets cache directory.
+        bloom (bool): Keep a Bloom filter in front of the table. Defaults to True.
+        expected_items (int): Bloom filter capacity. Defaults to 1,000,000.
+        error_rate (float): Bloom filter false-positive rate. Defaults to 0.001.
+    """
+
+    def __init__(
+            self,
+            path: str | Path | None = None,
+            bloom: bool = True,
+            expected_items: int = 1_000_000,
+            error_rate: float = 0.001,
+    ) -> None:
+        self.path = Path(path).expanduser() if path else cache_dir() / DEFAULT_INDEX_FILENAME
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS flags ("
+            " digest BLOB PRIMARY KEY,"
+            " flag TEXT NOT NULL,"
+            " issued_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+        self._bloom: BloomFilter | None = None
+        # Taken before the filter is filled: a write racing the load makes it look stale
+        self._bloom_version = self._data_version()
+        if bloom:
+            self._bloom = self._load_bloom(expected_items, error_rate)
+
+    @property
+    def _bloom_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".bloom")
+
+    def _load_bloom(self, expected_items: int, error_rate: float) -> BloomFilter:
+        count = len(self)
+        bloom = BloomFilter.load(self._bloom_path)
+        if bloom is not None and bloom.items == count:
+            return bloom
+
+        # Missing or stale: rebuild from the stored digests
+        bloom = BloomFilter(capacity=max(expected_items, count * 2), error_rate=error_rate)
+        for (digest,) in self._conn.execute("SELECT digest FROM flags"):
+            bloom.add(digest)
+        return bloom
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            raise ValueError("index is closed")
+        return self._conn
+
+    def _data_version(self) -> int:
+        # Changes whenever another connection commits to the database
+        (version,) = self._db().execute("PRAGMA data_version").fetchone()
+        return version
+
+    def _bloom_negatives_hold(self) -> bool:
+        """True if a Bloom negative still means "never issued"."""
+        return self._bloom is not None and self._data_version() == self._bloom_version
+
+    def __len__(self) -> int:
+        (count,) = self._db().execute("SELECT COUNT(*) FROM flags").fetchone()
+        return count
+
+    def _known(self, digest: bytes, trust_bloom: bool) -> bool:
+        if trust_bloom and digest not in self._bloom:
+            return False
+        row = self._db().execute("SELECT 1 FROM flags WHERE digest = ?", (digest,)).fetchone()
+        return row is not None
+
+    def __contains__(self, flag: str) -> bool:
+        with self._lock:
+            return self._known(flag_digest(flag), self._bloom_negatives_hold())
+
+    def filter_new(self, flags: Iterable[str]) -> list[str]:
+        """Return the flags that have not been issued, without reserving them."""
+        with self._lock:
+            trust_bloom = self._bloom_negatives_hold()
+            return [flag for flag in flags if not self._known(flag_digest(flag), trust_bloom)]
+
+    def claim(self, flags: Iterable[str]) -> list[str]:
+        """
+        Reserve flags that were never issued before.
+
+        Args:
+            flags (Iterable[str]): Candidate flags.
+
+        Returns:
+            list[str]: The candidates that were new, in input order. They are
+                recorded in the index; the rest were collisions.
+
+        Raises:
+            ValueError: If the index is closed.
+        """
+        now = time.time()
+        claimed: list[str] = []
+        with self._lock:
+            conn = self._db()
+            with conn:
+                for flag in flags:
+                    digest = flag_digest(flag)
+                    cursor = conn.execute(
+                        "INSERT OR IGNORE INTO flags (digest, flag, issued_at) VALUES (?, ?, ?)",
+                        (digest, flag, now),
+                    )
+                    if cursor.rowcount:
+                        claimed.append(flag)
+                        if self._bloom is not None:
+                            self._bloom.add(digest)
+        return claimed
+
+    def close(self) -> None:
+        """Persist the Bloom filter and close the database."""
+        with self._lock:
+            if self._conn is None:
+                return
+            # A filter missing other connections' rows would only be rebuilt on load
+            if self._bloom_negatives_hold():
+                try:
+                    self._bloom.save(self._bloom_path)
+                except OSError:
+                    pass
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> FlagIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def resolve_flag_index(index: FlagIndex | str | Path | bool | None) -> FlagIndex | None:
+    """
+    Turn a `unique_index` argument into an open index.
+
+    `None`/`False` disable the index, `True` uses the default database in the
+    cache directory, and a path opens (once per process) the database there.
+    """
+    if index is None or index is False:
+        return None
+    if isinstance(index, FlagIndex):
+        return index
+
+    path = (cache_dir() / DEFAULT_INDEX_FILENAME) if index is True else Path(index).expanduser()
+    path = path.resolve()
+    with _open_indexes_lock:
+        if path not in _open_indexes:
+            _open_indexes[path] = FlagIndex(path)
+        return _open_indexes[path]
+
+
+@atexit.register
+def _close_open_indexes() -> None:
+    # Persist Bloom filters of indexes opened by path
+    with _open_indexes_lock:
+        for index in _open_indexes.values():
+            index.close()
+        _open_indexes.clear()
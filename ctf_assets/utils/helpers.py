@@ -3,7 +3,7 @@ Helper functions for environment management and model validation.
 
 This module provides:
 - Loading of environment variables and retrieval of API keys 
-- Model availability.
+- Model availability, backed by the on-disk catalogue in `model_catalog`.
 
 Functions:
 ----------
@@ -11,15 +11,35 @@ Functions:
 - `validate_openai_model(model: str) -> str:`
 """
 
-# import os
+from __future__ import annotations
+
+import os
 # import warnings
-from openai import OpenAI
+from typing import TYPE_CHECKING
+
 from ctf_assets.config import fetch_openai_key
+from ctf_assets.utils import sdk
+from ctf_assets.utils.model_catalog import (
+    is_image_model,
+    is_reasoning_model,
+    load_catalog,
+    normalize_base_url,
+    save_catalog,
+)
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+# Cache OpenAI currently supported models and reasoning models, per API root
+supported_openai_models: dict[str, frozenset[str]] = {}
+reasoning_openai_models: dict[str, frozenset[str]] = {}
+image_models: dict[str, frozenset[str]] = {}
 
-# Cache OpenAI currently supported models and reasoning models, initially set to None
-supported_openai_models = None
-reasoning_openai_models = None
-image_models = None
+
+def _client_base_url(client: OpenAI | None) -> str:
+    """API root `client` talks to; without a client, the one a new client would use."""
+    base_url = getattr(client, "base_url", None) if client is not None else os.getenv("OPENAI_BASE_URL")
+    return normalize_base_url(str(base_url) if base_url else None)
 
 # # Load environment
 # load_dotenv()
@@ -66,77 +86,93 @@ image_models = None
 
 #     return key
 
-def get_supported_openai_models():
+def get_supported_openai_models(client: OpenAI | None = None, refresh: bool = False) -> frozenset[str]:
     """
-    Retrieve and cache the list of all supported OpenAI models.
+    Retrieve and cache the set of all supported OpenAI models.
+
+    Lookups go through three tiers: the in-process cache, the on-disk
+    catalogue (fresh for `CTF_ASSETS_MODEL_CACHE_TTL` seconds, one day by
+    default) and finally the OpenAI list-models endpoint, whose result is
+    written back to disk. A warm disk cache therefore resolves with zero
+    network calls, even in a brand new process. Both caches are kept per
+    API root (the client's `base_url`).
 
-    This function retrieves the list of currently supported OpenAI models from 
-    the OpenAI API and caches them for future use. If the list of supported 
-    models has already been cached, the function will return the cached list 
-    without making another API call.
+    Args:
+        client (OpenAI | None): Client used for the list-models call. A
+            `Session` passes its pooled client here. Defaults to a new client.
+        refresh (bool): Skip both caches and query the API. Defaults to False.
 
     Returns:
-        list: A list of supported OpenAI model IDs.
+        frozenset[str]: The supported OpenAI model IDs.
 
     Example:
         >>> get_supported_openai_models()
-        ["gpt-3.5-turbo", "gpt-4", "text-davinci-003"]
+        frozenset({"gpt-3.5-turbo", "gpt-4", "text-davinci-003"})
     """
-    global supported_openai_models
+    base_url = _client_base_url(client)
 
-    if supported_openai_models is None:
-        # Initialize an OpenAI API client
-        client = OpenAI(api_key=fetch_openai_key(strict=True))
+    if refresh:
+        for cache in (supported_openai_models, reasoning_openai_models, image_models):
+            cache.pop(base_url, None)
 
-        # Retrieve list of currently supported OpenAI API models
-        supported_openai_models = [model.id for model in client.models.list()]
+    models = supported_openai_models.get(base_url)
+    if models is None and not refresh:
+        models = load_catalog(base_url=base_url)
 
-    return supported_openai_models
+    if models is None:
+        if client is None:
+            # Initialize an OpenAI API client
+            client = sdk.OpenAI(api_key=fetch_openai_key(strict=True))
 
-def get_reasoning_openai_models():
+        # Retrieve currently supported OpenAI API models
+        models = frozenset(model.id for model in client.models.list())
+        save_catalog(models, base_url=base_url)
+
+    supported_openai_models[base_url] = models
+    return models
+
+def get_reasoning_openai_models(client: OpenAI | None = None) -> frozenset[str]:
     """
-    Retrieve and cache the list of OpenAI reasoning models.
+    Retrieve and cache the set of OpenAI reasoning models.
 
-    This function retrieves the list of all supported OpenAI models using 
+    This function retrieves all supported OpenAI models using 
     the `get_supported_openai_models()` function and filters them to include 
-    only the reasoning models, which are defined as models whose IDs start 
-    with the character "o". The reasoning models are then cached for future use.
+    only the reasoning models, as listed in the bundled capability table of
+    `model_catalog`. The reasoning models are then cached for future use.
 
     If the reasoning models have already been cached, the function will return 
-    the cached list without making an API call.
+    the cached set without making an API call.
 
     Returns:
-        list: A list of supported OpenAI reasoning model IDs.
+        frozenset[str]: The supported OpenAI reasoning model IDs.
 
     Example:
         >>> get_reasoning_openai_models()
-        ["o-model1", "o-model2", "o-model3"]
+        frozenset({"o-model1", "o-model2", "o-model3"})
     """
-    global reasoning_openai_models
-
-    if reasoning_openai_models is None:
-        # Initialize an OpenAI API client
-        client = OpenAI(api_key=fetch_openai_key(strict=True))
+    base_url = _client_base_url(client)
 
-        # Retrieve list of currently supported OpenAI models
-        supported_openai_models = get_supported_openai_models()
+    if base_url not in reasoning_openai_models:
+        # Retrieve currently supported OpenAI models
+        models = get_supported_openai_models(client)
 
-        # Filter the models to include reasoning models (those that start with "o")
-        reasoning_openai_models = [model for model in supported_openai_models if model.startswith("o")]
+        # Filter the models to include reasoning models
+        reasoning_openai_models[base_url] = frozenset(model for model in models if is_reasoning_model(model))
 
-    return reasoning_openai_models
+    return reasoning_openai_models[base_url]
  
-def validate_openai_model(model: str) -> str:
+def validate_openai_model(model: str, client: OpenAI | None = None) -> str:
     """
     Check if the provided OpenAI model is currently supported.
 
-    This function checks if the given model name is present in the list of 
+    This function checks if the given model name is present in the set of 
     supported OpenAI models. If the model is supported, it returns the 
     model name. If the model is not supported, it returns a default model 
     name, "gpt-4o-mini".
 
     Args:
-        mode (str): The name of the OpenAI model to validate.
+        model (str): The name of the OpenAI model to validate.
+        client (OpenAI | None): Client used if the model list is not cached yet.
 
     Returns:
         str: The provided model name if it is supported, otherwise 
@@ -149,40 +185,30 @@ def validate_openai_model(model: str) -> str:
     validate_openai_model("invalid-model")
     "gpt-4o-mini"
     """
-    global supported_openai_models
-    
-    if supported_openai_models is None:
-        # Retrieve list of currently supported OpenAI API models
-        supported_openai_models = get_supported_openai_models()
-
-    return model if model in supported_openai_models else "gpt-4o-mini"
+    return model if model in get_supported_openai_models(client) else "gpt-4o-mini"
 
-def get_image_models():
+def get_image_models(client: OpenAI | None = None) -> frozenset[str]:
     """
-    Retrieve and cache the list of OpenAI image models.
-    This function retrieves the list of all supported OpenAI models using
+    Retrieve and cache the set of OpenAI image models.
+    This function retrieves all supported OpenAI models using
     the `get_supported_openai_models()` function and filters them to include
-    only the image models, which are defined as models whose IDs start with the characters "dall".
+    only the image models listed in the bundled capability table of `model_catalog`.
     The image models are then cached for future use.
     If the image models have already been cached, the function will return
-    the cached list without making an API call.
+    the cached set without making an API call.
     Returns:
-        list: A list of supported OpenAI image model IDs.
+        frozenset[str]: The supported OpenAI image model IDs.
     Example:
         >>> get_image_models()
-        ["dall-e-2", "dall-e-3"]
+        frozenset({"dall-e-2", "dall-e-3"})
     """
-    global supported_openai_models
-    global image_models
+    base_url = _client_base_url(client)
 
-    if image_models is None:
-        # Initialize an OpenAI API client
-        client = OpenAI(api_key=fetch_openai_key(strict=True))
+    if base_url not in image_models:
+        # Retrieve currently supported OpenAI models
+        models = get_supported_openai_models(client)
 
-        # Retrieve list of currently supported OpenAI models
-        supported_openai_models = get_supported_openai_models()
+        # Filter the models to include image models
+        image_models[base_url] = frozenset(model for model in models if is_image_model(model))
 
-        # Filter the models to include image models (those that start with "dall")
-        image_models = [model for model in supported_openai_models if model.startswith("dall")]
-    
-    return image_models
\ No newline at end of file
+    return image_models[base_url]
@@ -0,0 +1,252 @@
+"""
+Post-processing of generated images on a process pool.
+
+The PNGs written by `generate_images` are 1-3 MB each. This stage re-encodes
+them into what a CTF platform actually serves: resized variants, a
+thumbnail, and WebP / AVIF / JPEG files at a configurable quality. Decoding,
+resampling and encoding are CPU-bound, so files are spread over a
+`ProcessPoolExecutor`; workers receive paths, not pixels, and each source
+image is decoded once for all its variants.
+
+Requires Pillow (`pip install 'ctf-assets[images]'`). AVIF needs a Pillow
+build with AVIF support (Pillow >= 11.3 wheels) or the `pillow-avif-plugin`.
+
+Variants are written next to the original:
+    2025-01-01_..._NASA_0.png           original (kept)
+    2025-01-01_..._NASA_0.webp          full size, per format
+    2025-01-01_..._NASA_0_512.webp      longest edge 512, per size
+    2025-01-01_..._NASA_0_thumb.webp    thumbnail
+
+Classes:
+    ImagePostProcess: What to produce from each image.
+
+Functions:
+    postprocess_image: Write the variants of one image (runs in a worker).
+    postprocess_images: Write the variants of many images on a process pool.
+
+Example:
+    options = ImagePostProcess(sizes=(1024, 512), thumbnail=256, formats=("webp",), quality=80)
+    variants, errors = postprocess_images(["event/images/a.png"], options)
+    variants["event/images/a.png"]   # [".../a.webp", ".../a_1024.webp", ".../a_512.webp", ".../a_thumb.webp"]
+"""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+# Output format -> (file extension, Pillow format name)
+FORMATS = {
+    "webp": ("webp", "WEBP"),
+    "avif": ("avif", "AVIF"),
+    "jpeg": ("jpg", "JPEG"),
+    "png": ("png", "PNG"),
+}
+
+THUMBNAIL_SUFFIX = "thumb"
+
+
+def _pillow() -> Any:
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError("Image post-processing requires Pillow: pip install 'ctf-assets[images]'") from e
+    return Image
+
+
+def _check_avif() -> None:
+    from PIL import features
+
+    if features.check("avif"):
+        return
+    try:
+        # Registers the AVIF codec on Pillow builds without native support
+        import pillow_avif  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "AVIF output needs Pillow >= 11.3 with AVIF support or: pip install pillow-avif-plugin"
+        ) from e
+
+
+@dataclass(frozen=True)
+class ImagePostProcess:
+    """
+    Variants to produce from each generated image.
+
+    Attributes:
+        sizes (tuple[int, ...]): Longest edge, in pixels, of each resized
+            variant. Sizes not smaller than the image are skipped. Defaults to ().
+        thumbnail (int | None): Longest edge of the thumbnail, or None for
+            no thumbnail. Defaults to 256.
+        formats (tuple[str, ...]): Output formats: webp, avif, jpeg or png.
+            Every size (and the full-size image) is written in each. Defaults to ("webp",).
+        quality (int): Encoder quality for WebP, AVIF and JPEG, 1 to 100. Defaults to 80.
+        full_size (bool): Also re-encode the image at full size. Defaults to True.
+        max_workers (int | None): Worker processes. Defaults to one per CPU,
+            capped at the number of images.
+    """
+
+    sizes: tuple[int, ...] = ()
+    thumbnail: int | None = 256
+    formats: tuple[str, ...] = ("webp",)
+    quality: int = 80
+    full_size: bool = True
+    max_workers: int | None = None
+
+    def __post_init__(self) -> None:
+        # Accept lists and comma-separated strings, e.g. from a batch manifest
+        formats = self.formats.split(",") if isinstance(self.formats, str) else self.formats
+        formats = tuple(dict.fromkeys(str(f).strip().lower().replace("jpg", "jpeg") for f in formats if str(f).strip()))
+        sizes = (self.sizes,) if isinstance(self.sizes, int) else self.sizes
+        sizes = tuple(sorted({int(s) for s in sizes}, reverse=True))
+
+        unknown = [f for f in formats if f not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown image format(s) {', '.join(unknown)}; use {', '.join(FORMATS)}")
+        if not formats:
+            raise ValueError("At least one output format is required")
+        if any(s < 1 for s in sizes) or (self.thumbnail is not None and self.thumbnail < 1):
+            raise ValueError("Variant sizes must be positive")
+        if not 1 <= self.quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+
+        object.__setattr__(self, "formats", formats)
+        object.__setattr__(self, "sizes", sizes)
+
+    @classmethod
+    def coerce(cls, value: ImagePostProcess | Mapping[str, Any] | bool | None) -> ImagePostProcess | None:
+        """Build options from a dict (manifest jobs) or True (defaults); None and False disable the stage."""
+        if value is None or value is False:
+            return None
+        if value is True:
+            return cls()
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, Mapping):
+            known = {f.name for f in fields(cls)}
+            unknown = set(value) - known
+            if unknown:
+                raise ValueError(f"Unknown post-processing option(s): {', '.join(sorted(unknown))}")
+            return cls(**value)
+        raise TypeError(f"post_process must be ImagePostProcess, a dict, a bool or None, not {type(value).__name__}")
+
+
+def _save(image: Any, path: Path, fmt: str, quality: int) -> str:
+    extension, pillow_format = FORMATS[fmt]
+    target = path.with_suffix(f".{extension}")
+    if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+        # JPEG has no alpha channel
+        image = image.convert("RGB")
+
+    if fmt == "png":
+        image.save(target, pillow_format, optimize=True)
+    elif fmt == "jpeg":
+        image.save(target, pillow_format, quality=quality, optimize=True, progressive=True)
+    elif fmt == "avif":
+        image.save(target, pillow_format, quality=quality, speed=6)
+    else:
+        image.save(target, pillow_format, quality=quality, method=4)
+    return str(target)
+
+
+def postprocess_image(path: str | Path, options: ImagePostProcess) -> list[str]:
+    """
+    Write the variants of one image next to it.
+
+    The image is decoded once. Resized variants are produced largest first,
+    each one downsampled from the previous, which is much cheaper than
+    resampling the full image every time and visually identical.
+
+    Args:
+        path (str | Path): The source image.
+        options (ImagePostProcess): What to produce.
+
+    Returns:
+        list[str]: Paths of the written variants.
+    """
+    Image = _pillow()
+    if "avif" in options.formats:
+        _check_avif()
+    path = Path(path)
+    written = []
+
+    with Image.open(path) as source:
+        source.load()
+        image = source
+        longest = max(image.size)
+
+        if options.full_size:
+            for fmt in options.formats:
+                # The original already is the full-size file of its own format
+                if FORMATS[fmt][0] != path.suffix.lower().lstrip("."):
+                    written.append(_save(image, path, fmt, options.quality))
+
+        steps = [(size, str(size)) for size in options.sizes]
+        if options.thumbnail is not None:
+            steps.append((options.thumbnail, THUMBNAIL_SUFFIX))
+        steps.sort(key=lambda step: step[0], reverse=True)
+
+        for size, label in steps:
+            if size >= longest:
+                continue
+            scale = size / max(image.size)
+            dimensions = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+            image = image.resize(dimensions, Image.Resampling.LANCZOS, reducing_gap=3.0)
+            variant = path.with_name(f"{path.stem}_{label}{path.suffix}")
+            for fmt in options.formats:
+                written.append(_save(image, variant, fmt, options.quality))
+
+    return written
+
+
+def postprocess_images(
+        files: Iterable[str | Path],
+        options: ImagePostProcess,
+) -> tuple[dict[str, list[str]], list[str]]:
+    """
+    Write the variants of many images on a process pool.
+
+    A single image is processed in this process, skipping the pool start-up.
+    A file that fails is reported in the errors and doesn't stop the others.
+
+    Args:
+        files (Iterable[str | Path]): Source images.
+        options (ImagePostProcess): What to produce.
+
+    Returns:
+        tuple[dict[str, list[str]], list[str]]: Variant paths keyed by source
+            path (in input order), and one error message per failed file.
+
+    Raises:
+        RuntimeError: If Pillow, or the AVIF codec when asked for, is missing.
+    """
+    files = [str(f) for f in files]
+    # Fail fast in the parent instead of once per worker
+    _pillow()
+    if "avif" in options.formats:
+        _check_avif()
+
+    variants: dict[str, list[str]] = {}
+    errors: list[str] = []
+    if not files:
+        return variants, errors
+
+    if len(files) == 1:
+        try:
+            variants[files[0]] = postprocess_image(files[0], options)
+        except Exception as e:
+            errors.append(f"post-process {files[0]}: {e}")
+        return variants, errors
+
+    workers = max(1, min(options.max_workers or os.cpu_count() or 1, len(files)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(postprocess_image, f, options) for f in files]
+        for path, future in zip(files, futures):
+            try:
+                variants[path] = future.result()
+            except Exception as e:
+                errors.append(f"post-process {path}: {e}")
+    return variants, errors
@@ -0,0 +1,269 @@
+"""
+Metrics registry for generator and API-call instrumentation.
+
+Every `Session` records into a `MetricsRegistry` (the process-wide one by
+default): per-stage latency of each generator call (prompt build, network,
+parse, file write), per-attempt API latency and outcome, input/output/cached
+tokens, retries and hedges, and item yield (items asked for vs parsed vs
+returned). The registry can be dumped as JSON or Prometheus text format, and
+hooks receive every update to forward it to other telemetry.
+
+Metrics:
+    ctf_assets_stage_seconds{generator, stage}        histogram
+    ctf_assets_api_seconds{endpoint, model}           histogram, one per attempt
+    ctf_assets_api_calls_total{endpoint, model, outcome}
+    ctf_assets_tokens_total{model, kind}              kind: input, output, cached
+    ctf_assets_retries_total{model}
+    ctf_assets_hedges_total{model}
+    ctf_assets_hedge_wins_total{model}
+    ctf_assets_fallbacks_total{route, model}          routed requests moved off a failing model
+    ctf_assets_response_cache_hits_total
+    ctf_assets_items_requested_total{generator}       `amt` of generator calls
+    ctf_assets_items_asked_total{generator}           items asked of the model, shards and top-ups included
+    ctf_assets_items_parsed_total{generator}          valid items parsed from responses
+    ctf_assets_items_returned_total{generator}
+
+Classes:
+    MetricEvent: One update, as passed to hooks.
+    MetricsRegistry: Thread-safe counters and histograms with exporters.
+
+Functions:
+    get_default_registry: Return the process-wide registry.
+
+Example:
+    registry = get_default_registry()
+    registry.add_hook(lambda event: statsd.timing(event.name, event.value))
+    generate_flags(theme="NASA", amt=50)
+    print(registry.to_prometheus())
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import threading
+import time
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_HELP = {
+    "ctf_assets_stage_seconds": "Time spent per generator stage (prompt_build, network, parse, file_write).",
+    "ctf_assets_api_seconds": "Latency of individual API attempts.",
+    "ctf_assets_api_calls_total": "API attempts by outcome (ok, error, throttled, cancelled).",
+    "ctf_assets_tokens_total": "Tokens reported in the usage block, by kind (input, output, cached).",
+    "ctf_assets_retries_total": "API attempts retried after a retryable error.",
+    "ctf_assets_hedges_total": "Duplicate requests fired by request hedging.",
+    "ctf_assets_hedge_wins_total": "Hedged calls answered by the duplicate request.",
+    "ctf_assets_fallbacks_total": "Routed requests moved to another model after this model failed.",
+    "ctf_assets_response_cache_hits_total": "Calls answered by the local response cache.",
+    "ctf_assets_items_requested_total": "Items requested by callers (the amt argument).",
+    "ctf_assets_items_asked_total": "Items asked of the model, shards and top-ups included.",
+    "ctf_assets_items_parsed_total": "Valid items parsed from model responses.",
+    "ctf_assets_flags_repaired_total": "Malformed flags fixed locally to match flag_format.",
+    "ctf_assets_flags_rejected_total": "Malformed flags dropped and left to the top-up round.",
+    "ctf_assets_items_returned_total": "Items returned to callers.",
+}
+
+Labels = tuple[tuple[str, str], ...]
+
+_default_registry: MetricsRegistry | None = None
+_default_registry_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MetricEvent:
+    kind: str  # "counter" or "histogram"
+    name: str
+    value: float
+    labels: dict[str, str]
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, buckets: int) -> None:
+        self.counts = [0] * buckets
+        self.count = 0
+        self.sum = 0.0
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _escape(value: str) -> str:
+    # Label values escape backslash, double quote and newline
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] | None = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and latency histograms keyed by name and labels.
+
+    Args:
+        buckets (tuple[float, ...]): Histogram bucket upper bounds in seconds.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._counters: dict[tuple[str, Labels], float] = {}
+        self._histograms: dict[tuple[str, Labels], _Histogram] = {}
+        self._hooks: list[Callable[[MetricEvent], None]] = []
+        self._lock = threading.Lock()
+
+    # Hooks
+
+    def add_hook(self, hook: Callable[[MetricEvent], None]) -> None:
+        """Call `hook(event)` on every update. Hook errors are reported as warnings, never raised."""
+        with self._lock:
+            self._hooks.append(hook)
+
+    def remove_hook(self, hook: Callable[[MetricEvent], None]) -> None:
+        with self._lock:
+            if hook in self._hooks:
+                self._hooks.remove(hook)
+
+    def _emit(self, kind: str, name: str, value: float, labels: dict[str, Any]) -> None:
+        hooks = self._hooks
+        if not hooks:
+            return
+        event = MetricEvent(kind, name, value, dict(_labels(labels)))
+        for hook in list(hooks):
+            try:
+                hook(event)
+            except Exception as e:
+                warnings.warn(f"Metrics hook {hook!r} failed: {e}")
+
+    # Recording
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        """Add `value` to the counter `name` with `labels`."""
+        if not value:
+            return
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record one observation in the histogram `name` with `labels`."""
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(len(self.buckets))
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                histogram.counts[index] += 1
+            histogram.count += 1
+            histogram.sum += seconds
+        self._emit("histogram", name, seconds, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Observe the wall time of the `with` block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def stage(self, generator: str, stage: str) -> contextlib.AbstractContextManager[None]:
+        """Time one stage of a generator call into `ctf_assets_stage_seconds`."""
+        return self.timer("ctf_assets_stage_seconds", generator=generator, stage=stage)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # Export
+
+    def to_dict(self) -> dict[str, list[dict[str, Any]]]:
+        """Snapshot of all metrics as plain data."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = []
+            for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0]):
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets, h.counts):
+                    cumulative += count
+                    buckets[str(bound)] = cumulative
+                buckets["+Inf"] = h.count
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": h.sum,
+                    "buckets": buckets,
+                })
+        return {"counters": counters, "histograms": histograms}
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        snapshot = self.to_dict()
+        lines: list[str] = []
+        described: set[str] = set()
+
+        def describe(name: str, kind: str) -> None:
+            if name in described:
+                return
+            described.add(name)
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        for counter in snapshot["counters"]:
+            describe(counter["name"], "counter")
+            labels = _labels(counter["labels"])
+            lines.append(f"{counter['name']}{_format_labels(labels)} {_format_value(counter['value'])}")
+
+        for histogram in snapshot["histograms"]:
+            name = histogram["name"]
+            describe(name, "histogram")
+            labels = _labels(histogram["labels"])
+            for bound, count in histogram["buckets"].items():
+                lines.append(f"{name}_bucket{_format_labels(labels, ('le', bound))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Write the metrics to `path`: Prometheus text for `.prom`/`.txt`, JSON otherwise."""
+        text = self.to_prometheus() if str(path).endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+
+
+def get_default_registry() -> MetricsRegistry:
+    """Return the process-wide registry, creating it on first use."""
+    global _default_registry
+
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = MetricsRegistry()
+    return _default_registry
@@ -0,0 +1,169 @@
+"""
+Persistent model catalogue and bundled capability table.
+
+The list of models available to an API key is cached on disk with a TTL so
+that each new `ctf-assets` process does not pay a list-models round trip.
+There is one cache file per API root (`base_url`), so an OpenAI-compatible
+server never reads OpenAI's model list or the other way round.
+Model capabilities (reasoning, temperature support, image generation) come
+from a bundled table instead of guessing from the model id.
+
+Functions:
+    - load_catalog: Read the cached model ids if the cache is still fresh.
+    - save_catalog: Persist model ids to the disk cache.
+    - model_capabilities: Look up the capabilities of a model id.
+    - is_reasoning_model / supports_temperature / is_image_model: Shortcuts.
+
+Example:
+    >>> model_capabilities("gpt-4o-mini-2024-07-18")
+    {'text': True, 'reasoning': False, 'temperature': True, 'image': False}
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from ctf_assets.config import cache_dir, model_cache_ttl
+
+CATALOG_FILENAME = "models.json"
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+
+_TEXT = {"text": True, "reasoning": False, "temperature": True, "image": False}
+_REASONING = {"text": True, "reasoning": True, "temperature": False, "image": False}
+_IMAGE = {"text": False, "reasoning": False, "temperature": False, "image": True}
+
+# Capabilities keyed by model family. Dated snapshots such as
+# "gpt-4o-mini-2024-07-18" resolve to the longest matching family prefix.
+MODEL_CAPABILITIES: dict[str, dict[str, bool]] = {
+    "gpt-3.5-turbo": _TEXT,
+    "gpt-4": _TEXT,
+    "gpt-4-turbo": _TEXT,
+    "gpt-4o": _TEXT,
+    "gpt-4o-mini": _TEXT,
+    "chatgpt-4o": _TEXT,
+    "gpt-4.1": _TEXT,
+    "gpt-4.1-mini": _TEXT,
+    "gpt-4.1-nano": _TEXT,
+    "gpt-4.5": _TEXT,
+    "gpt-5": _REASONING,
+    "gpt-5-mini": _REASONING,
+    "gpt-5-nano": _REASONING,
+    "gpt-5-pro": _REASONING,
+    "gpt-5-chat": _TEXT,
+    "o1": _REASONING,
+    "o1-mini": _REASONING,
+    "o1-preview": _REASONING,
+    "o1-pro": _REASONING,
+    "o3": _REASONING,
+    "o3-mini": _REASONING,
+    "o3-pro": _REASONING,
+    "o4-mini": _REASONING,
+    "dall-e-2": _IMAGE,
+    "dall-e-3": _IMAGE,
+    "gpt-image-1": _IMAGE,
+}
+
+# Unknown models are sent a temperature; `Session` drops it for a model
+# that rejects it with a 400 and remembers that for later requests
+_UNKNOWN = {"text": True, "reasoning": False, "temperature": True, "image": False}
+
+
+def normalize_base_url(base_url: str | None) -> str:
+    """The API root used as the catalogue key; None means OpenAI's."""
+    return str(base_url or DEFAULT_BASE_URL).rstrip("/")
+
+
+def _catalog_path(base_url: str | None = None) -> Path:
+    base_url = normalize_base_url(base_url)
+    if base_url == DEFAULT_BASE_URL:
+        return cache_dir() / CATALOG_FILENAME
+    digest = hashlib.sha256(base_url.encode("utf-8")).hexdigest()[:16]
+    return cache_dir() / f"models-{digest}.json"
+
+
+def load_catalog(ttl: float | None = None, base_url: str | None = None) -> frozenset[str] | None:
+    """
+    Read the cached model ids from disk.
+
+    Args:
+        ttl (float | None): Maximum age of the cache in seconds. Defaults to
+            `model_cache_ttl()`.
+        base_url (str | None): API root the models were listed from. Defaults to OpenAI's.
+
+    Returns:
+        frozenset[str] | None: The cached model ids, or None if the cache is
+            missing, unreadable or older than `ttl`.
+    """
+    ttl = model_cache_ttl() if ttl is None else ttl
+    if ttl <= 0:
+        return None
+
+    base_url = normalize_base_url(base_url)
+    try:
+        data = json.loads(_catalog_path(base_url).read_text(encoding="utf-8"))
+        fetched_at = float(data["fetched_at"])
+        models = data["models"]
+        # Files written before the cache was keyed by API root hold OpenAI's list
+        cached_url = data.get("base_url", DEFAULT_BASE_URL)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+    if time.time() - fetched_at > ttl or not isinstance(models, list) or cached_url != base_url:
+        return None
+    return frozenset(m for m in models if isinstance(m, str))
+
+
+def save_catalog(models: frozenset[str] | set[str] | list[str], base_url: str | None = None) -> None:
+    """
+    Persist model ids to the disk cache of `base_url` (OpenAI's by default).
+
+    The file is written atomically so concurrent processes never read a
+    half-written catalogue. Failures to write are ignored; the cache is an
+    optimization, not a requirement.
+    """
+    base_url = normalize_base_url(base_url)
+    path = _catalog_path(base_url)
+    payload = json.dumps({"fetched_at": time.time(), "base_url": base_url, "models": sorted(models)})
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".models-", suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(payload)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def model_capabilities(model: str) -> dict[str, bool]:
+    """
+    Return the capabilities of `model` from the bundled table.
+
+    Exact ids win; otherwise the longest family prefix followed by "-" is
+    used. Unknown models are treated as plain text models.
+    """
+    model = (model or "").lower()
+    if model in MODEL_CAPABILITIES:
+        return MODEL_CAPABILITIES[model]
+
+    best = ""
+    for family in MODEL_CAPABILITIES:
+        if model.startswith(family + "-") and len(family) > len(best):
+            best = family
+    return MODEL_CAPABILITIES[best] if best else _UNKNOWN
+
+
+def is_reasoning_model(model: str) -> bool:
+    return model_capabilities(model)["reasoning"]
+
+
+def supports_temperature(model: str) -> bool:
+    return model_capabilities(model)["temperature"]
+
+
+def is_image_model(model: str) -> bool:
+    return model_capabilities(model)["image"]
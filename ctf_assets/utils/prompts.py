@@ -10,7 +10,11 @@ Functions:
         making sure it does not generate illegal contetn and that it is
         appropriate for under 18, high-school students.
     - flag_prompt: Constructs a string with the user instructions to generate flags.
+    - flag_prompt_parts: Same prompt split into a cacheable prefix and a variable suffix.
+    - word_pool_prompt_parts: Instructions and input asking for themed word pools
+        used by the procedural flag engine.
     - story_prompt: Constructs a string with user level instructions to generate stories.
+    - story_prompt_parts: Same prompt split into a cacheable prefix and a variable suffix.
 
 Examples:
     from openai import openai
@@ -97,6 +101,52 @@ def system_prompt(additional_system_instructions = "") -> str:
 
     return prompt
 
+def flag_prompt_parts(
+        asset_type="flags",
+        theme="",
+        tone= "neutral",
+        amt=1,
+        flag_format= "ctf{..}",
+        language= "es-PR",
+        additional_instructions: str="",
+        additional_system_instructions: str="",
+        ) -> tuple[str, str]:
+    """
+    Split the flag prompt into a static prefix and a variable suffix.
+
+    The prefix (system rules, task and format rules) is identical across
+    calls that share `flag_format` and `additional_system_instructions`, so it
+    is sent as `instructions` and the provider can serve it from its prompt
+    cache. Everything that changes per call (amount, theme, tone, language,
+    additional instructions and shard hints) goes in the suffix, sent as `input`.
+
+    Args:
+        Same as `flag_prompt`.
+
+    Returns:
+        tuple[str, str]: (instructions, input).
+    """
+
+    # Make sure amt is a positive integer
+    amt = max(1, int( amt))
+
+    partial_prompt = compose_partial_text(asset_type=asset_type, amt=amt, theme=theme, tone=tone, language=language)
+
+    sys_prompt = system_prompt(additional_system_instructions=additional_system_instructions)
+
+    instructions = (
+        f"{sys_prompt} "
+        "You are tasked with generating flags for a CTF challenge. "
+        f"Each flag should be in the format: {flag_format}. "
+        "Do not include any other information. "
+    )
+
+    prompt = partial_prompt
+    if additional_instructions:
+        prompt += f" {additional_instructions}"
+
+    return instructions, prompt
+
 def flag_prompt(
         asset_type="flags",   
         theme="",
@@ -123,52 +173,82 @@ def flag_prompt(
     Returns:
         str: The structured prompt string.
     """
+    instructions, prompt = flag_prompt_parts(
+        asset_type=asset_type,
+        theme=theme,
+        tone=tone,
+        amt=amt,
+        flag_format=flag_format,
+        language=language,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+    )
+    return f"{instructions}{prompt}"
 
-    # Make sure amt is a positive integer
-    amt = max(1, int( amt))
+def word_pool_prompt_parts(
+        theme="",
+        tone="neutral",
+        amt=64,
+        language="es-PR",
+        additional_instructions: str="",
+        additional_system_instructions: str="",
+        ) -> tuple[str, str]:
+    """
+    Build the request for the word pools of the procedural flag engine.
 
-    partial_prompt = compose_partial_text(asset_type=asset_type, amt=amt, theme=theme, tone=tone, language=language)
+    Asks for `amt` adjectives, nouns and verbs tied to the theme. Words are
+    kept short, single and plain so they read well inside a flag and lend
+    themselves to leetspeak.
+
+    Args:
+        theme (str): The theme of the challenge. Defaults to "".
+        tone (str): The tone of the words. Defaults to "neutral".
+        amt (int): Words per pool. Defaults to 64.
+        language (str): The language of the words. Defaults to "es-PR".
+        additional_instructions (str): Additional instructions for the word choice. Defaults to "".
+        additional_system_instructions (str): Additional system-level constraints or guidelines. Defaults to "".
+
+    Returns:
+        tuple[str, str]: (instructions, input).
+    """
+    amt = max(1, int(amt))
 
     sys_prompt = system_prompt(additional_system_instructions=additional_system_instructions)
 
-    prompt =  (
+    instructions = (
         f"{sys_prompt} "
-        "You are tasked with generating flags for a CTF challenge. "
-        f"{partial_prompt} "
-        f"Each flag should be in the format: {flag_format}. "
-        "Do not include any other information. "
+        "You are tasked with providing vocabulary to build flags for a CTF challenge. "
+        "Every item must be a single lowercase word of 3 to 10 letters, without spaces, digits or punctuation. "
+        "Prefer words with the letters a, e, i, o, s and t, which read well in leetspeak. "
+        "Do not repeat words and do not include any other information. "
     )
 
+    related = f"related to the theme: {theme}" if theme else "about a random subject"
+    prompt = f"Generate exactly {amt} {tone} adjectives, exactly {amt} nouns and exactly {amt} verbs {related}, in {language}. "
     if additional_instructions:
         prompt += f" {additional_instructions}"
 
-    return prompt
+    return instructions, prompt
 
-def story_prompt(
+def story_prompt_parts(
         asset_type="stories",
         theme="",
-        tone = "neutral", 
+        tone = "neutral",
         amt = 1,
         language = "es-PR",
         title = False,
         additional_instructions= "",
         additional_system_instructions=""
-) -> str:
+) -> tuple[str, str]:
     """
-    Generates a structured prompt with instructions for generating stories.
-     
-    Constructs a prompt to guide story generation based on theme, tone,
-    and additional parameters.
+    Split the story prompt into a static prefix and a variable suffix.
+
+    See `flag_prompt_parts`. The prefix holds the system, task and output
+    rules; amount, theme, tone, language, titles and additional instructions
+    go in the suffix.
 
-    Args:
-        theme (str): The theme of the challenge. Defaults to "".
-        tone (str): The tone of the flags. Defaults to "neutral".
-        amt (int): The amount of flags to generate. Defaults to 1.
-        language (str): The language used to generate flags. Defaults to "es-PR".
-        additions_instructions (str): Further instructions on how to generate the flag. Defaults to "".
-            
     Returns:
-        str: A string with instructions to generate a flag.
+        tuple[str, str]: (instructions, input).
     """
     # Make sure amt is a positive integer
     amt = max(1, int( amt))
@@ -180,18 +260,56 @@ def story_prompt(
     if title:
         partial_prompt += "Include titles for the stories. "
 
-    prompt = (
+    instructions = (
         f"{sys_prompt} "
         "You are tasked with generating stories for CTF challenges. "
-        f"{partial_prompt} "
         "Do not mix double and single quotes. "
         "Do not add any extra explanations. "
     )
-     
+
+    prompt = partial_prompt
     if additional_instructions:
         prompt += f" {additional_instructions}"
 
-    return prompt
+    return instructions, prompt
+
+def story_prompt(
+        asset_type="stories",
+        theme="",
+        tone = "neutral", 
+        amt = 1,
+        language = "es-PR",
+        title = False,
+        additional_instructions= "",
+        additional_system_instructions=""
+) -> str:
+    """
+    Generates a structured prompt with instructions for generating stories.
+     
+    Constructs a prompt to guide story generation based on theme, tone,
+    and additional parameters.
+
+    Args:
+        theme (str): The theme of the challenge. Defaults to "".
+        tone (str): The tone of the flags. Defaults to "neutral".
+        amt (int): The amount of flags to generate. Defaults to 1.
+        language (str): The language used to generate flags. Defaults to "es-PR".
+        additions_instructions (str): Further instructions on how to generate the flag. Defaults to "".
+            
+    Returns:
+        str: A string with instructions to generate a flag.
+    """
+    instructions, prompt = story_prompt_parts(
+        asset_type=asset_type,
+        theme=theme,
+        tone=tone,
+        amt=amt,
+        language=language,
+        title=title,
+        additional_instructions=additional_instructions,
+        additional_system_instructions=additional_system_instructions,
+    )
+    return f"{instructions}{prompt}"
 
 def image_prompt(
         asset_type="images",
@@ -227,3 +345,30 @@ def image_prompt(
         )
 
     return prompt
+
+
+def image_prompt_batch(
+        theme="",
+        tone="neutral",
+        amt=1,
+        language="es-PR",
+        additional_instructions="",
+):
+    """
+    Build the request for `amt` distinct text-to-image prompts in one call.
+
+    Same instructions as `image_prompt`, plus a diversity constraint so the
+    prompts of one batch don't describe near-identical images.
+    """
+    diversity = (
+        "Return each prompt as a separate item. "
+        "Every prompt must describe a clearly different image: vary the subject, setting, "
+        "composition, camera angle, lighting and time of day across the prompts. "
+    )
+    return image_prompt(
+        theme=theme,
+        tone=tone,
+        amt=amt,
+        language=language,
+        additional_instructions=f"{diversity}{additional_instructions}",
+    )
@@ -0,0 +1,366 @@
+"""
+Client-side rate limiting.
+
+`AdaptiveRateLimiter` keeps bulk jobs just under the provider's limits
+instead of running into 429s. Per model it tracks a requests-per-minute and
+a tokens-per-minute bucket, sized from the `x-ratelimit-*` headers of each
+response, and a concurrency window adjusted by AIMD: one more slot per
+window of successful calls, half the slots (and a pause until the limit
+resets) on every 429.
+
+Classes:
+    TokenBucket: Thread-safe token bucket with blocking and async acquire.
+    AdaptiveRateLimiter: Header-driven RPM/TPM limiter with AIMD concurrency.
+
+Functions:
+    estimate_tokens: Rough token cost of a Responses request.
+    retry_after: Seconds to wait after a 429, from the response headers.
+
+Example:
+    bucket = TokenBucket(rate_per_minute=50)
+    for prompt in prompts:
+        bucket.acquire()
+        client.images.generate(prompt=prompt, ...)
+
+    limiter = AdaptiveRateLimiter()
+    limiter.acquire("gpt-4o-mini", tokens=800)
+    raw = client.responses.with_raw_response.create(**params)
+    limiter.release("gpt-4o-mini", raw.headers)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Mapping
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`.
+
+    Args:
+        rate_per_minute (float): Tokens added per minute.
+        capacity (float | None): Maximum burst size. Defaults to one second
+            worth of tokens, at least 1.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        self._lock = threading.Lock()
+        self.configure(rate_per_minute, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def configure(self, rate_per_minute: float, capacity: float | None = None) -> None:
+        """Change the refill rate (and optionally the burst size) in place."""
+        with self._lock:
+            self.rate = max(1e-9, float(rate_per_minute)) / 60.0
+            self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+            if hasattr(self, "_tokens"):
+                self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take `tokens` if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait
+                before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Requests larger than the bucket are let through once it is full
+            needed = min(tokens, self.capacity)
+            if self._tokens >= needed:
+                self._tokens -= tokens
+                return 0.0
+            return (needed - self._tokens) / self.rate
+
+    def limit_to(self, tokens: float) -> None:
+        """Lower the available tokens to at most `tokens` (e.g. what the provider reports as remaining)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, float(tokens))
+
+    def refund(self, tokens: float) -> None:
+        """Return `tokens` taken by a call that did not go ahead."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until `tokens` are available, then take them."""
+        while (wait := self.try_acquire(tokens)) > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1.0) -> None:
+        """Async counterpart of `acquire`."""
+        while (wait := self.try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+
+
+# Output tokens assumed for a request that doesn't set `max_output_tokens`
+DEFAULT_OUTPUT_TOKEN_ESTIMATE = 1000
+
+# Longest an async waiter sleeps before re-checking for a free slot
+_ASYNC_POLL_INTERVAL = 0.05
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SCALE = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def estimate_tokens(params: Mapping[str, Any]) -> int:
+    """
+    Estimate the tokens a Responses request counts against the TPM limit.
+
+    The provider counts the prompt plus the maximum output, so this is the
+    prompt length at ~4 characters per token plus `max_output_tokens`.
+    """
+    prompt = json.dumps([params.get("instructions"), params.get("input")], ensure_ascii=False)
+    output = params.get("max_output_tokens") or DEFAULT_OUTPUT_TOKEN_ESTIMATE
+    return len(prompt) // 4 + int(output)
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse reset durations such as "20ms", "1s" or "6m0s" into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SCALE[unit] for number, unit in parts)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retry_after(headers: Mapping[str, str] | None) -> float | None:
+    """Seconds to wait after a 429, from `retry-after-ms`, `retry-after` or the reset headers."""
+    headers = headers or {}
+    ms = _header_float(headers, "retry-after-ms")
+    if ms is not None:
+        return ms / 1000
+    seconds = _header_float(headers, "retry-after")
+    if seconds is not None:
+        return seconds
+    resets = [
+        _parse_duration(headers.get("x-ratelimit-reset-requests")),
+        _parse_duration(headers.get("x-ratelimit-reset-tokens")),
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+@dataclass
+class _ModelLimits:
+    window: float
+    requests: TokenBucket | None = None
+    tokens: TokenBucket | None = None
+    in_flight: int = 0
+    blocked_until: float = 0.0
+    stats: dict[str, int] = field(default_factory=lambda: {"calls": 0, "throttled": 0})
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared limiter for every OpenAI call made through a `Session`.
+
+    Limits are kept per model, since the provider meters each model
+    separately. Until a response reports the limits, only the concurrency
+    window applies; afterwards the RPM and TPM buckets refill at the reported
+    limit minus `headroom`. Thread-safe, and usable from sync and async code
+    at the same time.
+
+    Args:
+        initial_concurrency (int): Calls in flight per model before any
+            feedback. Defaults to 8.
+        max_concurrency (int): Upper bound of the AIMD window. Defaults to 64.
+        headroom (float): Fraction of the reported limits left unused, and
+            the remaining fraction below which the window stops growing.
+            Defaults to 0.1.
+        requests_per_minute (float | None): RPM to assume before headers
+            arrive. Defaults to unknown.
+        tokens_per_minute (float | None): TPM to assume before headers
+            arrive. Defaults to unknown.
+    """
+
+    def __init__(
+            self,
+            initial_concurrency: int = 8,
+            max_concurrency: int = 64,
+            headroom: float = 0.1,
+            requests_per_minute: float | None = None,
+            tokens_per_minute: float | None = None,
+    ) -> None:
+        self.initial_concurrency = max(1, int(initial_concurrency))
+        self.max_concurrency = max(self.initial_concurrency, int(max_concurrency))
+        self.headroom = min(0.9, max(0.0, float(headroom)))
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._models: dict[str, _ModelLimits] = {}
+        self._cond = threading.Condition()
+
+    def _limits(self, model: str) -> _ModelLimits:
+        # Caller holds self._cond
+        limits = self._models.get(model)
+        if limits is None:
+            limits = _ModelLimits(window=float(self.initial_concurrency))
+            if self._requests_per_minute:
+                limits.requests = TokenBucket(self._requests_per_minute * (1 - self.headroom))
+            if self._tokens_per_minute:
+                limits.tokens = TokenBucket(self._tokens_per_minute * (1 - self.headroom))
+            self._models[model] = limits
+        return limits
+
+    def _try_slot(self, limits: _ModelLimits) -> float:
+        """Take a concurrency slot; return 0, or the seconds to wait (-1 for "until a release")."""
+        wait = limits.blocked_until - time.monotonic()
+        if wait > 0:
+            return wait
+        if limits.in_flight < max(1, int(limits.window)):
+            limits.in_flight += 1
+            return 0.0
+        return -1.0
+
+    def _take_budget(self, limits: _ModelLimits, tokens: float) -> float:
+        """Take one request and `tokens` from the buckets; return seconds to wait if not available."""
+        if limits.requests is not None:
+            wait = limits.requests.try_acquire(1)
+            if wait > 0:
+                return wait
+        if limits.tokens is not None and tokens:
+            wait = limits.tokens.try_acquire(tokens)
+            if wait > 0:
+                # Give back the request taken above and retry both together
+                if limits.requests is not None:
+                    limits.requests.refund(1)
+                return wait
+        return 0.0
+
+    def acquire(self, model: str, tokens: float = 0) -> None:
+        """
+        Block until a call to `model` costing `tokens` may start.
+
+        Every `acquire` must be paired with a `release`.
+        """
+        with self._cond:
+            limits = self._limits(model)
+            while (wait := self._try_slot(limits)) != 0:
+                self._cond.wait(wait if wait > 0 else None)
+
+        try:
+            while (wait := self._take_budget(limits, tokens)) > 0:
+                time.sleep(wait)
+        except BaseException:
+            self.release(model, ok=False)
+            raise
+
+    async def aacquire(self, model: str, tokens: float = 0) -> None:
+        """Async counterpart of `acquire`."""
+        while True:
+            with self._cond:
+                limits = self._limits(model)
+                wait = self._try_slot(limits)
+            if wait == 0:
+                break
+            await asyncio.sleep(min(wait, _ASYNC_POLL_INTERVAL) if wait > 0 else _ASYNC_POLL_INTERVAL)
+
+        try:
+            while (wait := self._take_budget(limits, tokens)) > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            self.release(model, ok=False)
+            raise
+
+    def release(
+            self,
+            model: str,
+            headers: Mapping[str, str] | None = None,
+            throttled: bool = False,
+            ok: bool = True,
+    ) -> None:
+        """
+        Finish a call started with `acquire` and learn from its outcome.
+
+        Args:
+            model (str): Model passed to `acquire`.
+            headers (Mapping | None): Response headers, if any.
+            throttled (bool): The call was rejected with HTTP 429.
+            ok (bool): The call succeeded. Failures other than 429 leave the
+                window unchanged.
+        """
+        headers = headers or {}
+        with self._cond:
+            limits = self._limits(model)
+            limits.in_flight = max(0, limits.in_flight - 1)
+            limits.stats["calls"] += 1
+            near_limit = self._apply_headers(limits, headers)
+
+            if throttled:
+                # Multiplicative decrease, and no new calls until the limit resets
+                limits.stats["throttled"] += 1
+                limits.window = max(1.0, limits.window / 2)
+                pause = retry_after(headers) or 1.0
+                limits.blocked_until = max(limits.blocked_until, time.monotonic() + pause)
+            elif ok and not near_limit:
+                # Additive increase: about one slot per window of successful calls
+                limits.window = min(float(self.max_concurrency), limits.window + 1 / limits.window)
+
+            self._cond.notify_all()
+
+    def _apply_headers(self, limits: _ModelLimits, headers: Mapping[str, str]) -> bool:
+        """Resize the buckets from `x-ratelimit-*` headers; return True when close to a limit."""
+        near_limit = False
+        for kind in ("requests", "tokens"):
+            limit = _header_float(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+            if not limit:
+                continue
+
+            rate = limit * (1 - self.headroom)
+            bucket = getattr(limits, kind)
+            if bucket is None:
+                bucket = TokenBucket(rate)
+                setattr(limits, kind, bucket)
+            elif abs(bucket.rate * 60 - rate) > 1e-6:
+                bucket.configure(rate)
+
+            if remaining is not None:
+                bucket.limit_to(remaining)
+                if remaining <= limit * self.headroom:
+                    near_limit = True
+                if remaining <= 0:
+                    reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                    if reset:
+                        limits.blocked_until = max(limits.blocked_until, time.monotonic() + reset)
+        return near_limit
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Current window, in-flight calls, learned limits and counters per model."""
+        with self._cond:
+            return {
+                model: {
+                    "window": round(limits.window, 2),
+                    "in_flight": limits.in_flight,
+                    "requests_per_minute": limits.requests.rate * 60 if limits.requests else None,
+                    "tokens_per_minute": limits.tokens.rate * 60 if limits.tokens else None,
+                    **limits.stats,
+                }
+                for model, limits in self._models.items()
+            }
@@ -0,0 +1,397 @@
+"""
+Retries, circuit breaking and hedged requests for OpenAI calls.
+
+A `Session` runs every call through a `Resilience` object, so transient
+failures (timeouts, connection resets, 429s and 5xx responses) are retried
+with exponential backoff and full jitter instead of losing the work. A
+per-model circuit breaker fails fast once a model keeps failing, and
+optional hedging fires a duplicate request when the first one is slower
+than the model's recent p95 latency, returning whichever finishes first.
+
+Classes:
+    RetryPolicy: Attempts and backoff for retryable errors.
+    CircuitBreaker: Per-model consecutive-failure breaker.
+    HedgePolicy: When to fire a duplicate request.
+    LatencyTracker: Recent per-model latencies and percentiles.
+    Resilience: Runs calls with the policies above.
+    CircuitOpenError: Raised instead of calling a model whose circuit is open.
+
+Functions:
+    is_retryable: Whether an exception is worth retrying.
+
+Example:
+    resilience = Resilience(hedge=HedgePolicy())
+    response = resilience.call("gpt-4o-mini", lambda: client.responses.create(**params), hedge=True)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from ctf_assets.utils import sdk
+from ctf_assets.utils.metrics import MetricsRegistry
+from ctf_assets.utils.rate_limit import retry_after
+
+# HTTP statuses worth retrying: timeout, conflict, rate limit and server errors
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a model whose circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for timeouts, connection errors, 429s and 5xx responses."""
+    if isinstance(exc, (sdk.APITimeoutError, sdk.APIConnectionError)):
+        return True
+    if isinstance(exc, sdk.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def _error_retry_after(exc: BaseException) -> float | None:
+    response = getattr(exc, "response", None)
+    return retry_after(getattr(response, "headers", None))
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        max_attempts (int): Attempts per call, the first one included. Defaults to 4.
+        base_delay (float): Backoff before the second attempt, in seconds. Defaults to 0.5.
+        max_delay (float): Upper bound of a single backoff. Defaults to 30.
+    """
+
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int, exc: BaseException | None = None) -> float:
+        """Seconds to wait after failed attempt number `attempt` (0-based)."""
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        # Never retry sooner than the provider asked for
+        hinted = _error_retry_after(exc) if exc is not None else None
+        return max(backoff, min(self.max_delay, hinted or 0.0))
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker.
+
+    After `failure_threshold` consecutive retryable failures the circuit for
+    that model opens and calls fail fast with `CircuitOpenError`. After
+    `reset_timeout` seconds one trial call is let through (half-open); its
+    success closes the circuit, its failure opens it again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit. Defaults to 5.
+        reset_timeout (float): Seconds before a trial call is allowed. Defaults to 30.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self._failures: dict[str, int] = {}
+        self._opened_at: dict[str, float] = {}
+        self._trial: set[str] = set()
+        self._lock = threading.Lock()
+
+    def state(self, model: str) -> str:
+        """Return "closed", "open" or "half-open"."""
+        with self._lock:
+            opened_at = self._opened_at.get(model)
+            if opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - opened_at >= self.reset_timeout else "open"
+
+    def before_call(self, model: str) -> None:
+        """
+        Check that a call to `model` may go ahead.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a trial
+                call already in flight.
+        """
+        with self._lock:
+            opened_at = self._opened_at.get(model)
+            if opened_at is None:
+                return
+            remaining = self.reset_timeout - (time.monotonic() - opened_at)
+            if remaining <= 0 and model not in self._trial:
+                self._trial.add(model)
+                return
+        raise CircuitOpenError(
+            f"Circuit open for {model!r} after {self.failure_threshold} consecutive failures; "
+            f"retrying in {max(0.0, remaining):.1f}s"
+        )
+
+    def record_success(self, model: str) -> None:
+        with self._lock:
+            self._failures.pop(model, None)
+            self._opened_at.pop(model, None)
+            self._trial.discard(model)
+
+    def record_failure(self, model: str) -> None:
+        with self._lock:
+            self._failures[model] = self._failures.get(model, 0) + 1
+            if model in self._trial or self._failures[model] >= self.failure_threshold:
+                self._opened_at[model] = time.monotonic()
+            self._trial.discard(model)
+
+    def release(self, model: str) -> None:
+        """Give up a trial call that ended without an outcome (e.g. cancelled), so another may start."""
+        with self._lock:
+            self._trial.discard(model)
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    When to fire a duplicate of a slow request.
+
+    Args:
+        percentile (float): Latency percentile after which the duplicate is sent. Defaults to 95.
+        min_samples (int): Latencies needed before hedging starts. Defaults to 20.
+        min_delay (float): Never hedge sooner than this, in seconds. Defaults to 0.5.
+    """
+
+    percentile: float = 95.0
+    min_samples: int = 20
+    min_delay: float = 0.5
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent successful call latencies per model.
+
+    Args:
+        window (int): Latencies kept per model. Defaults to 200.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self.window = max(1, int(window))
+        self._samples: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, model: str) -> int:
+        with self._lock:
+            return len(self._samples.get(model, ()))
+
+    def percentile(self, model: str, pct: float) -> float | None:
+        """Return the `pct` latency percentile for `model`, or None without samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(model, ()))
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+
+class Resilience:
+    """
+    Run OpenAI calls with retries, a circuit breaker and optional hedging.
+
+    Args:
+        retry (RetryPolicy | None): Backoff for retryable errors. None makes a
+            single attempt.
+        circuit_breaker (CircuitBreaker | None): Breaker consulted before each attempt.
+        hedge (HedgePolicy | None): Hedging policy for calls made with
+            `hedge=True`. None disables hedging.
+        metrics (MetricsRegistry | None): Registry that also counts retries,
+            hedges and hedge wins per model.
+    """
+
+    def __init__(
+            self,
+            retry: RetryPolicy | None = None,
+            circuit_breaker: CircuitBreaker | None = None,
+            hedge: HedgePolicy | None = None,
+            metrics: MetricsRegistry | None = None,
+    ) -> None:
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self.metrics = metrics
+        self.stats = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+        self._stats_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def max_attempts(self) -> int:
+        return max(1, self.retry.max_attempts) if self.retry else 1
+
+    def _count(self, name: str, model: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+        if self.metrics is not None:
+            self.metrics.inc(f"ctf_assets_{name}_total", model=model)
+
+    def hedge_delay(self, model: str) -> float | None:
+        """Seconds after which a duplicate request is sent, or None to not hedge."""
+        if self.hedge is None or self.latency.count(model) < self.hedge.min_samples:
+            return None
+        return max(self.hedge.min_delay, self.latency.percentile(model, self.hedge.percentile) or 0.0)
+
+    def before_attempt(self, model: str) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before_call(model)
+
+    def on_success(self, model: str, elapsed: float | None = None) -> None:
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_success(model)
+        if elapsed is not None:
+            self.latency.record(model, elapsed)
+
+    def on_abort(self, model: str) -> None:
+        """Record an attempt interrupted before it had an outcome (cancellation, generator close)."""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release(model)
+
+    def on_failure(self, model: str, exc: BaseException, attempt: int) -> float | None:
+        """
+        Record a failed attempt.
+
+        Returns:
+            float | None: Seconds to wait before retrying, or None if the
+                error should be raised.
+        """
+        if not is_retryable(exc):
+            if self.circuit_breaker is not None:
+                # The model answered (e.g. a 400), which is no sign of an outage
+                self.circuit_breaker.record_success(model)
+            return None
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure(model)
+        if self.retry is None or attempt + 1 >= self.max_attempts:
+            return None
+        self._count("retries", model)
+        return self.retry.delay(attempt, exc)
+
+    # Sync
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ctf-assets-hedge")
+        return self._executor
+
+    def _hedged(self, model: str, fn: Callable[[], Any], delay: float) -> Any:
+        primary = self._pool().submit(fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        # The primary is slow: race a duplicate against it. A sync HTTP call
+        # can't be cancelled, so the loser finishes in the background.
+        self._count("hedges", model)
+        backup = self._pool().submit(fn)
+        pending = {primary, backup}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count("hedge_wins", model)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def call(self, model: str, fn: Callable[[], Any], hedge: bool = False) -> Any:
+        """
+        Call `fn` with retries, the circuit breaker and (if `hedge`) hedging.
+
+        Raises:
+            CircuitOpenError: If the circuit for `model` is open.
+            Exception: The last error, once it is not retryable or attempts run out.
+        """
+        attempt = 0
+        while True:
+            self.before_attempt(model)
+            start = time.monotonic()
+            try:
+                delay = self.hedge_delay(model) if hedge else None
+                result = self._hedged(model, fn, delay) if delay is not None else fn()
+            except Exception as e:
+                backoff = self.on_failure(model, e, attempt)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                self.on_abort(model)
+                raise
+            self.on_success(model, time.monotonic() - start)
+            return result
+
+    # Async
+
+    async def _ahedged(self, model: str, fn: Callable[[], Awaitable[Any]], delay: float) -> Any:
+        primary = asyncio.ensure_future(fn())
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count("hedges", model)
+        backup = asyncio.ensure_future(fn())
+        pending = {primary, backup}
+        error: BaseException | None = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self._count("hedge_wins", model)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, model: str, fn: Callable[[], Awaitable[Any]], hedge: bool = False) -> Any:
+        """Async counterpart of `call`; `fn` returns a new awaitable on every call."""
+        attempt = 0
+        while True:
+            self.before_attempt(model)
+            start = time.monotonic()
+            try:
+                delay = self.hedge_delay(model) if hedge else None
+                result = await (self._ahedged(model, fn, delay) if delay is not None else fn())
+            except Exception as e:
+                backoff = self.on_failure(model, e, attempt)
+                if backoff is None:
+                    raise
+                await asyncio.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                self.on_abort(model)
+                raise
+            self.on_success(model, time.monotonic() - start)
+            return result
+
+    def close(self) -> None:
+        """Shut down the hedging thread pool without waiting for stragglers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
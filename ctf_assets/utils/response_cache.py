@@ -0,0 +1,195 @@
+"""
+Content-addressed cache for Responses API output.
+
+Requests are keyed on a SHA-256 digest of the exact request parameters
+(final prompt, JSON schema, model and temperature), so a repeated
+(theme, tone, language, amt, model, flag_format) combination is served
+locally instead of paying for another call.
+
+The cache has two tiers:
+    - an in-memory LRU for hits within one process
+    - an on-disk SQLite database shared across processes, with age and
+      size based eviction
+
+Classes:
+    ResponseCache: Two-tier cache of response output text.
+
+Functions:
+    response_cache_key: Digest of the request parameters used as cache key.
+
+Example:
+    cache = ResponseCache()
+    key = response_cache_key(responses_parameters)
+    text = cache.get(key)
+    if text is None:
+        text = client.responses.create(**responses_parameters).output_text
+        cache.set(key, text)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from ctf_assets.config import cache_dir
+
+# Only these request fields decide the model output
+_KEY_FIELDS = ("model", "instructions", "input", "text", "temperature")
+
+
+def response_cache_key(params: dict[str, Any]) -> str:
+    """
+    Return a stable digest of the request parameters.
+
+    Args:
+        params (dict): Keyword arguments for `client.responses.create`.
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical JSON of the key fields.
+    """
+    material = {field: params.get(field) for field in _KEY_FIELDS}
+    canonical = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of Responses output text.
+
+    Args:
+        path (str | Path | None): SQLite database file. Defaults to
+            `responses.sqlite3` in the ctf-assets cache directory.
+        max_memory_entries (int): Entries kept in the in-memory LRU. Defaults to 256.
+        max_disk_entries (int): Entries kept on disk; least recently used rows
+            are evicted beyond this. Defaults to 10,000.
+        max_age (float): Seconds after which an entry is stale and evicted.
+            Defaults to 7 days.
+    """
+
+    def __init__(
+            self,
+            path: str | Path | None = None,
+            max_memory_entries: int = 256,
+            max_disk_entries: int = 10_000,
+            max_age: float = 7 * 24 * 60 * 60,
+    ) -> None:
+        self.path = Path(path).expanduser() if path else cache_dir() / "responses.sqlite3"
+        self.max_memory_entries = max(0, int(max_memory_entries))
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self.max_age = float(max_age)
+
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._writes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        if not self.max_memory_entries:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        """Return the cached value for `key`, or None if missing or stale."""
+        now = time.time()
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                value, created_at = hit
+                if now - created_at <= self.max_age:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            db = self._db()
+            row = db.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if now - created_at > self.max_age:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                db.commit()
+                return None
+
+            db.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._remember(key, value, created_at)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        """Store `value` under `key` in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            db.commit()
+
+            # Amortize eviction over writes instead of scanning on every insert
+            self._writes += 1
+            if self._writes % 64 == 1:
+                self._evict(db, now)
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+        (count,) = db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        excess = count - self.max_disk_entries
+        if excess > 0:
+            db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY accessed_at ASC LIMIT ?"
+                ")",
+                (excess,),
+            )
+        db.commit()
+
+    def evict(self) -> None:
+        """Drop stale entries and trim the disk tier to `max_disk_entries`."""
+        with self._lock:
+            self._evict(self._db(), time.time())
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            db = self._db()
+            db.execute("DELETE FROM responses")
+            db.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
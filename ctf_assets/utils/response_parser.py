@@ -37,6 +37,32 @@ def parse_stories(response: str | dict) -> list[str]:
     return []
 
 
+def parse_image_prompts(response: str | dict) -> list[str]:
+    """Parse a Responses JSON-schema output into a list of text-to-image prompts."""
+    if isinstance(response, dict):
+        prompts = response.get("prompts", [])
+        return prompts if isinstance(prompts, list) else []
+    if isinstance(response, str):
+        obj = _loads_if_json(response)
+        if obj is None:
+            return []
+        prompts = obj.get("prompts", [])
+        return prompts if isinstance(prompts, list) else []
+    return []
+
+
+def parse_word_pools(response: str | dict) -> dict[str, list[str]]:
+    """Parse a word-pool response into {'adjectives': [...], 'nouns': [...], 'verbs': [...]}."""
+    obj = response if isinstance(response, dict) else _loads_if_json(response) if isinstance(response, str) else None
+    if obj is None:
+        return {}
+    return {
+        name: [word for word in words if isinstance(word, str)]
+        for name, words in obj.items()
+        if isinstance(words, list)
+    }
+
+
 def parse_titled_stories(response: str | dict) -> list[dict[str, str]]:
     """Parse titled stories into a list of {'title': ..., 'story': ...}."""
     def _coerce(items: Any) -> list[dict[str, str]]:
@@ -56,3 +82,134 @@ def parse_titled_stories(response: str | dict) -> list[dict[str, str]]:
             return []
         return _coerce(obj.get("stories_with_titles", []))
     return []
+
+
+def output_text_from_body(body: dict) -> str:
+    """
+    Extract the output text from a raw Responses API body.
+
+    Mirrors the SDK's `Response.output_text` for responses that arrive as
+    plain JSON, e.g. lines of a Batch API output file.
+    """
+    if not isinstance(body, dict):
+        return ""
+    if isinstance(body.get("output_text"), str):
+        return body["output_text"]
+
+    texts: list[str] = []
+    for item in body.get("output") or []:
+        if not isinstance(item, dict) or item.get("type") != "message":
+            continue
+        for content in item.get("content") or []:
+            if isinstance(content, dict) and content.get("type") == "output_text":
+                texts.append(content.get("text") or "")
+    return "".join(texts)
+
+
+class IncrementalArrayParser:
+    """
+    Incremental parser for the array under `key` in a streamed JSON object.
+
+    Feed it chunks of `{"<key>": [ ... ]}` as they arrive; each call returns
+    the array elements that closed within that chunk. Only the text of the
+    element currently being received is buffered, so memory stays bounded by
+    the largest single element rather than the whole response.
+
+    Example:
+        >>> parser = IncrementalArrayParser("flags")
+        >>> parser.feed('{"flags": ["ctf{a}", "ct')
+        ['ctf{a}']
+        >>> parser.feed('f{b}"]}')
+        ['ctf{b}']
+    """
+
+    def __init__(self, key: str) -> None:
+        self.key = key
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: str | None = None
+        self._in_target = False
+        self._done = False
+        self._elem_start: int | None = None
+
+    def _emit(self, text: str, out: list[Any]) -> None:
+        try:
+            out.append(json.loads(text))
+        except json.JSONDecodeError:
+            pass
+
+    def feed(self, chunk: str) -> list[Any]:
+        """Consume a chunk of text and return the elements completed by it."""
+        out: list[Any] = []
+        if self._done or not chunk:
+            return out
+
+        buf = self._buf + chunk
+        target_depth = 2  # elements of the target array sit inside {"key": [ ... ]}
+        i = self._pos
+        while i < len(buf):
+            c = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = buf[self._string_start + 1:i]
+                i += 1
+                continue
+
+            in_elements = self._in_target and self._depth == target_depth
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if in_elements and self._elem_start is None:
+                    self._elem_start = i
+            elif c in "{[":
+                if in_elements and self._elem_start is None:
+                    self._elem_start = i
+                self._depth += 1
+                if c == "[" and not self._in_target and self._depth == target_depth and self._last_string == self.key:
+                    self._in_target = True
+            elif c in "}]":
+                if in_elements:
+                    # End of the target array
+                    if self._elem_start is not None:
+                        self._emit(buf[self._elem_start:i], out)
+                        self._elem_start = None
+                    self._in_target = False
+                    self._done = True
+                    break
+                self._depth -= 1
+                if self._in_target and self._depth == target_depth and self._elem_start is not None:
+                    self._emit(buf[self._elem_start:i + 1], out)
+                    self._elem_start = None
+            elif c == "," and in_elements:
+                if self._elem_start is not None:
+                    self._emit(buf[self._elem_start:i], out)
+                    self._elem_start = None
+            elif in_elements and self._elem_start is None and not c.isspace():
+                # Scalar element (number, true, false, null)
+                self._elem_start = i
+            i += 1
+
+        # Keep only the text still needed: the open element or the open string
+        if self._elem_start is not None:
+            keep = self._elem_start
+        elif self._in_string:
+            keep = self._string_start
+        else:
+            keep = i
+        self._buf = buf[keep:]
+        self._pos = i - keep
+        if self._elem_start is not None:
+            self._elem_start -= keep
+        self._string_start = max(0, self._string_start - keep)
+        return out
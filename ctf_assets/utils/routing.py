@@ -0,0 +1,210 @@
+"""
+Latency-aware model routing with automatic fallback.
+
+A `ModelRouter` holds, per asset type, an ordered list of quality tiers of
+acceptable models. Each request goes to the fastest healthy model of the
+best tier that has one. Health and speed come from a rolling window of the
+session's own API attempts: a model whose recent error rate exceeds
+`max_error_rate` (or whose circuit is open) is skipped, so traffic shifts to
+the next model, and moves back once its failures age out of the window.
+
+Routes map an asset type to tiers. Each entry is one tier, either a model
+name or a list of equally acceptable models:
+
+    {"flags": [["gpt-4.1-mini", "gpt-4o-mini"], "gpt-4o"]}
+
+sends flags to whichever of gpt-4.1-mini and gpt-4o-mini is faster, and to
+gpt-4o only while both are unhealthy. Asset types are "flags", "stories"
+and "image_prompts".
+
+Classes:
+    ModelStats: Rolling health of one model.
+    ModelRouter: Per-asset tiers and the per-model statistics they are routed on.
+
+Functions:
+    parse_route: Parse a CLI route such as "flags=gpt-4.1-mini|gpt-4o-mini,gpt-4o".
+
+Example:
+    router = ModelRouter({"flags": [["gpt-4.1-mini", "gpt-4o-mini"], "gpt-4o"]})
+    session = Session(router=router)
+    flags = generate_flags(theme="NASA", amt=100, session=session)
+    print(router.snapshot())
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Sequence
+
+ROUTED_ASSETS = ("flags", "stories", "image_prompts")
+
+
+@dataclass(frozen=True)
+class ModelStats:
+    samples: int
+    errors: int
+    error_rate: float
+    # Median latency of recent successful attempts, None without any
+    p50_latency: float | None
+
+
+def _tiers(route: Sequence[str | Sequence[str]]) -> list[list[str]]:
+    tiers = []
+    for entry in route:
+        tier = [entry] if isinstance(entry, str) else [str(model) for model in entry]
+        tier = [model.strip() for model in tier if model and model.strip()]
+        if tier:
+            tiers.append(tier)
+    return tiers
+
+
+def parse_route(spec: str) -> tuple[str, list[list[str]]]:
+    """
+    Parse "ASSET=TIER,TIER,...", where a tier is "model" or "model|model|...".
+
+    Raises:
+        ValueError: If the spec has no "=", an unknown asset type or no models.
+    """
+    asset, sep, models = spec.partition("=")
+    asset = asset.strip()
+    if not sep or asset not in ROUTED_ASSETS:
+        raise ValueError(f"Invalid route {spec!r}; expected ASSET=MODEL|MODEL,MODEL with ASSET one of {', '.join(ROUTED_ASSETS)}")
+    tiers = _tiers([tier.split("|") for tier in models.split(",")])
+    if not tiers:
+        raise ValueError(f"Route {spec!r} lists no models")
+    return asset, tiers
+
+
+class ModelRouter:
+    """
+    Route each request to the fastest healthy model of the best tier.
+
+    Args:
+        routes (dict): Asset type -> ordered tiers; each tier is a model name
+            or a list of interchangeable model names.
+        window (int): Attempts kept per model. Defaults to 50.
+        window_seconds (float): Attempts older than this are forgotten, which
+            lets a degraded model back in. Defaults to 300.
+        max_error_rate (float): Error rate above which a model is unhealthy. Defaults to 0.25.
+        min_samples (int): Attempts needed before a model can be judged unhealthy. Defaults to 5.
+        explore (float): Share of requests sent to a random healthy model of
+            the tier, so latencies of the slower ones stay current. Defaults to 0.05.
+        seed (int | None): Seed for exploration.
+    """
+
+    def __init__(
+            self,
+            routes: dict[str, Sequence[str | Sequence[str]]],
+            window: int = 50,
+            window_seconds: float = 300.0,
+            max_error_rate: float = 0.25,
+            min_samples: int = 5,
+            explore: float = 0.05,
+            seed: int | None = None,
+    ) -> None:
+        self._routes = {asset: _tiers(route) for asset, route in routes.items()}
+        self.window = max(1, int(window))
+        self.window_seconds = float(window_seconds)
+        self.max_error_rate = float(max_error_rate)
+        self.min_samples = max(1, int(min_samples))
+        self.explore = float(explore)
+        self._rng = random.Random(seed)
+        # model -> deque of (monotonic time, latency, ok)
+        self._attempts: dict[str, deque[tuple[float, float, bool]]] = {}
+        self._lock = threading.Lock()
+
+    def tiers(self, asset_type: str) -> list[list[str]]:
+        """The tiers routed for `asset_type`; empty if it has no route."""
+        return [list(tier) for tier in self._routes.get(asset_type, [])]
+
+    def models(self, asset_type: str) -> list[str]:
+        return [model for tier in self._routes.get(asset_type, []) for model in tier]
+
+    def record(self, model: str, latency: float, ok: bool) -> None:
+        """Add one API attempt of `model` to its rolling window."""
+        with self._lock:
+            self._attempts.setdefault(model, deque(maxlen=self.window)).append((time.monotonic(), latency, ok))
+
+    def _recent(self, model: str) -> list[tuple[float, float, bool]]:
+        # Caller holds the lock
+        attempts = self._attempts.get(model)
+        if not attempts:
+            return []
+        cutoff = time.monotonic() - self.window_seconds
+        while attempts and attempts[0][0] < cutoff:
+            attempts.popleft()
+        return list(attempts)
+
+    def stats(self, model: str) -> ModelStats:
+        with self._lock:
+            attempts = self._recent(model)
+        errors = sum(1 for _, _, ok in attempts if not ok)
+        latencies = sorted(latency for _, latency, ok in attempts if ok)
+        return ModelStats(
+            samples=len(attempts),
+            errors=errors,
+            error_rate=errors / len(attempts) if attempts else 0.0,
+            p50_latency=latencies[len(latencies) // 2] if latencies else None,
+        )
+
+    def healthy(self, model: str) -> bool:
+        stats = self.stats(model)
+        return stats.samples < self.min_samples or stats.error_rate <= self.max_error_rate
+
+    def choose(self, asset_type: str, exclude: Iterable[str] = ()) -> str | None:
+        """
+        Pick the model for one `asset_type` request.
+
+        Tiers are tried in order; within the first tier with a healthy model,
+        models without latency samples are tried first, then the fastest by
+        median latency (or, for an `explore` share, a random one). If no model
+        is healthy, the one with the lowest error rate is used.
+
+        Args:
+            asset_type (str): Routed asset type.
+            exclude (Iterable[str]): Models not to use, e.g. ones that just
+                failed or whose circuit is open.
+
+        Returns:
+            str | None: The model, or None if the route is empty or every
+                model is excluded.
+        """
+        excluded = set(exclude)
+        candidates = [model for model in self.models(asset_type) if model not in excluded]
+        if not candidates:
+            return None
+
+        stats = {model: self.stats(model) for model in candidates}
+        for tier in self._routes.get(asset_type, []):
+            healthy = [
+                model for model in tier
+                if model in stats and (stats[model].samples < self.min_samples or stats[model].error_rate <= self.max_error_rate)
+            ]
+            if not healthy:
+                continue
+            untried = [model for model in healthy if stats[model].p50_latency is None]
+            if untried:
+                return untried[0]
+            if len(healthy) > 1 and self.explore and self._rng.random() < self.explore:
+                return self._rng.choice(healthy)
+            return min(healthy, key=lambda model: stats[model].p50_latency)
+
+        # Everything is degraded: least bad first, route order breaks ties
+        return min(candidates, key=lambda model: stats[model].error_rate)
+
+    def snapshot(self) -> dict[str, dict[str, float | int | bool | None]]:
+        """Rolling statistics of every routed model."""
+        snapshot = {}
+        for model in dict.fromkeys(m for asset in self._routes for m in self.models(asset)):
+            stats = self.stats(model)
+            snapshot[model] = {
+                "samples": stats.samples,
+                "error_rate": round(stats.error_rate, 3),
+                "p50_latency": stats.p50_latency,
+                "healthy": self.healthy(model),
+            }
+        return snapshot
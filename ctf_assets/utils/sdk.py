@@ -0,0 +1,32 @@
+"""
+Deferred access to the OpenAI SDK.
+
+Importing `openai` takes around a second, which `ctf-assets --help`,
+argument errors and `import ctf_assets` should not pay. Modules reference
+SDK names as attributes of this module instead of importing them, and the
+SDK is imported on the first attribute access:
+
+    from ctf_assets.utils import sdk
+
+    client = sdk.OpenAI(api_key=key)
+    try:
+        ...
+    except sdk.OpenAIError as e:   # resolved only when an exception propagates
+        ...
+
+For type annotations, import from `openai` under `typing.TYPE_CHECKING`.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Any
+
+
+def __getattr__(name: str) -> Any:
+    if name.startswith("__"):
+        raise AttributeError(name)
+    value = getattr(importlib.import_module("openai"), name)
+    # Cache on the module so later lookups skip this hook
+    globals()[name] = value
+    return value
@@ -0,0 +1,199 @@
+"""
+Automatic sharding of large `amt` requests.
+
+A single structured-output call that asks for hundreds of flags or dozens of
+stories runs into output-token limits, producing truncated JSON (parsed as
+`[]`) and latency that grows linearly with `amt`. These helpers split a
+request into shards sized from an estimated per-item token cost, issue the
+shards concurrently with distinct variation seeds, then merge, deduplicate
+and top up until exactly `amt` items are collected.
+
+Functions:
+    - plan_shards: Split `amt` into per-call counts.
+    - shard_hint: Diversity instruction appended to each shard's prompt.
+    - with_hint: Append a shard hint to the user's additional instructions.
+    - collect_sharded: Run shards on a thread pool and merge the results.
+    - acollect_sharded: Async counterpart of collect_sharded.
+
+Example:
+    >>> plan_shards(500, per_item_tokens=24)
+    [125, 125, 125, 125]
+"""
+
+from __future__ import annotations
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Hashable
+
+from ctf_assets.utils.concurrency import gather_bounded
+
+# Rough output tokens per item, JSON quoting included
+ITEM_TOKEN_ESTIMATES = {
+    "flags": 24,
+    "stories": 700,
+    "stories_with_titles": 740,
+}
+
+# Output budget per call, kept well under model limits so JSON is never truncated
+DEFAULT_MAX_OUTPUT_TOKENS = 3000
+
+# Upper bound on shards in flight per generator call
+DEFAULT_MAX_WORKERS = 8
+
+# Initial round plus top-up rounds for items lost to duplicates or bad output
+DEFAULT_MAX_ROUNDS = 4
+
+
+def plan_shards(amt: int, per_item_tokens: int, max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS) -> list[int]:
+    """
+    Split `amt` items into evenly sized shards that fit the output budget.
+
+    Args:
+        amt (int): Number of items wanted.
+        per_item_tokens (int): Estimated output tokens per item.
+        max_output_tokens (int): Output token budget per call.
+
+    Returns:
+        list[int]: Item count for each shard; sums to `amt`.
+    """
+    amt = max(1, int(amt))
+    per_shard = max(1, max_output_tokens // max(1, per_item_tokens))
+    shards = math.ceil(amt / per_shard)
+    base, extra = divmod(amt, shards)
+    return [base + (1 if i < extra else 0) for i in range(shards)]
+
+
+def shard_hint(round_index: int, shard_index: int, shards: int) -> str:
+    """
+    Return the diversity instruction for one shard.
+
+    The seed is derived from the round and shard position rather than drawn
+    at random, so identical requests still hit the response cache.
+    """
+    return (
+        f"This is batch {shard_index + 1} of {shards} (variation seed {round_index}-{shard_index}). "
+        "Make every item clearly different from items other batches would produce."
+    )
+
+
+def with_hint(additional_instructions: str, hint: str) -> str:
+    """Append a shard diversity hint to the user's additional instructions."""
+    return " ".join(part for part in (additional_instructions, hint) if part)
+
+
+def _merge(collected: list, seen: set, items: list, key: Callable[[Any], Hashable]) -> None:
+    for item in items:
+        k = key(item)
+        if k in seen:
+            continue
+        seen.add(k)
+        collected.append(item)
+
+
+def _round_hints(round_index: int, shards: list[int]) -> list[str]:
+    # A request that fits in one call is sent unchanged, as before sharding existed
+    if round_index == 0 and len(shards) == 1:
+        return [""]
+    return [shard_hint(round_index, i, len(shards)) for i in range(len(shards))]
+
+
+def collect_sharded(
+        fetch: Callable[[int, str], list],
+        amt: int,
+        per_item_tokens: int,
+        key: Callable[[Any], Hashable] = lambda item: item,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_rounds: int = DEFAULT_MAX_ROUNDS,
+) -> list:
+    """
+    Collect exactly `amt` unique items from concurrent sharded calls.
+
+    Args:
+        fetch (Callable[[int, str], list]): Makes one call for `count` items
+            with the given diversity hint and returns the parsed items.
+        amt (int): Number of items wanted.
+        per_item_tokens (int): Estimated output tokens per item.
+        key (Callable): Maps an item to its deduplication key.
+        max_output_tokens (int): Output token budget per call.
+        max_workers (int): Maximum shards in flight.
+        max_rounds (int): Initial round plus top-up rounds.
+
+    Returns:
+        list: Up to `amt` unique items, in arrival order. Fewer are returned
+            only if the model keeps failing to produce enough valid items.
+
+    Raises:
+        Exception: The first shard error, if a round yields no items at all.
+    """
+    amt = max(1, int(amt))
+    collected: list = []
+    seen: set = set()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        for round_index in range(max_rounds):
+            missing = amt - len(collected)
+            if missing <= 0:
+                break
+
+            shards = plan_shards(missing, per_item_tokens, max_output_tokens)
+            hints = _round_hints(round_index, shards)
+            futures = [pool.submit(fetch, count, hint) for count, hint in zip(shards, hints)]
+
+            errors: list[BaseException] = []
+            produced = 0
+            for future in futures:
+                try:
+                    items = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                produced += len(items)
+                _merge(collected, seen, items, key)
+
+            if errors and not produced:
+                raise errors[0]
+
+    return collected[:amt]
+
+
+async def acollect_sharded(
+        fetch: Callable[[int, str], Awaitable[list]],
+        amt: int,
+        per_item_tokens: int,
+        key: Callable[[Any], Hashable] = lambda item: item,
+        max_output_tokens: int = DEFAULT_MAX_OUTPUT_TOKENS,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        max_rounds: int = DEFAULT_MAX_ROUNDS,
+) -> list:
+    """Async counterpart of `collect_sharded`; `fetch` is a coroutine function."""
+    amt = max(1, int(amt))
+    collected: list = []
+    seen: set = set()
+
+    for round_index in range(max_rounds):
+        missing = amt - len(collected)
+        if missing <= 0:
+            break
+
+        shards = plan_shards(missing, per_item_tokens, max_output_tokens)
+        hints = _round_hints(round_index, shards)
+        batches = await gather_bounded(
+            [fetch(count, hint) for count, hint in zip(shards, hints)],
+            limit=max_workers,
+            return_exceptions=True,
+        )
+
+        errors = [b for b in batches if isinstance(b, BaseException)]
+        produced = 0
+        for items in batches:
+            if isinstance(items, BaseException):
+                continue
+            produced += len(items)
+            _merge(collected, seen, items, key)
+
+        if errors and not produced:
+            raise errors[0]
+
+    return collected[:amt]
@@ -0,0 +1,303 @@
+"""
+Steganography for "find the flag in this image" challenges.
+
+Hides a flag in the pixels of an image with NumPy, without any per-pixel
+Python loop, and reads it back for verification. Two techniques:
+
+    lsb       The flag bits replace the least significant bit of the R, G
+              and B samples. Invisible, found by tools such as zsteg.
+    palette   The image is quantized to 128 colors and each color is stored
+              twice in a 256-entry palette, the copy differing by one in blue.
+              The flag bits pick which of the two entries each pixel uses.
+              Transparency is not kept: the image is flattened to RGB.
+
+The flag is framed with a magic marker, its length and a CRC32, so the
+extractor can tell "no flag here" from a damaged one. With a `key`, the bits
+are scattered over pseudo-random positions derived from it instead of the
+first pixels, and the same key is needed to extract them.
+
+Output is always PNG: any lossy re-encoding would destroy the payload.
+
+Requires NumPy and Pillow (`pip install 'ctf-assets[stego]'`).
+
+Classes:
+    StegoJob: One (source image, flag, output path) embedding.
+
+Functions:
+    embed_flag: Hide a flag in one image.
+    extract_flag: Read a hidden flag back.
+    embed_flags: Run many embeddings on a process pool.
+    capacity: How many flag bytes an image can hold.
+
+Example:
+    embed_flag("base.png", "ctf{h1dd3n_1n_pl41n_s1ght}", "team-01.png", method="lsb")
+    extract_flag("team-01.png")   # "ctf{h1dd3n_1n_pl41n_s1ght}"
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+METHODS = ("lsb", "palette")
+
+# Frame: magic, payload length, CRC32 of the payload, then the payload
+_MAGIC = b"CTFs"
+_HEADER = struct.Struct(">4sII")
+
+# The palette method stores each of these colors twice
+_PALETTE_COLORS = 128
+
+
+def _modules() -> tuple[Any, Any]:
+    try:
+        import numpy
+        from PIL import Image
+    except ImportError as e:
+        raise RuntimeError("Steganography requires NumPy and Pillow: pip install 'ctf-assets[stego]'") from e
+    return numpy, Image
+
+
+@dataclass(frozen=True)
+class StegoJob:
+    source: str
+    flag: str
+    output: str
+
+
+@dataclass(frozen=True)
+class _Carrier:
+    # Flat samples the bits go into, plus what is needed to rebuild the image
+    samples: Any
+    shape: tuple[int, ...]
+    alpha: Any
+    palette: list[int] | None
+
+
+@functools.lru_cache(maxsize=4)
+def _load_carrier(path: str, method: str, mtime_ns: int) -> _Carrier:
+    # Cached so per-team variants of one base image decode (and quantize) it
+    # once per process; mtime_ns invalidates the entry if the file changes
+    np, Image = _modules()
+    with Image.open(path) as image:
+        if method == "palette":
+            quantized = image.convert("RGB").quantize(colors=_PALETTE_COLORS, method=Image.Quantize.FASTOCTREE)
+            colors = np.array(quantized.getpalette()[:_PALETTE_COLORS * 3], dtype=np.uint8).reshape(-1, 3)
+            colors = np.pad(colors, ((0, _PALETTE_COLORS - len(colors)), (0, 0)))
+            twins = colors.copy()
+            twins[:, 2] ^= 1
+            # Entry 2k is color k, entry 2k+1 its twin; even indices carry bit 0
+            palette = np.stack([colors, twins], axis=1).reshape(-1).tolist()
+            indices = np.asarray(quantized, dtype=np.uint8) << 1
+            samples = indices.reshape(-1)
+            samples.flags.writeable = False
+            return _Carrier(samples=samples, shape=indices.shape, alpha=None, palette=palette)
+
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        pixels = np.asarray(image.convert("RGBA" if has_alpha else "RGB"), dtype=np.uint8)
+        samples = np.ascontiguousarray(pixels[..., :3]).reshape(-1)
+        samples.flags.writeable = False
+        alpha = pixels[..., 3].copy() if has_alpha else None
+        return _Carrier(samples=samples, shape=pixels.shape[:2] + (3,), alpha=alpha, palette=None)
+
+
+def _carrier(path: str | Path, method: str) -> _Carrier:
+    if method not in METHODS:
+        raise ValueError(f"Unknown stego method {method!r}; use {' or '.join(METHODS)}")
+    path = str(Path(path).expanduser().resolve())
+    return _load_carrier(path, method, os.stat(path).st_mtime_ns)
+
+
+def _positions(np: Any, size: int, count: int, key: str | None) -> Any:
+    """
+    Sample positions of the first `count` bits: in order, or keyed.
+
+    The keyed order is the affine permutation i -> (a*i + b) mod size with
+    a coprime to size, both derived from the key. It costs O(count) rather
+    than shuffling every sample, and any prefix of it is the same for every
+    `count`, so the extractor can read the header before the payload.
+    """
+    if key is None:
+        return slice(0, count)
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    a = int.from_bytes(digest[:8], "big") % size or 1
+    while math.gcd(a, size) != 1:
+        a += 1
+    b = int.from_bytes(digest[8:16], "big") % size
+    return (np.arange(count, dtype=np.int64) * a + b) % size
+
+
+def capacity(path: str | Path, method: str = "lsb") -> int:
+    """Largest flag, in UTF-8 bytes, that fits in the image with `method`."""
+    return max(0, _carrier(path, method).samples.size // 8 - _HEADER.size)
+
+
+def embed_flag(
+        source: str | Path,
+        flag: str,
+        output: str | Path,
+        method: str = "lsb",
+        key: str | None = None,
+) -> str:
+    """
+    Hide `flag` in the image at `source` and write the result to `output`.
+
+    Args:
+        source (str | Path): The carrier image, e.g. one written by `generate_images`.
+        flag (str): The flag to hide.
+        output (str | Path): Where to write the PNG; the suffix is forced to .png.
+        method (str): "lsb" or "palette". Defaults to "lsb". "lsb" keeps an
+            alpha channel; "palette" flattens the image to RGB before
+            quantizing, so transparent areas come out opaque.
+        key (str | None): Scatter the bits over positions derived from this key.
+            Defaults to None (the first samples, in order).
+
+    Returns:
+        str: The path written.
+
+    Raises:
+        ValueError: If the method is unknown or the flag doesn't fit.
+        RuntimeError: If NumPy or Pillow is missing.
+    """
+    np, Image = _modules()
+    carrier = _carrier(source, method)
+    payload = flag.encode("utf-8")
+    frame = _HEADER.pack(_MAGIC, len(payload), zlib.crc32(payload)) + payload
+    bits = np.unpackbits(np.frombuffer(frame, dtype=np.uint8))
+    if bits.size > carrier.samples.size:
+        raise ValueError(
+            f"Flag of {len(payload)} bytes doesn't fit in {source} with {method} "
+            f"(capacity {max(0, carrier.samples.size // 8 - _HEADER.size)} bytes)"
+        )
+
+    samples = carrier.samples.copy()
+    where = _positions(np, samples.size, bits.size, key)
+    samples[where] = (samples[where] & 0xFE) | bits
+
+    if carrier.palette is not None:
+        image = Image.fromarray(samples.reshape(carrier.shape), mode="P")
+        image.putpalette(carrier.palette)
+    else:
+        pixels = samples.reshape(carrier.shape)
+        if carrier.alpha is not None:
+            pixels = np.dstack([pixels, carrier.alpha])
+        image = Image.fromarray(pixels)
+
+    output = Path(output).expanduser().with_suffix(".png")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # No optimize: it may drop or reorder palette entries the payload relies on
+    image.save(output, "PNG")
+    return str(output)
+
+
+def extract_flag(path: str | Path, method: str | None = None, key: str | None = None) -> str:
+    """
+    Read back a flag hidden by `embed_flag`.
+
+    Args:
+        path (str | Path): The image to inspect.
+        method (str | None): "lsb" or "palette". Defaults to palette for
+            palette images and lsb otherwise.
+        key (str | None): The key used to embed, if any.
+
+    Returns:
+        str: The hidden flag.
+
+    Raises:
+        ValueError: If the image holds no flag (or another key was used) or the payload is damaged.
+    """
+    np, Image = _modules()
+    path = Path(path).expanduser()
+    with Image.open(path) as image:
+        if method is None:
+            method = "palette" if image.mode == "P" else "lsb"
+        if method == "palette":
+            samples = np.asarray(image, dtype=np.uint8).reshape(-1)
+        elif method == "lsb":
+            samples = np.ascontiguousarray(np.asarray(image.convert("RGB"), dtype=np.uint8)).reshape(-1)
+        else:
+            raise ValueError(f"Unknown stego method {method!r}; use {' or '.join(METHODS)}")
+
+    size = samples.size
+    max_bits = size - size % 8
+    if max_bits < _HEADER.size * 8:
+        raise ValueError(f"No hidden flag in {path}")
+    # Header first, then the payload it announces: prefixes of one position sequence
+    header = samples[_positions(np, size, _HEADER.size * 8, key)]
+    magic, length, crc = _HEADER.unpack(np.packbits(header & 1).tobytes())
+    if magic != _MAGIC or _HEADER.size + length > max_bits // 8:
+        raise ValueError(f"No hidden flag in {path}")
+
+    frame = samples[_positions(np, size, (_HEADER.size + length) * 8, key)]
+    payload = np.packbits(frame[_HEADER.size * 8:] & 1).tobytes()
+    if zlib.crc32(payload) != crc:
+        raise ValueError(f"Hidden flag in {path} is damaged (CRC mismatch)")
+    return payload.decode("utf-8")
+
+
+def _run_job(job: StegoJob, method: str, key: str | None, verify: bool) -> tuple[str | None, str | None]:
+    # Errors travel back as values so one bad job doesn't abort the batch
+    try:
+        path = embed_flag(job.source, job.flag, job.output, method=method, key=key)
+        if verify and extract_flag(path, method=method, key=key) != job.flag:
+            raise ValueError("extracted flag doesn't match the embedded one")
+        return path, None
+    except Exception as e:
+        return None, f"stego {job.output}: {e}"
+
+
+def embed_flags(
+        jobs: Iterable[StegoJob],
+        method: str = "lsb",
+        key: str | None = None,
+        max_workers: int | None = None,
+        verify: bool = True,
+) -> tuple[list[str | None], list[str]]:
+    """
+    Run many embeddings on a process pool.
+
+    Jobs are handed out in chunks; each worker decodes a given source image
+    once and reuses it for every job on that source, so per-team variants
+    of one base image cost one PNG encode each.
+
+    Args:
+        jobs (Iterable[StegoJob]): What to embed where.
+        method (str): "lsb" or "palette". Defaults to "lsb".
+        key (str | None): See `embed_flag`.
+        max_workers (int | None): Worker processes. Defaults to one per CPU,
+            capped at the number of jobs.
+        verify (bool): Extract each flag again in the worker and fail the
+            job on a mismatch. Defaults to True.
+
+    Returns:
+        tuple[list[str | None], list[str]]: Written paths in job order (None
+            for a failed job), and one error message per failed job.
+
+    Raises:
+        ValueError: If the method is unknown.
+        RuntimeError: If NumPy or Pillow is missing.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown stego method {method!r}; use {' or '.join(METHODS)}")
+    # Fail fast in the parent instead of once per job
+    _modules()
+    jobs = list(jobs)
+    if len(jobs) <= 1:
+        results = [_run_job(job, method, key, verify) for job in jobs]
+    else:
+        workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs)))
+        run = functools.partial(_run_job, method=method, key=key, verify=verify)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+
+    paths = [path for path, _ in results]
+    errors = [error for _, error in results if error]
+    return paths, errors
@@ -0,0 +1,68 @@
+"""
+Token usage accounting.
+
+Collects the `usage` block of Responses calls, in particular
+`input_tokens_details.cached_tokens`: the prompt tokens the provider served
+from its prompt cache. Prompts are laid out with a static prefix sent as
+`instructions`, so on bulk runs most calls after the first should report
+cached tokens, with a matching drop in time-to-first-token.
+
+Classes:
+    Usage: Running token totals for one generator call or a whole session.
+    GenerationResult: Generated items together with their usage.
+
+Example:
+    result = generate_flags(theme="NASA", amt=200, return_usage=True)
+    print(result.usage.cached_tokens, result.usage.cached_ratio)
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+# Shared by all Usage objects; updates are tiny, so one lock is plenty
+_usage_lock = threading.Lock()
+
+
+def _get(obj: Any, name: str) -> Any:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+@dataclass
+class Usage:
+    calls: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+    output_tokens: int = 0
+    # Calls answered by the local response cache, without reaching the API
+    cache_hits: int = 0
+
+    def record(self, usage: Any) -> None:
+        """Add the `usage` block of a Responses result (SDK object or dict)."""
+        details = _get(usage, "input_tokens_details")
+        with _usage_lock:
+            self.calls += 1
+            self.input_tokens += _get(usage, "input_tokens") or 0
+            self.cached_tokens += _get(details, "cached_tokens") or 0
+            self.output_tokens += _get(usage, "output_tokens") or 0
+
+    def record_cache_hit(self) -> None:
+        with _usage_lock:
+            self.cache_hits += 1
+
+    @property
+    def cached_ratio(self) -> float:
+        """Fraction of input tokens served from the provider's prompt cache."""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+@dataclass(frozen=True)
+class GenerationResult:
+    items: list
+    usage: Usage
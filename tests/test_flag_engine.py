@@ -0,0 +1,59 @@
+import pytest
+
+from ctf_assets.flag_engine import FlagEngine, WordPools
+from ctf_assets.utils.flag_format import FlagFormat
+
+POOLS = WordPools.from_lists(
+    adjectives=["blue", "silent", "rapid", "hidden", "frozen"],
+    nouns=["orbit", "rocket", "comet", "probe"],
+    verbs=["burns", "spins", "drifts"],
+)
+
+
+@pytest.mark.parametrize("options", [
+    {"words": 3, "entropy_bits": 48},
+    {"words": 2, "entropy_bits": 0},
+    {"words": 0, "entropy_bits": 40},
+    # Past 2**62 combinations the last slots come from the seeded stream
+    {"words": 3, "entropy_bits": 100},
+])
+def test_numpy_and_pure_python_paths_agree(options):
+    pytest.importorskip("numpy")
+    fast = FlagEngine(POOLS, seed=7, use_numpy=True, **options)
+    slow = FlagEngine(POOLS, seed=7, use_numpy=False, **options)
+    assert fast.vectorized and not slow.vectorized
+    batch = min(1000, fast.remaining // 3)
+    for _ in range(3):
+        assert fast.generate(batch) == slow.generate(batch)
+
+
+@pytest.mark.parametrize("use_numpy", [True, False])
+@pytest.mark.parametrize("options", [
+    {"words": 2, "entropy_bits": 0},
+    {"words": 1, "entropy_bits": 8},
+])
+def test_full_space_without_repeats(use_numpy, options):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    engine = FlagEngine(POOLS, seed=3, use_numpy=use_numpy, **options)
+    flags = engine.generate(engine.space)
+    assert len(set(flags)) == engine.space
+    assert all(FlagFormat.parse("ctf{..}").matches(flag) for flag in flags)
+    assert engine.remaining == 0
+    with pytest.raises(ValueError):
+        engine.generate(1)
+
+
+def test_same_seed_same_flags():
+    assert FlagEngine(POOLS, seed=11).generate(50) == FlagEngine(POOLS, seed=11).generate(50)
+
+
+@pytest.mark.parametrize("separator", [" ", "", "x", "7", "{"])
+def test_invalid_separator_rejected(separator):
+    with pytest.raises(ValueError, match="separator"):
+        FlagEngine(POOLS, separator=separator)
+
+
+def test_overlong_body_rejected():
+    with pytest.raises(ValueError, match="exceed"):
+        FlagEngine(POOLS, entropy_bits=1000)
@@ -0,0 +1,54 @@
+import pytest
+
+from ctf_assets.utils.flag_format import MAX_BODY_LENGTH, FlagFormat
+
+CTF = FlagFormat.parse("ctf{..}")
+
+
+@pytest.mark.parametrize("template, prefix, suffix", [
+    ("ctf{..}", "ctf{", "}"),
+    ("FLAG{…}", "FLAG{", "}"),
+    ("FLAG{}", "FLAG{", "}"),
+    ("FLAG", "FLAG{", "}"),
+    ("", "", ""),
+])
+def test_parse(template, prefix, suffix):
+    fmt = FlagFormat.parse(template)
+    assert (fmt.prefix, fmt.suffix) == (prefix, suffix)
+
+
+@pytest.mark.parametrize("flag, repaired", [
+    ("ctf{r0ck3t}", "ctf{r0ck3t}"),
+    (" 'ctf{r0ck3t}', ", "ctf{r0ck3t}"),
+    ("CTF{r0ck3t}", "ctf{r0ck3t}"),
+    ("CTF{r0ck3t launch", "ctf{r0ck3t_launch}"),
+    ("ctf{ spaced out }", "ctf{spaced_out}"),
+    ("flag{r0ck3t}", "ctf{r0ck3t}"),
+    ("ctf r0ck3t}", "ctf{r0ck3t}"),
+    ("ctf:r0ck3t", "ctf{r0ck3t}"),
+    ("ctf(r0ck3t)", "ctf{r0ck3t}"),
+    ("r0ck3t_launch", "ctf{r0ck3t_launch}"),
+])
+def test_repair_fixes_trivial_defects(flag, repaired):
+    assert CTF.repair(flag) == repaired
+
+
+@pytest.mark.parametrize("flag", [
+    "Sorry, I cannot help with that",
+    "Sorry, I cannot help with that.",
+    "Done.",
+    "ctf is the best",
+    "ctf: Sorry, no",
+    "ctf{a}b}",
+    "ctf{a#b}",
+    "ctf{}",
+    "ctf{" + "a" * (MAX_BODY_LENGTH + 1) + "}",
+])
+def test_repair_rejects(flag):
+    assert CTF.repair(flag) is None
+
+
+def test_bare_format_never_wraps_prose():
+    bare = FlagFormat.parse("")
+    assert bare.repair("r0ck3t") == "r0ck3t"
+    assert bare.repair("two words") is None
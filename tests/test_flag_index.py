@@ -0,0 +1,61 @@
+import pytest
+
+from ctf_assets.utils.flag_index import FlagIndex
+
+
+@pytest.fixture
+def path(tmp_path):
+    return tmp_path / "flags.sqlite3"
+
+
+def test_claim_reserves_each_flag_once(path):
+    with FlagIndex(path) as index:
+        assert index.claim(["ctf{a}", "ctf{b}"]) == ["ctf{a}", "ctf{b}"]
+        assert index.claim(["ctf{b}", "ctf{c}"]) == ["ctf{c}"]
+        assert "ctf{a}" in index
+        assert len(index) == 3
+
+
+def test_filter_new_does_not_reserve(path):
+    with FlagIndex(path) as index:
+        assert index.filter_new(["ctf{a}"]) == ["ctf{a}"]
+        assert "ctf{a}" not in index
+        assert index.claim(["ctf{a}"]) == ["ctf{a}"]
+
+
+def test_instances_see_each_others_claims(path):
+    first, second = FlagIndex(path), FlagIndex(path)
+    try:
+        assert first.claim(["ctf{x}"]) == ["ctf{x}"]
+        # second's Bloom filter was loaded before the claim
+        assert second.filter_new(["ctf{x}", "ctf{z}"]) == ["ctf{z}"]
+        assert "ctf{x}" in second
+        assert second.claim(["ctf{x}", "ctf{z}"]) == ["ctf{z}"]
+        assert first.filter_new(["ctf{z}"]) == []
+    finally:
+        first.close()
+        second.close()
+
+
+def test_reopened_index_keeps_every_flag(path):
+    first, second = FlagIndex(path), FlagIndex(path)
+    first.claim(["ctf{a}"])
+    second.claim(["ctf{b}"])
+    first.close()
+    second.close()
+    with FlagIndex(path) as index:
+        assert index.filter_new(["ctf{a}", "ctf{b}", "ctf{c}"]) == ["ctf{c}"]
+
+
+@pytest.mark.parametrize("bloom", [True, False])
+def test_use_after_close_raises(path, bloom):
+    index = FlagIndex(path, bloom=bloom)
+    index.claim(["ctf{a}"])
+    index.close()
+    index.close()  # idempotent
+    with pytest.raises(ValueError, match="index is closed"):
+        index.filter_new(["ctf{b}"])
+    with pytest.raises(ValueError, match="index is closed"):
+        index.claim(["ctf{b}"])
+    with pytest.raises(ValueError, match="index is closed"):
+        "ctf{b}" in index
@@ -0,0 +1,52 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+Image = pytest.importorskip("PIL.Image")
+
+from ctf_assets.utils.stego import capacity, embed_flag, extract_flag  # noqa: E402
+
+FLAG = "ctf{h1dd3n_1n_pl41n_s1ght}"
+
+
+def _source(tmp_path, mode):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(48, 64, 4), dtype=np.uint8)
+    image = Image.fromarray(pixels, "RGBA")
+    if mode == "RGB":
+        image = image.convert("RGB")
+    elif mode == "P":
+        image = image.convert("RGB").quantize(colors=64)
+    path = tmp_path / f"source_{mode}.png"
+    image.save(path)
+    return path
+
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "P"])
+@pytest.mark.parametrize("method", ["lsb", "palette"])
+@pytest.mark.parametrize("key", [None, "s3cret"])
+def test_round_trip(tmp_path, mode, method, key):
+    source = _source(tmp_path, mode)
+    output = embed_flag(source, FLAG, tmp_path / "out", method=method, key=key)
+    assert output.endswith(".png")
+    assert extract_flag(output, key=key) == FLAG
+    assert extract_flag(output, method=method, key=key) == FLAG
+
+
+def test_lsb_keeps_alpha(tmp_path):
+    source = _source(tmp_path, "RGBA")
+    output = embed_flag(source, FLAG, tmp_path / "out.png", method="lsb")
+    with Image.open(source) as before, Image.open(output) as after:
+        assert after.mode == "RGBA"
+        assert np.array_equal(np.asarray(before)[..., 3], np.asarray(after)[..., 3])
+
+
+def test_wrong_key_finds_nothing(tmp_path):
+    output = embed_flag(_source(tmp_path, "RGB"), FLAG, tmp_path / "out.png", key="right")
+    with pytest.raises(ValueError):
+        extract_flag(output, key="wrong")
+
+
+def test_flag_too_large(tmp_path):
+    source = _source(tmp_path, "RGB")
+    with pytest.raises(ValueError, match="doesn't fit"):
+        embed_flag(source, "x" * (capacity(source) + 1), tmp_path / "out.png")